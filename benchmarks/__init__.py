@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks dos endpoints da API com dados sintéticos (ver benchmarks/run.py)."""
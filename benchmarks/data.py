@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Gerador de dados sintéticos em massa para os benchmarks."""
+
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from src.models import db, User, ApiCredentials, Product, StockLevel, Sale, StockAdjustment
+from src.alerts import backfill_stock_alerts
+from src.commands import analyze_database
+from src.sales import backfill_daily_sales
+from src.stock import backfill_product_stock
+
+# Linhas por INSERT em lote
+INSERT_CHUNK = 5000
+
+# Tipos de ajuste manual válidos (mesmos aceitos por /stock/adjust)
+ADJUSTMENT_TYPES = ('entrada_manual', 'saida_manual', 'perda', 'dano')
+
+def _bulk_insert(model, rows):
+    """Insere as linhas em lotes de INSERT_CHUNK."""
+    for start in range(0, len(rows), INSERT_CHUNK):
+        db.session.execute(insert(model), rows[start:start + INSERT_CHUNK])
+
+def generate_data(users=1, products=100, stock_levels=50, sales=10, adjustments=2, days=90, seed=42):
+    """Popula o banco com dados sintéticos. Deve ser chamada dentro de um app_context.
+
+    Para cada um dos `users` vendedores são criados `products` produtos, cada um com
+    `stock_levels` registros de estoque, `sales` vendas e `adjustments` ajustes
+    distribuídos nos últimos `days` dias. As tabelas derivadas (estoque atual e
+    vendas diárias) e as estatísticas do banco são atualizadas ao final, como em
+    produção. Retorna a contagem de linhas geradas.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    window = timedelta(days=days).total_seconds()
+    counts = {"users": 0, "products": 0, "stock_levels": 0, "sales": 0, "adjustments": 0}
+
+    for user_index in range(users):
+        user = User(username=f"bench-seller-{user_index}")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(ApiCredentials(
+            user_id=user.id,
+            access_token="bench-access-token",
+            refresh_token="bench-refresh-token",
+            expires_in=21600
+        ))
+
+        _bulk_insert(Product, [
+            {
+                "user_id": user.id,
+                "sku": f"SKU-{user_index}-{index}",
+                "ml_item_id": f"MLB{user_index:03d}{index:07d}",
+                "ml_inventory_id": f"INV{user_index:03d}{index:07d}",
+                "title": f"Produto {index} do vendedor {user_index}",
+                "created_at": now - timedelta(days=days)
+            }
+            for index in range(products)
+        ])
+        product_ids = [
+            product_id for (product_id,) in
+            db.session.query(Product.id).filter(Product.user_id == user.id).order_by(Product.id)
+        ]
+
+        stock_rows = []
+        sale_rows = []
+        adjustment_rows = []
+        for product_id in product_ids:
+            # Passeio aleatório do estoque ao longo da janela
+            available = rng.randint(0, 200)
+            for index in range(stock_levels):
+                available = max(0, available + rng.randint(-5, 5))
+                not_available = rng.randint(0, 5)
+                stock_rows.append({
+                    "product_id": product_id,
+                    "total_quantity": available + not_available,
+                    "available_quantity": available,
+                    "not_available_quantity": not_available,
+                    "timestamp": now - timedelta(seconds=window * (stock_levels - index) / stock_levels)
+                })
+
+            for index in range(sales):
+                sale_rows.append({
+                    "product_id": product_id,
+                    "ml_order_id": f"{product_id}{index:06d}",
+                    "quantity_sold": rng.randint(1, 3),
+                    "sale_timestamp": now - timedelta(seconds=rng.uniform(0, window))
+                })
+
+            for _ in range(adjustments):
+                adjustment_type = rng.choice(ADJUSTMENT_TYPES)
+                quantity = rng.randint(1, 10)
+                adjustment_rows.append({
+                    "product_id": product_id,
+                    "adjustment_type": adjustment_type,
+                    "quantity": quantity if adjustment_type == 'entrada_manual' else -quantity,
+                    "reason": "Ajuste gerado para benchmark",
+                    "adjustment_timestamp": now - timedelta(seconds=rng.uniform(0, window))
+                })
+
+        _bulk_insert(StockLevel, stock_rows)
+        _bulk_insert(Sale, sale_rows)
+        _bulk_insert(StockAdjustment, adjustment_rows)
+        db.session.commit()
+
+        counts["users"] += 1
+        counts["products"] += len(product_ids)
+        counts["stock_levels"] += len(stock_rows)
+        counts["sales"] += len(sale_rows)
+        counts["adjustments"] += len(adjustment_rows)
+
+    backfill_product_stock()
+    backfill_daily_sales()
+    backfill_stock_alerts()
+    analyze_database()
+
+    return counts
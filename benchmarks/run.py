@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""Benchmark dos endpoints GET de /api/* com dados sintéticos em várias escalas.
+
+Para cada escala o banco é populado pelo gerador de benchmarks/data.py e cada
+endpoint é chamado pelo test client do Flask. São medidos a latência (p50/p95),
+a quantidade de consultas SQL por requisição e o pico de memória alocada
+(tracemalloc). O resultado é gravado em JSON para comparação entre commits.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.run --scales small,medium --repeat 20
+    python -m benchmarks.run --baseline benchmarks/results/anterior.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from flask import Flask
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import config
+from src.models import db, User
+from src.routes import auth_bp, api_bp
+from benchmarks.data import generate_data
+
+# Volumes de dados por escala (por vendedor: produtos; por produto: demais registros)
+SCALES = {
+    # Vendedor sem vendas nem ajustes: cobre os dados de exemplo das listagens
+    "empty": {"users": 1, "products": 100, "stock_levels": 50, "sales": 0, "adjustments": 0},
+    "small": {"users": 1, "products": 100, "stock_levels": 50, "sales": 10, "adjustments": 2},
+    "medium": {"users": 2, "products": 1000, "stock_levels": 100, "sales": 20, "adjustments": 2},
+    "large": {"users": 1, "products": 5000, "stock_levels": 200, "sales": 40, "adjustments": 4}
+}
+
+# Endpoints não medidos: dependem da API do Mercado Livre ou mantêm a conexão aberta (SSE)
+EXCLUDED_PREFIXES = ('/api/sync', '/api/events')
+
+# Variações de parâmetros medidas além da chamada sem parâmetros
+EXTRA_QUERIES = {
+    '/api/charts/sales': ['days=365'],
+    '/api/charts/stock': ['days=90'],
+    '/api/sales': ['days=90'],
+    '/api/activities': ['days=90']
+}
+
+def create_benchmark_app(database_uri):
+    """Cria a aplicação com as configurações de src/config.py e o banco informado."""
+    app = Flask(__name__)
+    for name in dir(config):
+        if name.isupper():
+            app.config[name] = getattr(config, name)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=database_uri,
+        SECRET_KEY="benchmark",
+        ML_APP_ID="benchmark",
+        ML_SECRET_KEY="benchmark",
+        ML_REDIRECT_URI="http://localhost/callback"
+    )
+
+    db.init_app(app)
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(api_bp, url_prefix='/api')
+    return app
+
+def discover_endpoints(app):
+    """Lista as URLs GET de /api/* sem parâmetros de rota, com as variações de query."""
+    urls = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if not rule.rule.startswith('/api/') or rule.arguments or 'GET' not in rule.methods:
+            continue
+        if rule.rule.startswith(EXCLUDED_PREFIXES):
+            continue
+        urls.append(rule.rule)
+        urls.extend(f"{rule.rule}?{query}" for query in EXTRA_QUERIES.get(rule.rule, []))
+    return urls
+
+def percentile(values, pct):
+    """Percentil pelo método do posto mais próximo."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def measure_endpoint(client, engine, url, repeat):
+    """Mede uma URL: latência, consultas SQL por requisição e pico de memória."""
+    query_count = [0]
+
+    def count_query(*args):
+        query_count[0] += 1
+
+    timings = []
+    queries = []
+    event.listen(engine, 'before_cursor_execute', count_query)
+    try:
+        for _ in range(repeat):
+            query_count[0] = 0
+            started = time.perf_counter()
+            response = client.get(url)
+            response.get_data()
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(query_count[0])
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_query)
+
+    # Pico de memória medido em uma chamada separada (tracemalloc distorce a latência)
+    tracemalloc.start()
+    try:
+        client.get(url).get_data()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "status": response.status_code,
+        "response_bytes": len(response.get_data()),
+        "first_ms": round(timings[0], 3),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "max_ms": round(max(timings), 3),
+        "queries_first": queries[0],
+        "queries": percentile(queries, 50),
+        "peak_memory_kb": round(peak / 1024, 1)
+    }
+
+def run_scale(name, params, repeat, database_uri=None):
+    """Popula um banco na escala informada e mede todos os endpoints."""
+    temp_path = None
+    if database_uri is None:
+        fd, temp_path = tempfile.mkstemp(prefix=f"benchmark-{name}-", suffix=".db")
+        os.close(fd)
+        database_uri = f"sqlite:///{temp_path}"
+
+    app = create_benchmark_app(database_uri)
+    try:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+
+            started = time.perf_counter()
+            counts = generate_data(**params)
+            generation_seconds = time.perf_counter() - started
+
+            user_id = db.session.query(User.id).order_by(User.id).first()[0]
+            engine = db.engine
+
+        client = app.test_client()
+        with client.session_transaction() as client_session:
+            client_session['user_id'] = user_id
+
+        endpoints = {}
+        for url in discover_endpoints(app):
+            endpoints[url] = measure_endpoint(client, engine, url, repeat)
+            print(
+                f"[{name}] {url}: p50={endpoints[url]['p50_ms']}ms p95={endpoints[url]['p95_ms']}ms "
+                f"consultas={endpoints[url]['queries']} memória={endpoints[url]['peak_memory_kb']}KB"
+            )
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+    return {
+        "params": params,
+        "rows": counts,
+        "generation_seconds": round(generation_seconds, 2),
+        "endpoints": endpoints
+    }
+
+def _git_revision():
+    """Retorna o commit atual, se disponível."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_with_baseline(results, baseline):
+    """Imprime a variação de p50 e de consultas em relação a um resultado anterior."""
+    for scale, scale_result in results["scales"].items():
+        baseline_endpoints = baseline.get("scales", {}).get(scale, {}).get("endpoints", {})
+        for url, metrics in scale_result["endpoints"].items():
+            previous = baseline_endpoints.get(url)
+            if not previous:
+                continue
+            delta = metrics["p50_ms"] - previous["p50_ms"]
+            change = delta / previous["p50_ms"] * 100 if previous["p50_ms"] else 0.0
+            print(
+                f"[{scale}] {url}: p50 {previous['p50_ms']} -> {metrics['p50_ms']}ms ({change:+.1f}%), "
+                f"consultas {previous['queries']} -> {metrics['queries']}"
+            )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos endpoints da API com dados sintéticos.")
+    parser.add_argument('--scales', default='empty,small,medium', help="Escalas separadas por vírgula: " + ", ".join(SCALES))
+    parser.add_argument('--repeat', type=int, default=20, help="Requisições por endpoint (padrão: 20)")
+    parser.add_argument('--database-uri', default=None, help="Banco usado no lugar de um SQLite temporário (será recriado)")
+    parser.add_argument('--output', default=None, help="Arquivo JSON de saída (padrão: benchmarks/results/<data>.json)")
+    parser.add_argument('--baseline', default=None, help="Resultado anterior para comparação")
+    args = parser.parse_args(argv)
+
+    scales = [scale.strip() for scale in args.scales.split(',') if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"Escalas desconhecidas: {', '.join(unknown)}")
+
+    results = {
+        "created_at": datetime.utcnow().isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "scales": {}
+    }
+    for scale in scales:
+        results["scales"][scale] = run_scale(scale, SCALES[scale], args.repeat, args.database_uri)
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results',
+        f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Resultados gravados em {output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            compare_with_baseline(results, json.load(baseline_file))
+
+    # Uma resposta de erro invalida a medição do endpoint
+    failures = [
+        f"[{scale}] {url}: status {metrics['status']}"
+        for scale, scale_result in results["scales"].items()
+        for url, metrics in scale_result["endpoints"].items()
+        if metrics["status"] >= 500
+    ]
+    if failures:
+        print("Endpoints com erro:\n" + "\n".join(failures))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
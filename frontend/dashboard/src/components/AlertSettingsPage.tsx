@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { getProducts } from '../services/api';
+import { getProducts, getAlertSettings, updateAlertSettings } from '../services/api';
 import '../App.css';
 
 interface Product {
@@ -69,42 +69,18 @@ const AlertSettingsPage: React.FC = () => {
 
   const fetchAlertSettings = async () => {
     try {
-      // Em uma implementação real, buscaríamos as configurações do backend
-      // Por enquanto, vamos usar valores padrão
+      const { data } = await getAlertSettings();
+      setGlobalSettings(data.global);
       
-      // Simular busca de configurações globais
-      const mockGlobalSettings: AlertSettings = {
-        enabled: true,
-        threshold: 5,
-        notification_email: 'usuario@exemplo.com',
-        notification_dashboard: true
-      };
-      
-      setGlobalSettings(mockGlobalSettings);
-      
-      // Simular busca de configurações específicas por produto
-      const mockProductSettings: {[key: number]: AlertSettings} = {};
-      
-      // Configurar alguns produtos com valores personalizados
-      if (products.length > 0) {
-        // Primeiro produto com threshold mais baixo
-        if (products[0]) {
-          mockProductSettings[products[0].id] = {
-            ...mockGlobalSettings,
-            threshold: 3
-          };
-        }
-        
-        // Segundo produto com threshold mais alto
-        if (products[1]) {
-          mockProductSettings[products[1].id] = {
-            ...mockGlobalSettings,
-            threshold: 10
-          };
-        }
-      }
-      
-      setProductSettings(mockProductSettings);
+      // Configurações específicas por produto (apenas o limite é personalizado)
+      const settingsByProduct: {[key: number]: AlertSettings} = {};
+      data.products.forEach((product: { product_id: number; threshold: number }) => {
+        settingsByProduct[product.product_id] = {
+          ...data.global,
+          threshold: product.threshold
+        };
+      });
+      setProductSettings(settingsByProduct);
       
     } catch (err) {
       console.error('Erro ao buscar configurações de alertas:', err);
@@ -140,8 +116,16 @@ const AlertSettingsPage: React.FC = () => {
 
   const handleSaveSettings = async () => {
     try {
-      // Em uma implementação real, enviaríamos as configurações para o backend
-      // Por enquanto, apenas simular o salvamento
+      await updateAlertSettings({
+        global: {
+          ...globalSettings,
+          threshold: Number(globalSettings.threshold)
+        },
+        products: Object.entries(productSettings).map(([productId, settings]) => ({
+          product_id: Number(productId),
+          threshold: Number(settings.threshold)
+        }))
+      });
       
       setSuccessMessage('Configurações de alertas salvas com sucesso!');
       
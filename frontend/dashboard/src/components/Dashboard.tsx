@@ -77,34 +77,59 @@ const Dashboard: React.FC = () => {
       });
   };
 
-  const handleSyncProducts = () => {
+  // Inicia um job de sincronização em segundo plano e acompanha o progresso até o fim
+  const runSyncJob = (type: 'products' | 'stock', onDone: (job: any) => void) => {
     setLoading(true);
-    fetch('/api/sync/products')
+    fetch('/api/sync/jobs', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ type })
+    })
       .then(response => response.json())
-      .then(data => {
-        alert(`Sincronização concluída! ${data.new_products} novos produtos, ${data.updated_products} atualizados.`);
-        fetchStats(); // Atualizar estatísticas após sincronização
-        fetchRecentActivities(); // Atualizar atividades recentes
+      .then(job => {
+        const poll = () => {
+          fetch(`/api/sync/jobs/${job.job_id}`)
+            .then(response => response.json())
+            .then(status => {
+              if (status.status === 'done' || status.status === 'failed') {
+                onDone(status);
+                fetchStats(); // Atualizar estatísticas após sincronização
+                fetchRecentActivities(); // Atualizar atividades recentes
+              } else {
+                setTimeout(poll, 2000);
+              }
+            })
+            .catch(error => {
+              console.error('Erro ao consultar job de sincronização:', error);
+              setLoading(false);
+            });
+        };
+        poll();
       })
       .catch(error => {
-        console.error('Erro ao sincronizar produtos:', error);
+        console.error('Erro ao iniciar sincronização:', error);
         setLoading(false);
       });
   };
 
+  const handleSyncProducts = () => {
+    runSyncJob('products', job => {
+      if (job.status === 'failed') {
+        alert(`Falha na sincronização de produtos: ${job.error_message}`);
+      } else {
+        alert(`Sincronização concluída! ${job.result.new_products} novos produtos, ${job.result.updated_products} atualizados.`);
+      }
+    });
+  };
+
   const handleSyncStock = () => {
-    setLoading(true);
-    fetch('/api/sync/stock')
-      .then(response => response.json())
-      .then(data => {
-        alert(`Estoque atualizado para ${data.updated_products} produtos!`);
-        fetchStats(); // Atualizar estatísticas após sincronização
-        fetchRecentActivities(); // Atualizar atividades recentes
-      })
-      .catch(error => {
-        console.error('Erro ao sincronizar estoque:', error);
-        setLoading(false);
-      });
+    runSyncJob('stock', job => {
+      if (job.status === 'failed') {
+        alert(`Falha na sincronização de estoque: ${job.error_message}`);
+      } else {
+        alert(`Estoque atualizado para ${job.result.updated_products} produtos!`);
+      }
+    });
   };
 
   const formatDate = (dateString: string) => {
@@ -1,5 +1,4 @@
 import React, { useState, useEffect } from 'react';
-import { getProducts } from '../services/api';
 import '../App.css';
 
 interface Notification {
@@ -13,6 +12,9 @@ interface Notification {
   product_title?: string;
 }
 
+// Quantidade máxima de notificações mantidas na lista
+const MAX_NOTIFICATIONS = 50;
+
 const NotificationsComponent: React.FC = () => {
   const [notifications, setNotifications] = useState<Notification[]>([]);
   const [loading, setLoading] = useState(true);
@@ -21,7 +23,71 @@ const NotificationsComponent: React.FC = () => {
   const [showNotifications, setShowNotifications] = useState(false);
 
   useEffect(() => {
-    fetchNotifications();
+    // Eventos em tempo real do backend (Server-Sent Events); o navegador reconecta sozinho
+    const source = new EventSource('/api/events');
+
+    source.onopen = () => {
+      setLoading(false);
+      setError(null);
+    };
+    source.onerror = () => {
+      setLoading(false);
+      if (source.readyState === EventSource.CLOSED) {
+        setError('Não foi possível receber as notificações. Tente novamente mais tarde.');
+      }
+    };
+
+    source.addEventListener('low_stock', event => {
+      const data = JSON.parse((event as MessageEvent).data);
+      addNotification({
+        id: Number((event as MessageEvent).lastEventId),
+        type: 'low_stock',
+        title: data.available === 0 ? 'Estoque Crítico' : 'Estoque Baixo',
+        message: data.available === 0
+          ? `${data.product_title} está com estoque zerado!`
+          : `${data.product_title} está com apenas ${data.available} unidades disponíveis.`,
+        timestamp: data.created_at,
+        read: false,
+        product_id: data.product_id,
+        product_title: data.product_title
+      });
+    });
+
+    source.addEventListener('stock_change', event => {
+      const data = JSON.parse((event as MessageEvent).data);
+      const count = data.products.length;
+      addNotification({
+        id: Number((event as MessageEvent).lastEventId),
+        type: 'stock_change',
+        title: 'Estoque Atualizado',
+        message: count === 1
+          ? `Estoque do produto foi atualizado para ${data.products[0].available} unidades.`
+          : `Estoque de ${count} produtos foi atualizado.`,
+        timestamp: data.created_at,
+        read: false,
+        product_id: count === 1 ? data.products[0].product_id : undefined
+      });
+    });
+
+    source.addEventListener('sync_job', event => {
+      const job = JSON.parse((event as MessageEvent).data);
+      // Apenas o fim da sincronização vira notificação; o progresso é exibido no dashboard
+      if (job.status !== 'done' && job.status !== 'failed') {
+        return;
+      }
+      addNotification({
+        id: Number((event as MessageEvent).lastEventId),
+        type: 'system',
+        title: job.status === 'done' ? 'Sincronização Concluída' : 'Falha na Sincronização',
+        message: job.status === 'done'
+          ? 'Sincronização com Mercado Livre concluída com sucesso.'
+          : `Sincronização com Mercado Livre falhou: ${job.error_message}`,
+        timestamp: job.created_at,
+        read: false
+      });
+    });
+
+    return () => source.close();
   }, []);
 
   useEffect(() => {
@@ -30,71 +96,12 @@ const NotificationsComponent: React.FC = () => {
     setUnreadCount(count);
   }, [notifications]);
 
-  const fetchNotifications = async () => {
-    try {
-      setLoading(true);
-      
-      // Em uma implementação real, buscaríamos as notificações do backend
-      // Por enquanto, vamos gerar dados de exemplo
-      
-      const mockNotifications: Notification[] = [
-        {
-          id: 1,
-          type: 'low_stock',
-          title: 'Estoque Baixo',
-          message: 'Smartphone Galaxy A54 está com apenas 2 unidades disponíveis.',
-          timestamp: new Date(Date.now() - 1000 * 60 * 30).toISOString(), // 30 minutos atrás
-          read: false,
-          product_id: 1,
-          product_title: 'Smartphone Galaxy A54'
-        },
-        {
-          id: 2,
-          type: 'low_stock',
-          title: 'Estoque Baixo',
-          message: 'Fone de Ouvido JBL está com apenas 3 unidades disponíveis.',
-          timestamp: new Date(Date.now() - 1000 * 60 * 120).toISOString(), // 2 horas atrás
-          read: false,
-          product_id: 4,
-          product_title: 'Fone de Ouvido JBL'
-        },
-        {
-          id: 3,
-          type: 'stock_change',
-          title: 'Estoque Atualizado',
-          message: 'Estoque de Notebook Dell Inspiron foi atualizado para 15 unidades.',
-          timestamp: new Date(Date.now() - 1000 * 60 * 60 * 5).toISOString(), // 5 horas atrás
-          read: true,
-          product_id: 2,
-          product_title: 'Notebook Dell Inspiron'
-        },
-        {
-          id: 4,
-          type: 'system',
-          title: 'Sincronização Concluída',
-          message: 'Sincronização com Mercado Livre concluída com sucesso.',
-          timestamp: new Date(Date.now() - 1000 * 60 * 60 * 12).toISOString(), // 12 horas atrás
-          read: true
-        },
-        {
-          id: 5,
-          type: 'low_stock',
-          title: 'Estoque Crítico',
-          message: 'Câmera Canon EOS está com estoque zerado!',
-          timestamp: new Date(Date.now() - 1000 * 60 * 10).toISOString(), // 10 minutos atrás
-          read: false,
-          product_id: 5,
-          product_title: 'Câmera Canon EOS'
-        }
-      ];
-      
-      setNotifications(mockNotifications);
-      setLoading(false);
-    } catch (err) {
-      console.error('Erro ao buscar notificações:', err);
-      setError('Não foi possível carregar as notificações. Tente novamente mais tarde.');
-      setLoading(false);
-    }
+  const addNotification = (notification: Notification) => {
+    setNotifications(prev =>
+      prev.some(n => n.id === notification.id)
+        ? prev
+        : [notification, ...prev].slice(0, MAX_NOTIFICATIONS)
+    );
   };
 
   const handleToggleNotifications = () => {
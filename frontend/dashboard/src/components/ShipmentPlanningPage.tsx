@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { getProducts } from '../services/api';
+import { getProducts, getReplenishment, createShipment } from '../services/api';
 import '../App.css';
 
 interface Product {
@@ -22,6 +22,16 @@ interface ShipmentItem {
   quantity: number;
 }
 
+interface ReplenishmentSuggestion {
+  product_id: number;
+  sku: string;
+  title: string;
+  available: number;
+  daily_velocity: number;
+  days_of_cover: number | null;
+  suggested_quantity: number;
+}
+
 interface Shipment {
   id?: number;
   status: 'draft' | 'pending' | 'in_transit' | 'delivered' | 'cancelled';
@@ -47,7 +57,7 @@ const ShipmentPlanningPage: React.FC = () => {
     destination_warehouse: '',
     notes: ''
   });
-  const [lowStockProducts, setLowStockProducts] = useState<Product[]>([]);
+  const [suggestions, setSuggestions] = useState<ReplenishmentSuggestion[]>([]);
   const [warehouses, setWarehouses] = useState<string[]>([
     'CD São Paulo - Vila Guilherme',
     'CD Cajamar',
@@ -58,15 +68,18 @@ const ShipmentPlanningPage: React.FC = () => {
 
   useEffect(() => {
     fetchProducts();
+    fetchSuggestions();
   }, []);
 
-  useEffect(() => {
-    // Identificar produtos com estoque baixo (menos de 5 unidades)
-    if (products.length > 0) {
-      const lowStock = products.filter(product => product.stock.available < 5);
-      setLowStockProducts(lowStock);
+  const fetchSuggestions = async () => {
+    try {
+      // Produtos que precisam de reposição, calculados pelo backend a partir da velocidade de venda
+      const { data } = await getReplenishment();
+      setSuggestions(data.products);
+    } catch (err) {
+      console.error('Erro ao buscar sugestões de reposição:', err);
     }
-  }, [products]);
+  };
 
   const fetchProducts = async () => {
     try {
@@ -104,6 +117,16 @@ const ShipmentPlanningPage: React.FC = () => {
     }
   };
 
+  const handleAddSuggestion = (suggestion: ReplenishmentSuggestion) => {
+    setShipment(prev => ({
+      ...prev,
+      items: [
+        ...prev.items.filter(item => item.product_id !== suggestion.product_id),
+        { product_id: suggestion.product_id, quantity: suggestion.suggested_quantity }
+      ]
+    }));
+  };
+
   const handleRemoveProduct = (productId: number) => {
     setShipment(prev => ({
       ...prev,
@@ -153,25 +176,15 @@ const ShipmentPlanningPage: React.FC = () => {
     try {
       setSubmitting(true);
       
-      // Em uma implementação real, enviaríamos os dados para o backend
-      // Por enquanto, apenas simular o envio
-      
-      // Simular atraso de processamento
-      await new Promise(resolve => setTimeout(resolve, 1500));
-      
-      // Simular resposta de sucesso
-      const mockResponse = {
-        id: Math.floor(Math.random() * 10000),
+      const { data } = await createShipment({
         status: 'pending',
-        created_at: new Date().toISOString(),
-        updated_at: new Date().toISOString(),
-        estimated_delivery: new Date(Date.now() + 1000 * 60 * 60 * 24 * 3).toISOString(), // 3 dias depois
-        tracking_number: `MLSHIP${Math.floor(Math.random() * 1000000)}`,
-        ...shipment
-      };
+        destination_warehouse: shipment.destination_warehouse,
+        notes: shipment.notes,
+        items: shipment.items
+      });
       
       // Exibir mensagem de sucesso
-      setSuccessMessage(`Envio #${mockResponse.id} criado com sucesso! Número de rastreamento: ${mockResponse.tracking_number}`);
+      setSuccessMessage(`Envio #${data.shipment.id} criado com sucesso!`);
       
       // Resetar formulário
       setShipment({
@@ -181,8 +194,9 @@ const ShipmentPlanningPage: React.FC = () => {
         notes: ''
       });
       
-      // Atualizar lista de produtos para refletir o novo estoque
+      // Atualizar produtos e sugestões com o estoque agora a caminho
       fetchProducts();
+      fetchSuggestions();
       
     } catch (err) {
       console.error('Erro ao criar envio:', err);
@@ -237,23 +251,24 @@ const ShipmentPlanningPage: React.FC = () => {
             />
           </div>
           
-          {lowStockProducts.length > 0 && (
+          {suggestions.length > 0 && (
             <div className="low-stock-recommendations">
-              <h4>Produtos Recomendados (Estoque Baixo)</h4>
+              <h4>Produtos Recomendados (Reposição Sugerida)</h4>
               <ul>
-                {lowStockProducts.map(product => (
-                  <li key={`low-${product.id}`}>
+                {suggestions.map(suggestion => (
+                  <li key={`low-${suggestion.product_id}`}>
                     <div className="product-info">
-                      <span className="product-title">{product.title}</span>
+                      <span className="product-title">{suggestion.title}</span>
                       <span className="product-stock low-stock">
-                        {product.stock.available} disponíveis
+                        {suggestion.available} disponíveis
+                        {suggestion.days_of_cover !== null && ` (${suggestion.days_of_cover} dias de cobertura)`}
                       </span>
                     </div>
                     <button 
                       className="btn-add"
-                      onClick={() => handleAddProduct(product.id)}
+                      onClick={() => handleAddSuggestion(suggestion)}
                     >
-                      Adicionar
+                      Adicionar {suggestion.suggested_quantity}
                     </button>
                   </li>
                 ))}
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { getProducts } from '../services/api';
+import { getShipments, getShipment, updateShipment } from '../services/api';
 import '../App.css';
 
 interface Product {
@@ -26,7 +26,9 @@ interface Shipment {
   tracking_number: string;
   destination_warehouse: string;
   notes: string;
-  items: {
+  items_count?: number;
+  total_items?: number;
+  items?: {
     product_id: number;
     product_title: string;
     quantity: number;
@@ -47,71 +49,8 @@ const ShipmentTrackingPage: React.FC = () => {
   const fetchShipments = async () => {
     try {
       setLoading(true);
-      
-      // Em uma implementação real, buscaríamos os envios do backend
-      // Por enquanto, vamos gerar dados de exemplo
-      
-      const mockShipments: Shipment[] = [
-        {
-          id: 1001,
-          status: 'in_transit',
-          created_at: new Date(Date.now() - 1000 * 60 * 60 * 24 * 2).toISOString(), // 2 dias atrás
-          updated_at: new Date(Date.now() - 1000 * 60 * 60 * 12).toISOString(), // 12 horas atrás
-          estimated_delivery: new Date(Date.now() + 1000 * 60 * 60 * 24 * 1).toISOString(), // 1 dia depois
-          tracking_number: 'MLSHIP123456',
-          destination_warehouse: 'CD São Paulo - Vila Guilherme',
-          notes: 'Reposição de produtos com estoque baixo',
-          items: [
-            { product_id: 1, product_title: 'Smartphone Galaxy A54', quantity: 10 },
-            { product_id: 4, product_title: 'Fone de Ouvido JBL', quantity: 15 }
-          ]
-        },
-        {
-          id: 1002,
-          status: 'delivered',
-          created_at: new Date(Date.now() - 1000 * 60 * 60 * 24 * 7).toISOString(), // 7 dias atrás
-          updated_at: new Date(Date.now() - 1000 * 60 * 60 * 24 * 5).toISOString(), // 5 dias atrás
-          estimated_delivery: new Date(Date.now() - 1000 * 60 * 60 * 24 * 4).toISOString(), // 4 dias atrás
-          tracking_number: 'MLSHIP789012',
-          destination_warehouse: 'CD Cajamar',
-          notes: 'Envio mensal programado',
-          items: [
-            { product_id: 2, product_title: 'Notebook Dell Inspiron', quantity: 5 },
-            { product_id: 3, product_title: 'Smart TV LG 50"', quantity: 3 },
-            { product_id: 5, product_title: 'Câmera Canon EOS', quantity: 8 }
-          ]
-        },
-        {
-          id: 1003,
-          status: 'pending',
-          created_at: new Date(Date.now() - 1000 * 60 * 60 * 6).toISOString(), // 6 horas atrás
-          updated_at: new Date(Date.now() - 1000 * 60 * 60 * 6).toISOString(), // 6 horas atrás
-          estimated_delivery: new Date(Date.now() + 1000 * 60 * 60 * 24 * 3).toISOString(), // 3 dias depois
-          tracking_number: 'MLSHIP345678',
-          destination_warehouse: 'CD Rio de Janeiro',
-          notes: 'Produtos para campanha promocional',
-          items: [
-            { product_id: 1, product_title: 'Smartphone Galaxy A54', quantity: 20 },
-            { product_id: 4, product_title: 'Fone de Ouvido JBL', quantity: 30 }
-          ]
-        },
-        {
-          id: 1004,
-          status: 'draft',
-          created_at: new Date(Date.now() - 1000 * 60 * 30).toISOString(), // 30 minutos atrás
-          updated_at: new Date(Date.now() - 1000 * 60 * 30).toISOString(), // 30 minutos atrás
-          estimated_delivery: '',
-          tracking_number: '',
-          destination_warehouse: 'CD Extrema',
-          notes: 'Rascunho - Reposição programada',
-          items: [
-            { product_id: 2, product_title: 'Notebook Dell Inspiron', quantity: 8 },
-            { product_id: 5, product_title: 'Câmera Canon EOS', quantity: 12 }
-          ]
-        }
-      ];
-      
-      setShipments(mockShipments);
+      const { data } = await getShipments();
+      setShipments(data.shipments);
       setLoading(false);
     } catch (err) {
       console.error('Erro ao buscar envios:', err);
@@ -120,8 +59,26 @@ const ShipmentTrackingPage: React.FC = () => {
     }
   };
 
-  const handleViewDetails = (shipment: Shipment) => {
-    setSelectedShipment(shipment);
+  const handleViewDetails = async (shipment: Shipment) => {
+    try {
+      // A listagem traz apenas os totais; os itens vêm com o detalhe do envio
+      const { data } = await getShipment(shipment.id);
+      setSelectedShipment(data);
+    } catch (err) {
+      console.error('Erro ao buscar envio:', err);
+      setError('Não foi possível carregar o envio. Tente novamente mais tarde.');
+    }
+  };
+
+  const handleUpdateStatus = async (shipmentId: number, status: Shipment['status']) => {
+    try {
+      await updateShipment(shipmentId, { status });
+      setSelectedShipment(null);
+      fetchShipments();
+    } catch (err) {
+      console.error('Erro ao atualizar envio:', err);
+      setError('Não foi possível atualizar o envio. Tente novamente mais tarde.');
+    }
   };
 
   const handleCloseDetails = () => {
@@ -169,7 +126,7 @@ const ShipmentTrackingPage: React.FC = () => {
   };
 
   const getTotalItems = (shipment: Shipment) => {
-    return shipment.items.reduce((sum, item) => sum + item.quantity, 0);
+    return shipment.total_items ?? (shipment.items || []).reduce((sum, item) => sum + item.quantity, 0);
   };
 
   const filteredShipments = statusFilter === 'all' 
@@ -233,7 +190,7 @@ const ShipmentTrackingPage: React.FC = () => {
                   <td>{formatDate(shipment.created_at)}</td>
                   <td>{shipment.destination_warehouse}</td>
                   <td>{shipment.tracking_number || 'N/A'}</td>
-                  <td>{shipment.items.length} produtos ({getTotalItems(shipment)} itens)</td>
+                  <td>{shipment.items_count ?? (shipment.items || []).length} produtos ({getTotalItems(shipment)} itens)</td>
                   <td>{shipment.estimated_delivery ? formatDate(shipment.estimated_delivery) : 'N/A'}</td>
                   <td>
                     <button 
@@ -302,7 +259,7 @@ const ShipmentTrackingPage: React.FC = () => {
                     </tr>
                   </thead>
                   <tbody>
-                    {selectedShipment.items.map((item, index) => (
+                    {(selectedShipment.items || []).map((item, index) => (
                       <tr key={index}>
                         <td>{item.product_title}</td>
                         <td>{item.quantity}</td>
@@ -360,11 +317,11 @@ const ShipmentTrackingPage: React.FC = () => {
               {selectedShipment.status === 'draft' && (
                 <>
                   <button className="btn-secondary">Editar</button>
-                  <button className="btn-primary">Confirmar Envio</button>
+                  <button className="btn-primary" onClick={() => handleUpdateStatus(selectedShipment.id, 'pending')}>Confirmar Envio</button>
                 </>
               )}
               {selectedShipment.status === 'pending' && (
-                <button className="btn-secondary">Cancelar Envio</button>
+                <button className="btn-secondary" onClick={() => handleUpdateStatus(selectedShipment.id, 'cancelled')}>Cancelar Envio</button>
               )}
               <button className="btn-secondary" onClick={handleCloseDetails}>Fechar</button>
             </div>
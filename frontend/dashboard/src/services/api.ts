@@ -50,6 +50,9 @@ export const getActivities = (type = 'all', period = 'week') => api.get(`/activi
 export const getSalesChart = () => api.get('/charts/sales');
 export const getStockChart = () => api.get('/charts/stock');
 
+// Reposição
+export const getReplenishment = (suggestedOnly = true) => api.get(`/replenishment?suggested_only=${suggestedOnly}`);
+
 // Alertas
 export const getAlerts = () => api.get('/alerts');
 export const getAlertSettings = () => api.get('/alerts/settings');
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Histórico de atividades (vendas, ajustes e atualizações de estoque) em uma única consulta."""
+
+from sqlalchemy import Integer, String, cast, literal, null, select, union_all
+
+from .models import db, Product, Sale, StockAdjustment
+from .pagination import keyset_before
+from .stock import stock_history_selects
+
+# Tipos de atividade aceitos no filtro e as fontes que cada um consulta
+ACTIVITY_SOURCES = {
+    'all': ('sale', 'adjustment', 'stock_change'),
+    'sale': ('sale',),
+    'adjustment': ('adjustment',),
+    'stock_change': ('stock_change',)
+}
+
+def _empty(column_type, name):
+    """Coluna nula tipada, para alinhar as colunas das fontes no UNION ALL."""
+    return cast(null(), column_type).label(name)
+
+def _page(kind, query, cursor, limit):
+    """Restringe uma fonte à página pedida: cursor, ordenação e limite aplicados na própria fonte.
+
+    O tipo é constante em cada fonte, então a ordenação fica só em (timestamp, id)
+    e cada parte do UNION ALL lê no máximo `limit` linhas pelo índice.
+    """
+    timestamp = query.selected_columns.timestamp
+    row_id = query.selected_columns.id
+    if cursor:
+        query = query.where(keyset_before(cursor, kind, timestamp, row_id))
+    # O SQLite não aceita ORDER BY/LIMIT diretamente nas partes de um UNION
+    return query.order_by(timestamp.desc(), row_id.desc()).limit(limit).subquery()
+
+def _sales(user_id, since, cursor, limit):
+    page = _page('sale', select(
+        Sale.id,
+        Sale.sale_timestamp.label('timestamp'),
+        Sale.product_id,
+        Sale.quantity_sold,
+        Sale.ml_order_id
+    ).join(
+        Product, Product.id == Sale.product_id
+    ).where(
+        Product.user_id == user_id,
+        Sale.sale_timestamp >= since
+    ), cursor, limit)
+    return select(
+        literal('sale').label('kind'),
+        page.c.id,
+        page.c.timestamp,
+        page.c.product_id,
+        page.c.quantity_sold.label('quantity'),
+        _empty(Integer, 'available_quantity'),
+        _empty(Integer, 'total_quantity'),
+        page.c.ml_order_id.label('reference'),
+        _empty(String, 'adjustment_type'),
+        _empty(String, 'reason')
+    )
+
+def _adjustments(user_id, since, cursor, limit):
+    page = _page('adjustment', select(
+        StockAdjustment.id,
+        StockAdjustment.adjustment_timestamp.label('timestamp'),
+        StockAdjustment.product_id,
+        StockAdjustment.quantity,
+        StockAdjustment.adjustment_type,
+        StockAdjustment.reason
+    ).join(
+        Product, Product.id == StockAdjustment.product_id
+    ).where(
+        Product.user_id == user_id,
+        StockAdjustment.adjustment_timestamp >= since
+    ), cursor, limit)
+    return select(
+        literal('adjustment').label('kind'),
+        page.c.id,
+        page.c.timestamp,
+        page.c.product_id,
+        page.c.quantity,
+        _empty(Integer, 'available_quantity'),
+        _empty(Integer, 'total_quantity'),
+        _empty(String, 'reference'),
+        page.c.adjustment_type,
+        page.c.reason
+    )
+
+def _stock_changes(user_id, since, cursor, limit, raw_days, hourly_days):
+    """Uma fonte por camada do histórico de estoque; o tipo é a camada ('raw', 'hour' ou 'day')."""
+    sources = []
+    for tier, history_select in stock_history_selects(since, raw_days, hourly_days, user_id=user_id):
+        page = _page(tier, history_select, cursor, limit)
+        sources.append(select(
+            page.c.tier.label('kind'),
+            page.c.id,
+            page.c.timestamp,
+            page.c.product_id,
+            _empty(Integer, 'quantity'),
+            page.c.available_quantity,
+            page.c.total_quantity,
+            _empty(String, 'reference'),
+            _empty(String, 'adjustment_type'),
+            _empty(String, 'reason')
+        ))
+    return sources
+
+def activity_feed(user_id, since, activity_type='all', cursor=None, limit=50, raw_days=7, hourly_days=90):
+    """Retorna até `limit` atividades do usuário (todas, com None) desde `since`, mais recentes primeiro.
+
+    Todas as fontes são combinadas em um único UNION ALL, com ordenação por
+    (timestamp, tipo, id) e LIMIT feitos no banco; `cursor` é a chave da última
+    atividade da página anterior. Cada linha traz kind, id, timestamp, product_id,
+    quantity, available_quantity, total_quantity, reference, adjustment_type,
+    reason e product_title.
+    """
+    sources = []
+    for source in ACTIVITY_SOURCES.get(activity_type, ()):
+        if source == 'sale':
+            sources.append(_sales(user_id, since, cursor, limit))
+        elif source == 'adjustment':
+            sources.append(_adjustments(user_id, since, cursor, limit))
+        else:
+            sources.extend(_stock_changes(user_id, since, cursor, limit, raw_days, hourly_days))
+
+    if not sources:
+        return []
+
+    feed = (union_all(*sources) if len(sources) > 1 else sources[0]).subquery()
+
+    return db.session.query(
+        feed,
+        Product.title.label('product_title')
+    ).join(
+        Product, Product.id == feed.c.product_id
+    ).order_by(
+        feed.c.timestamp.desc(),
+        feed.c.kind.desc(),
+        feed.c.id.desc()
+    ).limit(limit).all()
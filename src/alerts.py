@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Alertas de estoque baixo, avaliados a cada gravação do estoque atual.
+
+Cada produto tem no máximo um alerta aberto. O alerta é aberto quando o estoque
+disponível fica abaixo do limite (do produto ou global do usuário) e resolvido
+quando volta ao normal, sem percorrer o histórico de estoque.
+"""
+
+from datetime import datetime
+
+from .cache import bump_data_version
+from .events import publish_event
+from .models import db, AlertSettings, Product, ProductAlertThreshold, ProductStock, StockAlert, User
+
+# Limite padrão de estoque baixo, usado enquanto o usuário não configura os alertas
+DEFAULT_ALERT_THRESHOLD = 5
+
+# Quantidade de produtos por consulta IN na avaliação dos alertas
+ALERT_PRODUCT_CHUNK = 500
+
+def get_alert_settings(user_id):
+    """Retorna as configurações de alertas do usuário (valores padrão, não gravados, se não houver)."""
+    settings = db.session.get(AlertSettings, user_id)
+    if settings is None:
+        settings = AlertSettings(
+            user_id=user_id,
+            enabled=True,
+            threshold=DEFAULT_ALERT_THRESHOLD,
+            notification_dashboard=True
+        )
+    return settings
+
+def _low_stock_message(title, available):
+    if available <= 0:
+        return f"{title} está com estoque zerado!"
+    return f"{title} está com apenas {available} unidades disponíveis."
+
+def serialize_alert(alert, product_title):
+    """Converte um alerta em dicionário para a resposta da API."""
+    return {
+        "id": alert.id,
+        "type": alert.alert_type,
+        "status": alert.status,
+        "title": "Estoque Crítico" if alert.available_quantity <= 0 else "Estoque Baixo",
+        "message": _low_stock_message(product_title, alert.available_quantity),
+        "timestamp": alert.created_at.isoformat(),
+        "resolved_at": alert.resolved_at.isoformat() if alert.resolved_at else None,
+        "read": alert.read,
+        "product_id": alert.product_id,
+        "product_title": product_title,
+        "available": alert.available_quantity,
+        "threshold": alert.threshold
+    }
+
+def evaluate_stock_alerts(user_id, stocks, settings=None):
+    """Abre ou resolve os alertas dos produtos a partir do estoque atual informado.
+
+    `stocks` são os ProductStock alterados na transação atual. Os limites por
+    produto e os alertas abertos são carregados em lotes pelas chaves indexadas;
+    as alterações ficam na sessão e são gravadas no commit de quem chamou.
+    Retorna uma tupla (abertos, resolvidos).
+    """
+    if not stocks:
+        return [], []
+    if settings is None:
+        settings = get_alert_settings(user_id)
+
+    product_ids = [current.product_id for current in stocks]
+    thresholds = {}
+    open_alerts = {}
+    for start in range(0, len(product_ids), ALERT_PRODUCT_CHUNK):
+        chunk = product_ids[start:start + ALERT_PRODUCT_CHUNK]
+        thresholds.update(db.session.query(
+            ProductAlertThreshold.product_id, ProductAlertThreshold.threshold
+        ).filter(ProductAlertThreshold.product_id.in_(chunk)))
+        open_alerts.update(
+            (alert.product_id, alert)
+            for alert in StockAlert.query.filter(
+                StockAlert.product_id.in_(chunk),
+                StockAlert.status == 'open'
+            )
+        )
+
+    now = datetime.utcnow()
+    opened = []
+    resolved = []
+    for current in stocks:
+        threshold = thresholds.get(current.product_id, settings.threshold)
+        alert = open_alerts.get(current.product_id)
+        is_low = settings.enabled and current.available_quantity < threshold
+
+        if is_low and alert is None:
+            alert = StockAlert(
+                user_id=user_id,
+                product_id=current.product_id,
+                alert_type='low_stock',
+                status='open',
+                threshold=threshold,
+                available_quantity=current.available_quantity,
+                created_at=now
+            )
+            db.session.add(alert)
+            opened.append(alert)
+        elif is_low:
+            alert.threshold = threshold
+            alert.available_quantity = current.available_quantity
+        elif alert is not None:
+            alert.status = 'resolved'
+            alert.available_quantity = current.available_quantity
+            alert.resolved_at = now
+            resolved.append(alert)
+
+    if settings.notification_dashboard and (opened or resolved):
+        _publish_alert_events(user_id, opened, resolved)
+
+    return opened, resolved
+
+def _publish_alert_events(user_id, opened, resolved):
+    """Publica os alertas abertos e resolvidos para o dashboard."""
+    # Os ids dos novos alertas são necessários no evento
+    db.session.flush()
+    titles = dict(db.session.query(Product.id, Product.title).filter(
+        Product.id.in_([alert.product_id for alert in opened + resolved])
+    ))
+    for alert in opened:
+        publish_event(user_id, 'low_stock', serialize_alert(alert, titles.get(alert.product_id)))
+    for alert in resolved:
+        publish_event(user_id, 'alert_resolved', {"id": alert.id, "product_id": alert.product_id})
+
+def reevaluate_user_alerts(user_id, settings=None):
+    """Reavalia os alertas de todos os produtos do usuário pelo estoque atual.
+
+    Usada quando os limites mudam e para abrir os alertas de bancos já existentes.
+    Retorna uma tupla (abertos, resolvidos).
+    """
+    stocks = ProductStock.query.join(
+        Product, Product.id == ProductStock.product_id
+    ).filter(Product.user_id == user_id).all()
+    return evaluate_stock_alerts(user_id, stocks, settings)
+
+def backfill_stock_alerts():
+    """Abre os alertas de estoque baixo de todos os usuários a partir do estoque atual.
+
+    Necessário uma vez em bancos já existentes; depois disso os alertas são
+    mantidos na gravação do estoque. Retorna a quantidade de alertas abertos.
+    """
+    opened_count = 0
+    for (user_id,) in db.session.query(User.id).all():
+        opened, resolved = reevaluate_user_alerts(user_id)
+        if opened or resolved:
+            bump_data_version(user_id)
+        db.session.commit()
+        opened_count += len(opened)
+    return opened_count
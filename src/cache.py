@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Cache por usuário de respostas calculadas, invalidado pela versão dos dados do usuário."""
+
+import threading
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from sqlalchemy.exc import IntegrityError
+
+from .models import db, UserDataVersion
+
+# Entradas em memória: (nome, user_id) -> (versão, chave, valor)
+_cache = {}
+_cache_lock = threading.Lock()
+
+def get_data_version(user_id):
+    """Retorna a versão atual dos dados do usuário (0 se nunca houve gravação)."""
+    version = db.session.query(UserDataVersion.version).filter(
+        UserDataVersion.user_id == user_id
+    ).scalar()
+    return version or 0
+
+def bump_data_version(user_id):
+    """Incrementa a versão dos dados do usuário na transação atual.
+
+    Deve ser chamada em toda gravação que altera dados exibidos no dashboard; como a
+    versão fica no banco, a invalidação vale para todos os workers.
+    """
+    updated = db.session.query(UserDataVersion).filter(
+        UserDataVersion.user_id == user_id
+    ).update(
+        {"version": UserDataVersion.version + 1, "updated_at": datetime.utcnow()},
+        synchronize_session=False
+    )
+    if updated:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(UserDataVersion(user_id=user_id, version=1))
+    except IntegrityError:
+        # Outra transação criou a linha ao mesmo tempo
+        db.session.query(UserDataVersion).filter(
+            UserDataVersion.user_id == user_id
+        ).update({"version": UserDataVersion.version + 1}, synchronize_session=False)
+
+def cached_for_user(name, user_id, compute, key=None):
+    """Retorna o valor em cache para o usuário, recalculando-o se os dados mudaram.
+
+    `key` diferencia variações do mesmo valor (ex: o mês corrente); apenas a última
+    variação calculada fica em cache.
+    """
+    version = get_data_version(user_id)
+    with _cache_lock:
+        entry = _cache.get((name, user_id))
+    if entry is not None and entry[0] == version and entry[1] == key:
+        return entry[2]
+
+    value = compute()
+    with _cache_lock:
+        _cache[(name, user_id)] = (version, key, value)
+    return value
+
+def data_etag(user_id):
+    """ETag das respostas do usuário: muda a cada gravação (versão dos dados) e a cada dia.
+
+    O dia entra na ETag porque as janelas dos gráficos e listagens ("últimos N dias")
+    avançam mesmo sem novas gravações.
+    """
+    return f"u{user_id}-v{get_data_version(user_id)}-{datetime.utcnow().strftime('%Y%m%d')}"
+
+def conditional_get(view):
+    """Responde 304 a `If-None-Match` com a ETag atual do usuário, antes de executar a rota.
+
+    Respostas 200 recebem a ETag e `Cache-Control: private, no-cache`, para que o
+    navegador sempre revalide e reaproveite o corpo em cache enquanto os dados
+    do usuário não mudarem.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = session.get('user_id')
+        if not user_id:
+            return view(*args, **kwargs)
+
+        etag = data_etag(user_id)
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    return wrapper
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Comandos de linha de comando da aplicação (executados com `flask <comando>`)."""
+
+import time
+
+import click
+import requests
+from sqlalchemy import inspect, text
+
+from .alerts import backfill_stock_alerts
+from .events import prune_events
+from .models import db, ApiCredentials, Sale, StockAdjustment, StockLevel
+from .notifications import build_fake_notification, process_notifications
+from .scheduler import run_scheduler_tick
+from .sales import backfill_daily_sales
+from .shipments import backfill_in_transit
+from .stock import backfill_product_stock, compact_stock_history
+
+def _index_names(inspector, table_name):
+    """Nomes dos índices e restrições de unicidade existentes na tabela."""
+    names = {index['name'] for index in inspector.get_indexes(table_name)}
+    names |= {constraint['name'] for constraint in inspector.get_unique_constraints(table_name)}
+    return names
+
+def _missing_indexes(inspector, table):
+    """Índices declarados no modelo da tabela que ainda não existem no banco."""
+    existing = _index_names(inspector, table.name)
+    return [index for index in table.indexes if index.name not in existing]
+
+def upgrade_database():
+    """Aplica a um banco já existente as colunas e índices novos das tabelas antigas.
+
+    `db.create_all()` cria apenas as tabelas que faltam e nunca altera as existentes.
+    O comando é idempotente: cada alteração é aplicada só se ainda não existir.
+    Retorna a lista das alterações aplicadas.
+    """
+    db.create_all()
+    inspector = inspect(db.engine)
+    applied = []
+
+    with db.engine.begin() as connection:
+        # ID do vendedor no Mercado Livre, usado pelas notificações
+        columns = {column['name'] for column in inspector.get_columns('api_credentials')}
+        if 'ml_user_id' not in columns:
+            connection.execute(text("ALTER TABLE api_credentials ADD COLUMN ml_user_id VARCHAR(50)"))
+            applied.append("coluna api_credentials.ml_user_id")
+
+        # Inclui os índices (timestamp, id) usados na paginação de vendas e atividades
+        for model in (ApiCredentials, StockLevel, Sale, StockAdjustment):
+            for index in _missing_indexes(inspector, model.__table__):
+                index.create(connection)
+                applied.append(f"índice {index.name}")
+
+        # Uma venda por (pedido, produto): remover as duplicadas (ex: sincronizações
+        # simultâneas) antes de criar o índice único, mantendo a primeira gravada
+        removed_sales = 0
+        if '_order_product_uc' not in _index_names(inspector, 'sales'):
+            removed_sales = connection.execute(text(
+                "DELETE FROM sales WHERE id NOT IN "
+                "(SELECT MIN(id) FROM sales GROUP BY ml_order_id, product_id)"
+            )).rowcount
+            connection.execute(text("CREATE UNIQUE INDEX _order_product_uc ON sales (ml_order_id, product_id)"))
+            applied.append(f"índice único _order_product_uc ({removed_sales} vendas duplicadas removidas)")
+
+    if removed_sales:
+        # A consolidação diária ainda soma as vendas removidas
+        backfill_daily_sales()
+
+    return applied
+
+def analyze_database():
+    """Atualiza as estatísticas do planejador de consultas (SQLite e PostgreSQL).
+
+    Sem estatísticas o SQLite não sabe escolher entre os índices (timestamp, id) e
+    os de produto, e as listagens paginadas acabam ordenando a janela inteira.
+    Retorna False se o banco não suporta o comando.
+    """
+    if db.engine.dialect.name not in ('sqlite', 'postgresql'):
+        return False
+    with db.engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+    return True
+
+def register_commands(app):
+    """Registra os comandos de manutenção na aplicação Flask."""
+
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Atualiza o esquema de um banco existente (colunas e índices novos das tabelas antigas)."""
+        applied = upgrade_database()
+        if applied:
+            for change in applied:
+                click.echo(f"Aplicado: {change}")
+        else:
+            click.echo("Banco de dados já está atualizado.")
+
+    @app.cli.command('backfill-current-stock')
+    def backfill_current_stock_command():
+        """Preenche a tabela de estoque atual a partir do histórico de estoque."""
+        count = backfill_product_stock()
+        click.echo(f"Estoque atual reconstruído para {count} produtos.")
+
+    @app.cli.command('backfill-daily-sales')
+    def backfill_daily_sales_command():
+        """Reconstrói a consolidação diária de vendas a partir do histórico de vendas."""
+        count = backfill_daily_sales()
+        click.echo(f"Consolidação diária reconstruída: {count} linhas (produto, dia).")
+
+    @app.cli.command('backfill-stock-alerts')
+    def backfill_stock_alerts_command():
+        """Abre os alertas de estoque baixo a partir do estoque atual dos produtos."""
+        count = backfill_stock_alerts()
+        click.echo(f"{count} alertas de estoque baixo abertos.")
+
+    @app.cli.command('backfill-in-transit')
+    def backfill_in_transit_command():
+        """Reconstrói a quantidade em trânsito de cada produto a partir dos envios pendentes e em trânsito."""
+        count = backfill_in_transit()
+        click.echo(f"Quantidade em trânsito reconstruída para {count} produtos.")
+
+    @app.cli.command('compact-stock-history')
+    @click.option('--raw-days', type=int, default=None, help="Dias de histórico bruto mantidos (padrão: STOCK_RAW_RETENTION_DAYS).")
+    @click.option('--hourly-days', type=int, default=None, help="Dias de histórico por hora mantidos (padrão: STOCK_HOURLY_RETENTION_DAYS).")
+    def compact_stock_history_command(raw_days, hourly_days):
+        """Consolida o histórico de estoque antigo por hora e por dia, conforme a retenção configurada."""
+        raw_count, hourly_count = compact_stock_history(
+            raw_days if raw_days is not None else app.config.get('STOCK_RAW_RETENTION_DAYS', 7),
+            hourly_days if hourly_days is not None else app.config.get('STOCK_HOURLY_RETENTION_DAYS', 90)
+        )
+        click.echo(f"Histórico compactado: {raw_count} registros brutos consolidados por hora, {hourly_count} horas consolidadas por dia.")
+
+    @app.cli.command('analyze-db')
+    def analyze_db_command():
+        """Atualiza as estatísticas usadas pelo banco para escolher os índices das consultas."""
+        if analyze_database():
+            click.echo("Estatísticas do banco atualizadas.")
+        else:
+            click.echo(f"Banco {db.engine.dialect.name} não suportado; use a rotina de estatísticas do próprio banco.")
+
+    @app.cli.command('prune-events')
+    def prune_events_command():
+        """Remove os eventos em tempo real mais antigos que EVENTS_RETENTION_HOURS."""
+        count = prune_events(app.config.get('EVENTS_RETENTION_HOURS', 24))
+        click.echo(f"{count} eventos removidos.")
+
+    @app.cli.command('process-notifications')
+    @click.option('--loop', is_flag=True, help="Continua processando a fila até ser interrompido.")
+    def process_notifications_command(loop):
+        """Relê na API os recursos avisados pelas notificações do Mercado Livre."""
+        while True:
+            counts = process_notifications(
+                batch_size=app.config.get('ML_NOTIFICATIONS_BATCH_SIZE', 200),
+                debounce_seconds=app.config.get('ML_NOTIFICATIONS_DEBOUNCE_SECONDS', 5),
+                max_attempts=app.config.get('ML_NOTIFICATIONS_MAX_ATTEMPTS', 5),
+                stale_seconds=app.config.get('ML_NOTIFICATIONS_STALE_SECONDS', 300)
+            )
+            if counts["claimed"]:
+                click.echo(
+                    f"{counts['claimed']} recursos lidos: {counts['done']} concluídos, "
+                    f"{counts['retried']} reagendados, {counts['unknown_seller']} sem vendedor cadastrado."
+                )
+            if not loop:
+                break
+            # Descarta o estado da sessão entre os lotes
+            db.session.remove()
+            if not counts["claimed"]:
+                time.sleep(app.config.get('ML_NOTIFICATIONS_POLL_SECONDS', 2))
+
+    @app.cli.command('run-scheduler')
+    @click.option('--loop', is_flag=True, help="Executa um ciclo a cada STOCK_POLL_TICK_SECONDS até ser interrompido.")
+    def run_scheduler_command(loop):
+        """Lê o estoque dos produtos cuja leitura agendada venceu e reagenda cada um conforme a atividade."""
+        while True:
+            started = time.monotonic()
+            counts = run_scheduler_tick(
+                batch_size=app.config.get('STOCK_POLL_BATCH_SIZE', 500),
+                min_seconds=app.config.get('STOCK_POLL_MIN_SECONDS', 300),
+                max_seconds=app.config.get('STOCK_POLL_MAX_SECONDS', 21600),
+                window_days=app.config.get('STOCK_POLL_WINDOW_DAYS', 7)
+            )
+            if counts["polled"] or counts["failed"]:
+                click.echo(f"{counts['polled']} produtos lidos de {counts['users']} usuários, {counts['failed']} com falha.")
+            if not loop:
+                break
+            # Descarta o estado da sessão entre os ciclos
+            db.session.remove()
+            time.sleep(max(0, app.config.get('STOCK_POLL_TICK_SECONDS', 60) - (time.monotonic() - started)))
+
+    @app.cli.command('fake-notify')
+    @click.option('--ml-user-id', required=True, help="ID do vendedor no Mercado Livre.")
+    @click.option('--topic', default='items', show_default=True, help="Tópico da notificação (items, orders_v2, stock).")
+    @click.option('--resource', required=True, help="Recurso alterado (ex: /items/MLB123, /orders/2000001, /inventories/ABC123).")
+    @click.option('--repeat', type=int, default=1, show_default=True, help="Quantidade de notificações repetidas (simula uma rajada).")
+    @click.option('--url', default=None, help="URL do callback; sem ela, a notificação é entregue à aplicação local sem servidor HTTP.")
+    def fake_notify_command(ml_user_id, topic, resource, repeat, url):
+        """Envia notificações no formato do Mercado Livre ao callback, para testes locais."""
+        client = None if url else app.test_client()
+        for _ in range(repeat):
+            payload = build_fake_notification(ml_user_id, topic, resource, app.config.get('ML_APP_ID'))
+            if client:
+                response = client.post('/api/notifications/ml', json=payload)
+                status_code, body = response.status_code, response.get_json()
+            else:
+                response = requests.post(url, json=payload, timeout=10)
+                status_code, body = response.status_code, response.text
+            click.echo(f"{status_code} {body}")
@@ -24,3 +24,66 @@ ML_APP_ID = os.getenv("ML_APP_ID", "YOUR_APP_ID")
 ML_SECRET_KEY = os.getenv("ML_SECRET_KEY", "YOUR_SECRET_KEY")
 ML_REDIRECT_URI = os.getenv("ML_REDIRECT_URI", "http://localhost:5000/callback") # Ajustar conforme a hospedagem
 
+# Número máximo de requisições simultâneas à API do Mercado Livre durante a sincronização
+ML_SYNC_MAX_WORKERS = int(os.getenv("ML_SYNC_MAX_WORKERS", "8"))
+
+# Sessão HTTP compartilhada com a API do Mercado Livre
+ML_HTTP_POOL_SIZE = int(os.getenv("ML_HTTP_POOL_SIZE", "20")) # Conexões mantidas abertas por host
+ML_HTTP_CONNECT_TIMEOUT = float(os.getenv("ML_HTTP_CONNECT_TIMEOUT", "5")) # Segundos
+ML_HTTP_READ_TIMEOUT = float(os.getenv("ML_HTTP_READ_TIMEOUT", "30")) # Segundos
+ML_HTTP_MAX_RETRIES = int(os.getenv("ML_HTTP_MAX_RETRIES", "3")) # Novas tentativas para GETs com falha transitória
+ML_HTTP_BACKOFF_FACTOR = float(os.getenv("ML_HTTP_BACKOFF_FACTOR", "0.5")) # Base do backoff exponencial (segundos)
+
+# Limite de taxa das chamadas ao Mercado Livre (token bucket)
+ML_RATE_LIMIT_PER_SECOND = float(os.getenv("ML_RATE_LIMIT_PER_SECOND", "15")) # Requisições por segundo
+ML_RATE_LIMIT_BURST = int(os.getenv("ML_RATE_LIMIT_BURST", "30")) # Tamanho máximo da rajada
+# Arquivo SQLite para dividir o limite entre os workers do gunicorn (vazio: limite por processo)
+ML_RATE_LIMIT_STORE = os.getenv("ML_RATE_LIMIT_STORE", "")
+
+# Diretório dos arquivos de lock usados para renovar o token OAuth uma única vez entre workers
+ML_TOKEN_LOCK_DIR = os.getenv("ML_TOKEN_LOCK_DIR", "")
+
+# Jobs de sincronização em segundo plano
+ML_SYNC_JOB_WORKERS = int(os.getenv("ML_SYNC_JOB_WORKERS", "2")) # Jobs executados ao mesmo tempo por processo
+ML_SYNC_JOB_STALE_SECONDS = int(os.getenv("ML_SYNC_JOB_STALE_SECONDS", "600")) # Job sem progresso é considerado abandonado
+ML_SYNC_JOB_QUEUE_TIMEOUT_SECONDS = int(os.getenv("ML_SYNC_JOB_QUEUE_TIMEOUT_SECONDS", "1800")) # Job na fila sem iniciar é considerado abandonado
+
+# Retenção do histórico de estoque: registros brutos, depois consolidados por hora e, por fim, por dia
+STOCK_RAW_RETENTION_DAYS = int(os.getenv("STOCK_RAW_RETENTION_DAYS", "7"))
+STOCK_HOURLY_RETENTION_DAYS = int(os.getenv("STOCK_HOURLY_RETENTION_DAYS", "90"))
+
+# Eventos em tempo real (SSE): duração de cada conexão, intervalo de consulta entre workers e retenção (horas)
+EVENTS_STREAM_SECONDS = int(os.getenv("EVENTS_STREAM_SECONDS", "25"))
+EVENTS_POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "2"))
+EVENTS_RETENTION_HOURS = int(os.getenv("EVENTS_RETENTION_HOURS", "24"))
+
+# Sugestão de reposição: prazo até a chegada ao Full, estoque de segurança e cobertura após a chegada (dias)
+REPLENISHMENT_LEAD_TIME_DAYS = int(os.getenv("REPLENISHMENT_LEAD_TIME_DAYS", "14"))
+REPLENISHMENT_SAFETY_DAYS = int(os.getenv("REPLENISHMENT_SAFETY_DAYS", "7"))
+REPLENISHMENT_COVERAGE_DAYS = int(os.getenv("REPLENISHMENT_COVERAGE_DAYS", "30"))
+
+# Fila de notificações do Mercado Livre: registros lidos por vez, espera para agrupar rajadas (segundos),
+# tentativas por recurso, tempo até um registro em processamento ser considerado abandonado e intervalo do worker
+ML_NOTIFICATIONS_BATCH_SIZE = int(os.getenv("ML_NOTIFICATIONS_BATCH_SIZE", "200"))
+ML_NOTIFICATIONS_DEBOUNCE_SECONDS = float(os.getenv("ML_NOTIFICATIONS_DEBOUNCE_SECONDS", "5"))
+ML_NOTIFICATIONS_MAX_ATTEMPTS = int(os.getenv("ML_NOTIFICATIONS_MAX_ATTEMPTS", "5"))
+ML_NOTIFICATIONS_STALE_SECONDS = int(os.getenv("ML_NOTIFICATIONS_STALE_SECONDS", "300"))
+ML_NOTIFICATIONS_POLL_SECONDS = float(os.getenv("ML_NOTIFICATIONS_POLL_SECONDS", "2"))
+
+# Leitura agendada do estoque (flask run-scheduler): produtos lidos por ciclo, intervalo mínimo e máximo
+# entre leituras de um produto (segundos), janela de atividade usada no cálculo (dias; até STOCK_RAW_RETENTION_DAYS)
+# e intervalo entre ciclos (segundos)
+STOCK_POLL_BATCH_SIZE = int(os.getenv("STOCK_POLL_BATCH_SIZE", "500"))
+STOCK_POLL_MIN_SECONDS = int(os.getenv("STOCK_POLL_MIN_SECONDS", "300"))
+STOCK_POLL_MAX_SECONDS = int(os.getenv("STOCK_POLL_MAX_SECONDS", "21600"))
+STOCK_POLL_WINDOW_DAYS = int(os.getenv("STOCK_POLL_WINDOW_DAYS", "7"))
+STOCK_POLL_TICK_SECONDS = float(os.getenv("STOCK_POLL_TICK_SECONDS", "60"))
+
+# Cache das respostas GET do Mercado Livre: limite em memória por processo (MB), validade por tipo de
+# recurso (segundos; 0 guarda apenas para revalidar pela ETag) e arquivo SQLite dividido entre os workers (vazio: só memória)
+ML_CACHE_MAX_MB = int(os.getenv("ML_CACHE_MAX_MB", "32"))
+ML_CACHE_TTL_USER = int(os.getenv("ML_CACHE_TTL_USER", "3600"))
+ML_CACHE_TTL_ITEMS = int(os.getenv("ML_CACHE_TTL_ITEMS", "300"))
+ML_CACHE_TTL_ORDERS = int(os.getenv("ML_CACHE_TTL_ORDERS", "60"))
+ML_CACHE_TTL_STOCK = int(os.getenv("ML_CACHE_TTL_STOCK", "0"))
+ML_CACHE_STORE = os.getenv("ML_CACHE_STORE", "")
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Eventos em tempo real para o dashboard, entregues por Server-Sent Events.
+
+Os eventos são gravados na tabela user_events na mesma transação dos dados que
+os originaram. Streams do mesmo processo são acordados logo após o commit
+(pub/sub em memória); streams de outros workers do gunicorn os encontram
+consultando a tabela a cada EVENTS_POLL_SECONDS.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .models import db, UserEvent
+
+# Intervalo de reconexão sugerido ao navegador (ms) e de comentários keep-alive (s)
+RETRY_MILLISECONDS = 3000
+HEARTBEAT_SECONDS = 15
+
+# Eventos lidos por consulta
+EVENTS_BATCH = 100
+
+# Pub/sub em memória: contador de publicações por usuário, protegido por uma condição
+_published = {}
+_condition = threading.Condition()
+
+def _notify(user_ids):
+    """Acorda os streams do processo que acompanham os usuários informados."""
+    with _condition:
+        for user_id in user_ids:
+            _published[user_id] = _published.get(user_id, 0) + 1
+        _condition.notify_all()
+
+@event.listens_for(Session, 'after_commit')
+def _notify_after_commit(session):
+    # O evento também dispara ao liberar um SAVEPOINT; só o commit externo grava de fato
+    if session.in_nested_transaction():
+        return
+    user_ids = session.info.pop('event_users', None)
+    if user_ids:
+        _notify(user_ids)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('event_users', None)
+
+def publish_event(user_id, event_type, payload):
+    """Registra um evento para o usuário na transação atual; é entregue após o commit."""
+    db.session.add(UserEvent(user_id=user_id, event_type=event_type, payload=payload))
+    db.session.info.setdefault('event_users', set()).add(user_id)
+
+def _format_event(user_event):
+    data = dict(user_event.payload, created_at=user_event.created_at.isoformat())
+    return f"id: {user_event.id}\nevent: {user_event.event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def iter_events(user_id, last_event_id=None, stream_seconds=25, poll_seconds=2):
+    """Gera o stream SSE do usuário a partir do evento seguinte a `last_event_id`.
+
+    Sem `last_event_id`, apenas eventos novos são enviados. O stream termina após
+    `stream_seconds` (para não prender um worker síncrono do gunicorn); o
+    navegador reconecta sozinho enviando o cabeçalho Last-Event-ID.
+    """
+    if last_event_id is None:
+        last_event_id = db.session.query(db.func.max(UserEvent.id)).filter(
+            UserEvent.user_id == user_id
+        ).scalar() or 0
+
+    deadline = time.monotonic() + stream_seconds
+    last_sent = time.monotonic()
+    yield f"retry: {RETRY_MILLISECONDS}\n\n"
+
+    while True:
+        with _condition:
+            seen = _published.get(user_id, 0)
+
+        user_events = UserEvent.query.filter(
+            UserEvent.user_id == user_id,
+            UserEvent.id > last_event_id
+        ).order_by(UserEvent.id).limit(EVENTS_BATCH).all()
+        chunk = ''.join(_format_event(user_event) for user_event in user_events)
+        # Encerrar a transação de leitura para enxergar os próximos commits
+        db.session.rollback()
+
+        if user_events:
+            last_event_id = user_events[-1].id
+            last_sent = time.monotonic()
+            yield chunk
+            if len(user_events) == EVENTS_BATCH:
+                continue
+
+        now = time.monotonic()
+        if now >= deadline:
+            return
+        if now - last_sent >= HEARTBEAT_SECONDS:
+            last_sent = now
+            yield ": keep-alive\n\n"
+
+        # Aguardar uma publicação neste processo ou o próximo ciclo de consulta
+        with _condition:
+            if _published.get(user_id, 0) == seen:
+                _condition.wait(min(poll_seconds, deadline - now))
+
+def prune_events(retention_hours=24):
+    """Remove eventos mais antigos que a retenção. Retorna a quantidade removida."""
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    removed = UserEvent.query.filter(UserEvent.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Exportação de vendas, histórico de estoque e ajustes em CSV ou NDJSON, com leitura e resposta em streaming."""
+
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import select
+
+from .models import db, Product, Sale, StockAdjustment
+from .stock import stock_history
+
+# Linhas lidas do banco por vez (yield_per) e gravadas em cada pedaço da resposta
+EXPORT_CHUNK_ROWS = 1000
+
+# Formatos aceitos e o tipo de conteúdo de cada um
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson'
+}
+
+def _sales_query(user_id, since, raw_days, hourly_days):
+    return select(
+        Sale.id,
+        Sale.ml_order_id,
+        Product.id.label('product_id'),
+        Product.sku,
+        Product.ml_item_id,
+        Product.title,
+        Sale.quantity_sold,
+        Sale.sale_timestamp
+    ).join(
+        Product, Product.id == Sale.product_id
+    ).where(
+        Product.user_id == user_id,
+        Sale.sale_timestamp >= since
+    ).order_by(Sale.sale_timestamp, Sale.id)
+
+def _adjustments_query(user_id, since, raw_days, hourly_days):
+    return select(
+        StockAdjustment.id,
+        Product.id.label('product_id'),
+        Product.sku,
+        Product.ml_item_id,
+        Product.title,
+        StockAdjustment.adjustment_type,
+        StockAdjustment.quantity,
+        StockAdjustment.reason,
+        StockAdjustment.adjustment_timestamp
+    ).join(
+        Product, Product.id == StockAdjustment.product_id
+    ).where(
+        Product.user_id == user_id,
+        StockAdjustment.adjustment_timestamp >= since
+    ).order_by(StockAdjustment.adjustment_timestamp, StockAdjustment.id)
+
+def _stock_history_query(user_id, since, raw_days, hourly_days):
+    # Registros antigos vêm consolidados por hora ou por dia (coluna tier)
+    history = stock_history(since, raw_days, hourly_days, user_id=user_id)
+    return select(
+        history.c.tier,
+        Product.id.label('product_id'),
+        Product.sku,
+        Product.ml_item_id,
+        Product.title,
+        history.c.timestamp,
+        history.c.total_quantity,
+        history.c.available_quantity
+    ).join(
+        Product, Product.id == history.c.product_id
+    ).order_by(history.c.timestamp, history.c.product_id)
+
+# Conjuntos de dados exportáveis e a consulta de cada um
+EXPORT_DATASETS = {
+    'sales': _sales_query,
+    'stock_history': _stock_history_query,
+    'adjustments': _adjustments_query
+}
+
+def _value(value):
+    """Converte valores do banco para a saída (datas em ISO 8601)."""
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def _csv_chunks(columns, partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in partitions:
+        for row in rows:
+            writer.writerow([_value(value) for value in row])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+    # Cabeçalho de uma exportação sem linhas
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def _ndjson_chunks(columns, partitions):
+    for rows in partitions:
+        yield ''.join(
+            json.dumps(dict(zip(columns, (_value(value) for value in row))), ensure_ascii=False) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def iter_export(dataset, user_id, since, export_format='csv', compress=False, raw_days=7, hourly_days=90):
+    """Gera a exportação em pedaços de bytes, lendo o banco em lotes de EXPORT_CHUNK_ROWS.
+
+    A memória usada não depende do tamanho do período: apenas um lote de linhas
+    fica em memória por vez. Com `compress`, a saída é compactada em gzip.
+    """
+    query = EXPORT_DATASETS[dataset](user_id, since, raw_days, hourly_days)
+    result = db.session.execute(query.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+    try:
+        columns = list(result.keys())
+        if export_format == 'ndjson':
+            chunks = _ndjson_chunks(columns, result.partitions())
+        else:
+            chunks = _csv_chunks(columns, result.partitions())
+        if compress:
+            chunks = _gzip_chunks(chunks)
+        yield from chunks
+    finally:
+        result.close()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Execução dos jobs de sincronização em segundo plano."""
+
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from .events import publish_event
+from .models import db, ApiCredentials, SyncJob
+from .sync import get_user_ml_api, sync_user_products, sync_user_stock, sync_user_orders
+
+# Rotinas executadas por cada tipo de job
+SYNC_JOB_TYPES = {
+    'products': sync_user_products,
+    'stock': sync_user_stock,
+    'orders': sync_user_orders
+}
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Intervalo mínimo entre gravações de progresso de um job (segundos)
+PROGRESS_INTERVAL = 1.0
+
+# Pool de threads que executa os jobs no processo atual
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """Retorna o pool de threads dos jobs, criado na primeira utilização."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('ML_SYNC_JOB_WORKERS', 2),
+                thread_name_prefix='sync-job'
+            )
+    return _executor
+
+def serialize_sync_job(job):
+    """Converte um job de sincronização em dicionário para a resposta da API."""
+    return {
+        "id": job.id,
+        "type": job.job_type,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+        "errors": job.error_count,
+        "error_message": job.error_message,
+        "result": job.result,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+def _find_active_job(user_id, job_type):
+    """Retorna o job ativo (na fila ou em execução) do usuário para o tipo informado."""
+    return SyncJob.query.filter(
+        SyncJob.user_id == user_id,
+        SyncJob.job_type == job_type,
+        SyncJob.status.in_(ACTIVE_STATUSES)
+    ).first()
+
+def enqueue_sync_job(user_id, job_type):
+    """Enfileira um job de sincronização, ou reaproveita o job ativo do mesmo usuário e tipo.
+
+    Retorna uma tupla (job, criado).
+    """
+    active_job = _find_active_job(user_id, job_type)
+    if active_job:
+        now = datetime.utcnow()
+        if active_job.status == 'queued':
+            # Um job na fila não reporta progresso: vale o tempo desde a criação (o processo
+            # que o enfileirou pode ter reiniciado antes de executá-lo)
+            queue_timeout = timedelta(seconds=current_app.config.get('ML_SYNC_JOB_QUEUE_TIMEOUT_SECONDS', 1800))
+            abandoned = active_job.created_at < now - queue_timeout
+            error_message = "Job abandonado: não iniciou dentro do tempo limite"
+        else:
+            stale_after = timedelta(seconds=current_app.config.get('ML_SYNC_JOB_STALE_SECONDS', 600))
+            abandoned = active_job.updated_at < now - stale_after
+            error_message = "Job abandonado: sem progresso dentro do tempo limite"
+        if not abandoned:
+            return active_job, False
+
+        # Encerrar o job apenas se ele não mudou de estado nesse meio tempo; um job na
+        # fila encerrado aqui não é mais reivindicado pelo executor
+        expired = SyncJob.query.filter(
+            SyncJob.id == active_job.id,
+            SyncJob.status == active_job.status,
+            SyncJob.updated_at == active_job.updated_at
+        ).update({
+            "status": 'failed',
+            "error_message": error_message,
+            "finished_at": now,
+            "updated_at": now
+        }, synchronize_session=False)
+        db.session.commit()
+        if not expired:
+            db.session.expire_all()
+            active_job = _find_active_job(user_id, job_type)
+            if active_job:
+                return active_job, False
+
+    job = SyncJob(user_id=user_id, job_type=job_type, status='queued')
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Outro worker criou o job ao mesmo tempo: juntar-se a ele
+        db.session.rollback()
+        return _find_active_job(user_id, job_type), False
+
+    _get_executor().submit(_run_sync_job, current_app._get_current_object(), job.id)
+    return job, True
+
+def _run_sync_job(app, job_id):
+    """Executa um job de sincronização em uma thread do pool."""
+    with app.app_context():
+        # Reivindicar o job: só um executor passa do status 'queued' para 'running'
+        now = datetime.utcnow()
+        claimed = SyncJob.query.filter(
+            SyncJob.id == job_id,
+            SyncJob.status == 'queued'
+        ).update({"status": 'running', "started_at": now, "updated_at": now}, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return
+
+        job = db.session.get(SyncJob, job_id)
+        publish_event(job.user_id, 'sync_job', serialize_sync_job(job))
+        db.session.commit()
+
+        state = {"processed": 0, "total": None, "errors": 0, "reported_at": 0.0}
+
+        def progress(processed, total, errors):
+            state.update(processed=processed, total=total, errors=errors)
+            # Gravar o progresso no máximo uma vez por PROGRESS_INTERVAL
+            now = time.monotonic()
+            if now - state["reported_at"] < PROGRESS_INTERVAL:
+                return
+            state["reported_at"] = now
+            # Contexto próprio: gravar o progresso não confirma o trabalho em andamento da sincronização
+            try:
+                with app.app_context():
+                    progress_job = db.session.get(SyncJob, job_id)
+                    progress_job.processed = processed
+                    progress_job.total = total
+                    progress_job.error_count = errors
+                    publish_event(progress_job.user_id, 'sync_job', serialize_sync_job(progress_job))
+                    db.session.commit()
+            except Exception as e:
+                # O progresso é apenas informativo: a sincronização continua
+                print(f"Erro ao gravar o progresso do job {job_id}: {e}")
+
+        try:
+            credentials = ApiCredentials.query.filter_by(user_id=job.user_id).first()
+            if not credentials:
+                raise Exception("Credenciais não encontradas")
+
+            ml_api = get_user_ml_api(credentials)
+            result = SYNC_JOB_TYPES[job.job_type](job.user_id, ml_api, progress=progress)
+
+            job.status = 'done'
+            job.result = result
+            job.processed = state["processed"]
+            job.total = state["total"] if state["total"] is not None else state["processed"]
+            job.error_count = result.get("failed_products", state["errors"])
+        except Exception as e:
+            db.session.rollback()
+            traceback.print_exc()
+            job.status = 'failed'
+            job.error_message = str(e)
+
+        job.finished_at = datetime.utcnow()
+        publish_event(job.user_id, 'sync_job', serialize_sync_job(job))
+        db.session.commit()
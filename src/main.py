@@ -8,9 +8,24 @@ import sys
 # Adiciona o diretório raiz ao PYTHONPATH para permitir imports relativos
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.config import SQLALCHEMY_DATABASE_URI, SECRET_KEY
+from src.config import (
+    SQLALCHEMY_DATABASE_URI, SECRET_KEY, ML_SYNC_MAX_WORKERS,
+    ML_HTTP_POOL_SIZE, ML_HTTP_CONNECT_TIMEOUT, ML_HTTP_READ_TIMEOUT,
+    ML_HTTP_MAX_RETRIES, ML_HTTP_BACKOFF_FACTOR,
+    ML_RATE_LIMIT_PER_SECOND, ML_RATE_LIMIT_BURST, ML_RATE_LIMIT_STORE,
+    ML_TOKEN_LOCK_DIR, ML_SYNC_JOB_WORKERS, ML_SYNC_JOB_STALE_SECONDS, ML_SYNC_JOB_QUEUE_TIMEOUT_SECONDS,
+    STOCK_RAW_RETENTION_DAYS, STOCK_HOURLY_RETENTION_DAYS,
+    EVENTS_STREAM_SECONDS, EVENTS_POLL_SECONDS, EVENTS_RETENTION_HOURS,
+    REPLENISHMENT_LEAD_TIME_DAYS, REPLENISHMENT_SAFETY_DAYS, REPLENISHMENT_COVERAGE_DAYS,
+    ML_NOTIFICATIONS_BATCH_SIZE, ML_NOTIFICATIONS_DEBOUNCE_SECONDS, ML_NOTIFICATIONS_MAX_ATTEMPTS,
+    ML_NOTIFICATIONS_STALE_SECONDS, ML_NOTIFICATIONS_POLL_SECONDS,
+    STOCK_POLL_BATCH_SIZE, STOCK_POLL_MIN_SECONDS, STOCK_POLL_MAX_SECONDS, STOCK_POLL_WINDOW_DAYS,
+    STOCK_POLL_TICK_SECONDS,
+    ML_CACHE_MAX_MB, ML_CACHE_TTL_USER, ML_CACHE_TTL_ITEMS, ML_CACHE_TTL_ORDERS, ML_CACHE_TTL_STOCK, ML_CACHE_STORE
+)
 from src.models import db
 from src.routes import auth_bp, api_bp
+from src.commands import register_commands
 
 def create_app():
     """Cria e configura a instância da aplicação Flask."""
@@ -25,6 +40,43 @@ def create_app():
     app.config["ML_APP_ID"] = os.getenv("ML_APP_ID", "YOUR_APP_ID")
     app.config["ML_SECRET_KEY"] = os.getenv("ML_SECRET_KEY", "YOUR_SECRET_KEY")
     app.config["ML_REDIRECT_URI"] = os.getenv("ML_REDIRECT_URI", "http://localhost:5000/callback")
+    app.config["ML_SYNC_MAX_WORKERS"] = ML_SYNC_MAX_WORKERS
+    app.config["ML_HTTP_POOL_SIZE"] = ML_HTTP_POOL_SIZE
+    app.config["ML_HTTP_CONNECT_TIMEOUT"] = ML_HTTP_CONNECT_TIMEOUT
+    app.config["ML_HTTP_READ_TIMEOUT"] = ML_HTTP_READ_TIMEOUT
+    app.config["ML_HTTP_MAX_RETRIES"] = ML_HTTP_MAX_RETRIES
+    app.config["ML_HTTP_BACKOFF_FACTOR"] = ML_HTTP_BACKOFF_FACTOR
+    app.config["ML_RATE_LIMIT_PER_SECOND"] = ML_RATE_LIMIT_PER_SECOND
+    app.config["ML_RATE_LIMIT_BURST"] = ML_RATE_LIMIT_BURST
+    app.config["ML_RATE_LIMIT_STORE"] = ML_RATE_LIMIT_STORE
+    app.config["ML_TOKEN_LOCK_DIR"] = ML_TOKEN_LOCK_DIR
+    app.config["ML_SYNC_JOB_WORKERS"] = ML_SYNC_JOB_WORKERS
+    app.config["ML_SYNC_JOB_STALE_SECONDS"] = ML_SYNC_JOB_STALE_SECONDS
+    app.config["ML_SYNC_JOB_QUEUE_TIMEOUT_SECONDS"] = ML_SYNC_JOB_QUEUE_TIMEOUT_SECONDS
+    app.config["STOCK_RAW_RETENTION_DAYS"] = STOCK_RAW_RETENTION_DAYS
+    app.config["STOCK_HOURLY_RETENTION_DAYS"] = STOCK_HOURLY_RETENTION_DAYS
+    app.config["EVENTS_STREAM_SECONDS"] = EVENTS_STREAM_SECONDS
+    app.config["EVENTS_POLL_SECONDS"] = EVENTS_POLL_SECONDS
+    app.config["EVENTS_RETENTION_HOURS"] = EVENTS_RETENTION_HOURS
+    app.config["REPLENISHMENT_LEAD_TIME_DAYS"] = REPLENISHMENT_LEAD_TIME_DAYS
+    app.config["REPLENISHMENT_SAFETY_DAYS"] = REPLENISHMENT_SAFETY_DAYS
+    app.config["REPLENISHMENT_COVERAGE_DAYS"] = REPLENISHMENT_COVERAGE_DAYS
+    app.config["ML_NOTIFICATIONS_BATCH_SIZE"] = ML_NOTIFICATIONS_BATCH_SIZE
+    app.config["ML_NOTIFICATIONS_DEBOUNCE_SECONDS"] = ML_NOTIFICATIONS_DEBOUNCE_SECONDS
+    app.config["ML_NOTIFICATIONS_MAX_ATTEMPTS"] = ML_NOTIFICATIONS_MAX_ATTEMPTS
+    app.config["ML_NOTIFICATIONS_STALE_SECONDS"] = ML_NOTIFICATIONS_STALE_SECONDS
+    app.config["ML_NOTIFICATIONS_POLL_SECONDS"] = ML_NOTIFICATIONS_POLL_SECONDS
+    app.config["STOCK_POLL_BATCH_SIZE"] = STOCK_POLL_BATCH_SIZE
+    app.config["STOCK_POLL_MIN_SECONDS"] = STOCK_POLL_MIN_SECONDS
+    app.config["STOCK_POLL_MAX_SECONDS"] = STOCK_POLL_MAX_SECONDS
+    app.config["STOCK_POLL_WINDOW_DAYS"] = STOCK_POLL_WINDOW_DAYS
+    app.config["STOCK_POLL_TICK_SECONDS"] = STOCK_POLL_TICK_SECONDS
+    app.config["ML_CACHE_MAX_MB"] = ML_CACHE_MAX_MB
+    app.config["ML_CACHE_TTL_USER"] = ML_CACHE_TTL_USER
+    app.config["ML_CACHE_TTL_ITEMS"] = ML_CACHE_TTL_ITEMS
+    app.config["ML_CACHE_TTL_ORDERS"] = ML_CACHE_TTL_ORDERS
+    app.config["ML_CACHE_TTL_STOCK"] = ML_CACHE_TTL_STOCK
+    app.config["ML_CACHE_STORE"] = ML_CACHE_STORE
 
     # Inicializa o SQLAlchemy com a aplicação
     db.init_app(app)
@@ -33,6 +85,9 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(api_bp, url_prefix='/api')
 
+    # Registrar comandos de manutenção (flask <comando>)
+    register_commands(app)
+
     # Cria as tabelas do banco de dados se não existirem
     with app.app_context():
         db.create_all()
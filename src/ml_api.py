@@ -4,9 +4,84 @@
 import os
 import requests
 import json
-from datetime import datetime, timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from itertools import islice
 from urllib.parse import urlencode
 
+from dateutil.parser import isoparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .rate_limit import RateLimitError, get_rate_limiter, parse_retry_after
+from .response_cache import cache_key
+
+# Sessões HTTP compartilhadas pelo processo, indexadas pela configuração do pool
+_shared_sessions = {}
+_shared_sessions_lock = threading.Lock()
+
+def get_shared_session(pool_size=20, max_retries=3, backoff_factor=0.5):
+    """Retorna a sessão HTTP (com pool de conexões) compartilhada pelo processo.
+    
+    A sessão é criada na primeira chamada e reaproveitada nas seguintes, evitando
+    um novo handshake TCP+TLS a cada requisição.
+    """
+    key = (pool_size, max_retries, backoff_factor)
+    with _shared_sessions_lock:
+        session = _shared_sessions.get(key)
+        if session is None:
+            session = _build_session(pool_size, max_retries, backoff_factor)
+            _shared_sessions[key] = session
+    return session
+
+def _build_session(pool_size, max_retries, backoff_factor):
+    """Cria uma sessão HTTP com pool de conexões e retry com backoff exponencial.
+    
+    Apenas GETs (idempotentes) são repetidos, em erros de conexão e respostas 5xx transitórias.
+    """
+    retry_options = dict(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+        # Respostas 429 são tratadas pelo limitador de taxa compartilhado (ver MercadoLivreAPI._send)
+        respect_retry_after_header=False
+    )
+    try:
+        # Jitter aleatório somado ao backoff (urllib3 >= 2.0)
+        retry = Retry(backoff_jitter=backoff_factor, **retry_options)
+    except TypeError:
+        retry = Retry(**retry_options)
+    
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def iter_chunks(iterable, size):
+    """Agrupa os elementos de um iterável em listas de até `size` elementos, sob demanda."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def parse_ml_datetime(value):
+    """Converte uma data da API do Mercado Livre em datetime UTC sem fuso."""
+    parsed = isoparse(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def format_ml_datetime(value):
+    """Formata um datetime UTC sem fuso para os filtros de data da API (precisão de milissegundos)."""
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}-00:00"
+
 class MercadoLivreAPI:
     """Classe para gerenciar a integração com a API do Mercado Livre."""
     
@@ -15,14 +90,44 @@ class MercadoLivreAPI:
     AUTH_URL = "https://auth.mercadolibre.com.ar/authorization"
     TOKEN_URL = "https://api.mercadolibre.com/oauth/token"
     
-    def __init__(self, app_id, client_secret, redirect_uri):
-        """Inicializa a classe com as credenciais da aplicação."""
+    # Quantidade máxima de ids aceita pelo multiget de /items
+    ITEMS_MULTIGET_LIMIT = 20
+    
+    # Maior offset aceito pelas buscas paginadas; acima disso /items/search usa o modo scan
+    # e /orders/search divide o período de atualização em fatias menores
+    SEARCH_OFFSET_LIMIT = 1000
+    
+    # Menor fatia do período de atualização na leitura de pedidos
+    ORDERS_MIN_SLICE = timedelta(seconds=1)
+    
+    # Timeout padrão (conexão, leitura) em segundos
+    DEFAULT_TIMEOUT = (5, 30)
+    
+    # Novas tentativas de uma requisição que recebeu 429 (Too Many Requests)
+    RATE_LIMIT_RETRIES = 3
+    
+    def __init__(self, app_id, client_secret, redirect_uri, session=None, timeout=None, rate_limiter=None,
+                 response_cache=None):
+        """Inicializa a classe com as credenciais da aplicação.
+        
+        Se nenhuma sessão HTTP ou limitador de taxa for informado, usa os compartilhados pelo processo.
+        Com `response_cache` (ver response_cache.ResponseCache), as respostas GET dos recursos
+        cacheáveis são reaproveitadas, desde que `cache_namespace` identifique o vendedor.
+        """
         self.app_id = app_id
         self.client_secret = client_secret
         self.redirect_uri = redirect_uri
+        self.session = session or get_shared_session()
+        self.timeout = timeout or self.DEFAULT_TIMEOUT
+        self.rate_limiter = rate_limiter or get_rate_limiter()
         self.access_token = None
         self.refresh_token = None
         self.token_expires = None
+        # Gerenciador opcional que renova e persiste o token (ver token_manager.TokenManager)
+        self.token_manager = None
+        self.response_cache = response_cache
+        # Separa no cache as respostas de cada vendedor; sem ele, o cache não é usado
+        self.cache_namespace = None
     
     def get_auth_url(self):
         """Gera a URL para autenticação do usuário."""
@@ -43,13 +148,13 @@ class MercadoLivreAPI:
             "redirect_uri": self.redirect_uri
         }
         
-        response = requests.post(self.TOKEN_URL, data=data)
+        response = self.session.post(self.TOKEN_URL, data=data, timeout=self.timeout)
         
         if response.status_code == 200:
             token_data = response.json()
             self.access_token = token_data["access_token"]
             self.refresh_token = token_data["refresh_token"]
-            self.token_expires = datetime.now() + timedelta(seconds=token_data["expires_in"])
+            self.token_expires = datetime.utcnow() + timedelta(seconds=token_data["expires_in"])
             return token_data
         else:
             raise Exception(f"Erro ao obter token: {response.status_code} - {response.text}")
@@ -66,39 +171,96 @@ class MercadoLivreAPI:
             "refresh_token": self.refresh_token
         }
         
-        response = requests.post(self.TOKEN_URL, data=data)
+        response = self.session.post(self.TOKEN_URL, data=data, timeout=self.timeout)
         
         if response.status_code == 200:
             token_data = response.json()
             self.access_token = token_data["access_token"]
             self.refresh_token = token_data["refresh_token"]
-            self.token_expires = datetime.now() + timedelta(seconds=token_data["expires_in"])
+            self.token_expires = datetime.utcnow() + timedelta(seconds=token_data["expires_in"])
             return token_data
         else:
             raise Exception(f"Erro ao atualizar token: {response.status_code} - {response.text}")
     
     def check_token_validity(self):
         """Verifica se o token está válido e o atualiza se necessário."""
+        if self.token_manager is not None:
+            return self.token_manager.ensure_valid(self)
+        
         if not self.access_token or not self.token_expires:
             return False
         
         # Se o token expira em menos de 10 minutos, atualiza
-        if datetime.now() + timedelta(minutes=10) >= self.token_expires:
+        if datetime.utcnow() + timedelta(minutes=10) >= self.token_expires:
             self.refresh_access_token()
         
         return True
     
+    def _send(self, method, url, **kwargs):
+        """Envia uma requisição respeitando o limite de taxa compartilhado.
+        
+        Respostas 429 suspendem todas as requisições pelo tempo do cabeçalho Retry-After
+        e a requisição é repetida até RATE_LIMIT_RETRIES vezes.
+        """
+        for attempt in range(self.RATE_LIMIT_RETRIES + 1):
+            self.rate_limiter.acquire()
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            if response.status_code != 429:
+                return response
+            
+            retry_after = parse_retry_after(response.headers.get("Retry-After"), default=2 ** attempt)
+            self.rate_limiter.penalize(retry_after)
+        
+        raise RateLimitError(
+            f"Limite de requisições excedido: {response.status_code} - {response.text}",
+            retry_after=retry_after
+        )
+    
+    def get_rate_limit_status(self):
+        """Retorna o orçamento atual de requisições do limitador de taxa."""
+        return self.rate_limiter.status()
+    
+    def _cache_ttl(self, endpoint):
+        """Validade das respostas do endpoint no cache; None se o cache não se aplica."""
+        if self.response_cache is None or self.cache_namespace is None:
+            return None
+        return self.response_cache.ttl_for(endpoint)
+    
+    def invalidate_cached(self, endpoint, params=None):
+        """Descarta a resposta em cache do endpoint (o recurso mudou no Mercado Livre)."""
+        if self._cache_ttl(endpoint) is not None:
+            self.response_cache.invalidate(cache_key(self.cache_namespace, endpoint, params))
+    
     def api_get(self, endpoint, params=None):
-        """Realiza uma requisição GET para a API do Mercado Livre."""
+        """Realiza uma requisição GET para a API do Mercado Livre.
+        
+        Respostas de recursos cacheáveis são servidas do cache enquanto válidas; vencidas
+        e com ETag, são revalidadas com `If-None-Match` (304 reaproveita o corpo guardado).
+        """
+        ttl = self._cache_ttl(endpoint)
+        cached = None
+        if ttl is not None:
+            key = cache_key(self.cache_namespace, endpoint, params)
+            cached = self.response_cache.get(key)
+            if cached is not None and cached.expires_at > time.time():
+                return json.loads(cached.body)
+        
         if not self.check_token_validity():
             raise Exception("Token de acesso inválido ou expirado")
         
         headers = {"Authorization": f"Bearer {self.access_token}"}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
         url = f"{self.BASE_URL}{endpoint}"
         
-        response = requests.get(url, headers=headers, params=params)
+        response = self._send("GET", url, headers=headers, params=params)
         
+        if response.status_code == 304 and cached is not None:
+            self.response_cache.refresh(key, cached, ttl)
+            return json.loads(cached.body)
         if response.status_code == 200:
+            if ttl is not None:
+                self.response_cache.set(key, response.text, response.headers.get("ETag"), ttl)
             return response.json()
         else:
             raise Exception(f"Erro na requisição GET: {response.status_code} - {response.text}")
@@ -114,7 +276,7 @@ class MercadoLivreAPI:
         }
         url = f"{self.BASE_URL}{endpoint}"
         
-        response = requests.post(url, headers=headers, data=json.dumps(data))
+        response = self._send("POST", url, headers=headers, data=json.dumps(data))
         
         if response.status_code in [200, 201]:
             return response.json()
@@ -134,14 +296,132 @@ class MercadoLivreAPI:
         }
         return self.api_get("/items/search", params)
     
+    def iter_user_item_ids(self, user_id, page_size=50, on_total=None):
+        """Percorre todas as páginas de itens do usuário, gerando os ids sob demanda.
+        
+        A leitura usa o modo scan (scroll_id) de /items/search desde a primeira página:
+        a paginação por offset não passa de SEARCH_OFFSET_LIMIT, e assim catálogos
+        grandes não precisam ler a primeira página duas vezes ao trocar de modo. Se
+        informado, `on_total` recebe o total de itens assim que a primeira página chega.
+        """
+        params = {
+            "seller_id": user_id,
+            "search_type": "scan",
+            "limit": page_size
+        }
+        
+        first_page = True
+        while True:
+            result = self.api_get("/items/search", params)
+            if first_page:
+                first_page = False
+                if on_total:
+                    on_total(result.get("paging", {}).get("total", 0))
+            
+            item_ids = result.get("results", [])
+            if not item_ids:
+                return
+            
+            yield from item_ids
+            
+            scroll_id = result.get("scroll_id")
+            if not scroll_id:
+                return
+            params = {
+                "seller_id": user_id,
+                "search_type": "scan",
+                "scroll_id": scroll_id,
+                "limit": page_size
+            }
+    
     def get_item_details(self, item_id):
         """Obtém detalhes de um item específico."""
         return self.api_get(f"/items/{item_id}")
     
+    def get_items_details(self, item_ids):
+        """Obtém detalhes de vários itens usando o multiget de /items.
+        
+        Os ids são enviados em blocos de ITEMS_MULTIGET_LIMIT por requisição.
+        Retorna uma tupla (detalhes, erros), ambos dicionários indexados pelo item_id.
+        """
+        details = {}
+        errors = {}
+        
+        # Remove duplicados preservando a ordem
+        item_ids = list(dict.fromkeys(item_ids))
+        
+        # Itens com resposta válida no cache (guardada por item, como em get_item_details) não são pedidos
+        ttl = self._cache_ttl("/items/")
+        if ttl is not None:
+            pending_ids = []
+            for item_id in item_ids:
+                cached = self.response_cache.get(cache_key(self.cache_namespace, f"/items/{item_id}"))
+                if cached is not None and cached.expires_at > time.time():
+                    details[item_id] = json.loads(cached.body)
+                else:
+                    pending_ids.append(item_id)
+            item_ids = pending_ids
+        
+        for start in range(0, len(item_ids), self.ITEMS_MULTIGET_LIMIT):
+            chunk = item_ids[start:start + self.ITEMS_MULTIGET_LIMIT]
+            try:
+                entries = self.api_get("/items", {"ids": ",".join(chunk)})
+            except Exception as e:
+                for item_id in chunk:
+                    errors[item_id] = str(e)
+                continue
+            
+            # A resposta vem na mesma ordem dos ids enviados, uma entrada por id
+            for item_id, entry in zip(chunk, entries):
+                body = entry.get("body") or {}
+                if entry.get("code") == 200:
+                    details[body.get("id", item_id)] = body
+                    # Mesma regra de api_get: com validade 0 (e sem ETag no multiget) a cópia antiga é descartada
+                    if ttl is not None:
+                        self.response_cache.set(
+                            cache_key(self.cache_namespace, f"/items/{item_id}"), json.dumps(body), None, ttl
+                        )
+                else:
+                    errors[item_id] = f"{entry.get('code')} - {body.get('message', body)}"
+        
+        return details, errors
+    
     def get_fulfillment_stock(self, inventory_id):
         """Obtém o estoque de um item no Fulfillment."""
         return self.api_get(f"/inventories/{inventory_id}/stock/fulfillment")
     
+    def get_fulfillment_stocks(self, inventory_ids, max_workers=8, on_progress=None):
+        """Obtém o estoque no Fulfillment de vários itens em paralelo.
+        
+        No máximo `max_workers` requisições ficam em andamento ao mesmo tempo.
+        Retorna uma tupla (estoques, erros), ambos dicionários indexados pelo inventory_id.
+        Se informado, `on_progress(concluidos, erros)` é chamado a cada requisição concluída.
+        """
+        stocks = {}
+        errors = {}
+        
+        # Remove duplicados preservando a ordem
+        inventory_ids = list(dict.fromkeys(inventory_ids))
+        if not inventory_ids:
+            return stocks, errors
+        
+        workers = max(1, min(max_workers, len(inventory_ids)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.get_fulfillment_stock, inventory_id): inventory_id
+                for inventory_id in inventory_ids
+            }
+            for future in as_completed(futures):
+                inventory_id = futures[future]
+                try:
+                    stocks[inventory_id] = future.result()
+                except Exception as e:
+                    errors[inventory_id] = str(e)
+                if on_progress:
+                    on_progress(len(stocks) + len(errors), len(errors))
+        
+        return stocks, errors
+    
     def get_orders(self, seller_id, offset=0, limit=50):
         """Obtém os pedidos do vendedor."""
         params = {
@@ -151,6 +431,76 @@ class MercadoLivreAPI:
         }
         return self.api_get("/orders/search", params)
     
+    def _search_orders(self, seller_id, updated_from, updated_to, offset, limit):
+        """Uma página de /orders/search, filtrada pelo período de atualização (limites inclusivos)."""
+        params = {
+            "seller": seller_id,
+            "sort": "date_asc",
+            "offset": offset,
+            "limit": limit
+        }
+        if updated_from:
+            params["order.date_last_updated.from"] = format_ml_datetime(updated_from)
+        if updated_to:
+            params["order.date_last_updated.to"] = format_ml_datetime(updated_to)
+        return self.api_get("/orders/search", params)
+    
+    def iter_orders(self, seller_id, updated_from=None, page_size=50, on_total=None):
+        """Percorre todas as páginas de pedidos do vendedor, gerando-os sob demanda.
+        
+        Com `updated_from` (datetime UTC), apenas pedidos criados ou alterados a partir
+        desse instante são retornados. Se o período tem mais pedidos do que a paginação
+        por offset alcança (SEARCH_OFFSET_LIMIT), ele é lido em fatias da data de
+        atualização, da mais antiga para a mais recente. Se informado, `on_total`
+        recebe o total de pedidos assim que a primeira página chega.
+        """
+        updated_to = datetime.utcnow()
+        result = self._search_orders(seller_id, updated_from, updated_to, 0, page_size)
+        total = result.get("paging", {}).get("total", 0)
+        if on_total:
+            on_total(total)
+        
+        if total > self.SEARCH_OFFSET_LIMIT and result.get("results"):
+            # Um pedido não é alterado antes de ser criado: o mais antigo (date_asc) limita o período
+            if updated_from is None:
+                updated_from = parse_ml_datetime(result["results"][0]["date_created"])
+            yield from self._iter_order_slices(seller_id, updated_from, updated_to, page_size)
+            return
+        
+        yield from self._iter_order_pages(seller_id, updated_from, updated_to, page_size, result)
+    
+    def _iter_order_pages(self, seller_id, updated_from, updated_to, page_size, result):
+        """Percorre por offset as páginas de um período, a partir da primeira página já lida."""
+        offset = 0
+        while True:
+            orders = result.get("results", [])
+            yield from orders
+            
+            offset += len(orders)
+            if not orders or offset >= result.get("paging", {}).get("total", 0):
+                return
+            result = self._search_orders(seller_id, updated_from, updated_to, offset, page_size)
+    
+    def _iter_order_slices(self, seller_id, updated_from, updated_to, page_size):
+        """Percorre o período em fatias da data de atualização que cabem na paginação por offset.
+        
+        Uma fatia com mais de SEARCH_OFFSET_LIMIT pedidos é dividida ao meio até caber
+        (ou até ORDERS_MIN_SLICE); as fatias são lidas da mais antiga para a mais recente.
+        """
+        slices = [(updated_from, updated_to)]
+        while slices:
+            start, end = slices.pop()
+            result = self._search_orders(seller_id, start, end, 0, page_size)
+            total = result.get("paging", {}).get("total", 0)
+            if total > self.SEARCH_OFFSET_LIMIT and end - start > self.ORDERS_MIN_SLICE:
+                middle = start + (end - start) / 2
+                middle = middle.replace(microsecond=middle.microsecond // 1000 * 1000)
+                # Os filtros têm precisão de milissegundos e limites inclusivos
+                slices.append((middle + timedelta(milliseconds=1), end))
+                slices.append((start, middle))
+                continue
+            yield from self._iter_order_pages(seller_id, start, end, page_size, result)
+    
     def get_order_details(self, order_id):
         """Obtém detalhes de um pedido específico."""
         return self.api_get(f"/orders/{order_id}")
@@ -28,6 +28,7 @@ class ApiCredentials(db.Model):
     refresh_token = db.Column(db.String(255), nullable=False)
     expires_in = db.Column(db.Integer, nullable=False)
     last_refresh_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    ml_user_id = db.Column(db.String(50), nullable=True, index=True) # ID do usuário no Mercado Livre (roteia as notificações)
 
 class Product(db.Model):
     """Modelo para mapear produtos do sistema com os do Mercado Livre."""
@@ -42,6 +43,7 @@ class Product(db.Model):
 
     # Relacionamentos
     stock_levels = db.relationship('StockLevel', backref='product', lazy=True)
+    current_stock = db.relationship('ProductStock', backref='product', uselist=False, lazy=True)
     sales = db.relationship('Sale', backref='product', lazy=True)
     adjustments = db.relationship('StockAdjustment', backref='product', lazy=True)
 
@@ -60,6 +62,40 @@ class StockLevel(db.Model):
     # Poderíamos adicionar uma coluna JSON para 'not_available_detail' se necessário
     # not_available_detail = db.Column(db.JSON, nullable=True)
 
+    # Paginação por cursor (timestamp, id) no histórico de atividades
+    __table_args__ = (db.Index('ix_stock_levels_timestamp_id', 'timestamp', 'id'),)
+
+class StockLevelRollup(db.Model):
+    """Modelo com o histórico de estoque consolidado por hora ou por dia (após o período de retenção bruto)."""
+    __tablename__ = 'stock_level_rollups'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    resolution = db.Column(db.String(10), nullable=False) # 'hour' ou 'day'
+    bucket_start = db.Column(db.DateTime, nullable=False) # Início da hora/dia (UTC)
+    last_timestamp = db.Column(db.DateTime, nullable=False) # Timestamp do último registro do intervalo
+    total_quantity = db.Column(db.Integer, nullable=False) # Valores do último registro do intervalo
+    available_quantity = db.Column(db.Integer, nullable=False)
+    not_available_quantity = db.Column(db.Integer, nullable=False)
+    min_available_quantity = db.Column(db.Integer, nullable=False)
+    max_available_quantity = db.Column(db.Integer, nullable=False)
+    samples = db.Column(db.Integer, nullable=False, default=1) # Quantidade de registros brutos consolidados
+
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'resolution', 'bucket_start', name='_product_resolution_bucket_uc'),
+        db.Index('ix_stock_level_rollups_resolution_bucket', 'resolution', 'bucket_start'),
+        db.Index('ix_stock_level_rollups_resolution_last_id', 'resolution', 'last_timestamp', 'id'),
+    )
+
+class ProductStock(db.Model):
+    """Modelo com o nível de estoque atual de cada produto (último StockLevel registrado)."""
+    __tablename__ = 'product_stocks'
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    total_quantity = db.Column(db.Integer, nullable=False)
+    available_quantity = db.Column(db.Integer, nullable=False)
+    not_available_quantity = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow) # Timestamp do StockLevel correspondente
+    checked_at = db.Column(db.DateTime, nullable=True) # Última leitura do estoque na API, mesmo sem alteração
+
 class Sale(db.Model):
     """Modelo para registrar histórico de vendas."""
     __tablename__ = 'sales'
@@ -70,6 +106,28 @@ class Sale(db.Model):
     sale_timestamp = db.Column(db.DateTime, nullable=False, index=True)
     # Adicionar preço, status do envio, etc. se necessário
 
+    __table_args__ = (
+        # Um registro por produto em cada pedido (evita duplicar vendas em sincronizações repetidas)
+        db.UniqueConstraint('ml_order_id', 'product_id', name='_order_product_uc'),
+        # Paginação por cursor (timestamp, id) em /sales e /activities
+        db.Index('ix_sales_timestamp_id', 'sale_timestamp', 'id'),
+    )
+
+class DailySales(db.Model):
+    """Modelo com o total vendido por produto e por dia (consolidado a partir de Sale)."""
+    __tablename__ = 'daily_sales'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False) # Dia (UTC) da venda
+    quantity_sold = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'day', name='_product_day_uc'),
+        # Cobre as somas por produto em uma janela de dias sem ler a tabela (gráficos e reposição)
+        db.Index('ix_daily_sales_user_day_product', 'user_id', 'day', 'product_id', 'quantity_sold'),
+    )
+
 class StockAdjustment(db.Model):
     """Modelo para registrar ajustes manuais de estoque."""
     __tablename__ = 'stock_adjustments'
@@ -80,3 +138,172 @@ class StockAdjustment(db.Model):
     reason = db.Column(db.Text, nullable=True)
     adjustment_timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    # Paginação por cursor (timestamp, id) no histórico de atividades
+    __table_args__ = (db.Index('ix_stock_adjustments_timestamp_id', 'adjustment_timestamp', 'id'),)
+
+class SyncJob(db.Model):
+    """Modelo para jobs de sincronização executados em segundo plano."""
+    __tablename__ = 'sync_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    job_type = db.Column(db.String(50), nullable=False) # Ex: 'products', 'stock'
+    status = db.Column(db.String(20), nullable=False, default='queued') # 'queued', 'running', 'done', 'failed'
+    total = db.Column(db.Integer, nullable=True) # Pode ser desconhecido no início do job
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    error_message = db.Column(db.Text, nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Garante no máximo um job ativo por usuário e tipo, mesmo entre workers diferentes
+    __table_args__ = (
+        db.Index(
+            'uq_sync_jobs_active', 'user_id', 'job_type', unique=True,
+            sqlite_where=db.text("status IN ('queued', 'running')"),
+            postgresql_where=db.text("status IN ('queued', 'running')")
+        ),
+    )
+
+class SyncCursor(db.Model):
+    """Modelo para guardar o ponto de retomada das sincronizações incrementais de cada usuário."""
+    __tablename__ = 'sync_cursors'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    cursor_type = db.Column(db.String(50), nullable=False) # Ex: 'orders'
+    cursor_value = db.Column(db.DateTime, nullable=True) # Maior data de atualização já sincronizada (UTC)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'cursor_type', name='_user_cursor_uc'),)
+
+class SkippedOrder(db.Model):
+    """Modelo com os pedidos que tiveram itens ignorados (anúncio ainda sem produto cadastrado).
+
+    Os pedidos da lista são relidos pelo id nas sincronizações seguintes, até que
+    todos os itens tenham produto ou o prazo de novas tentativas acabe.
+    """
+    __tablename__ = 'skipped_orders'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    ml_order_id = db.Column(db.String(50), nullable=False)
+    first_skipped_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'ml_order_id', name='_user_skipped_order_uc'),)
+
+class UserDataVersion(db.Model):
+    """Modelo com a versão dos dados de cada usuário, incrementada a cada gravação (sync, ajustes)."""
+    __tablename__ = 'user_data_versions'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserEvent(db.Model):
+    """Modelo com os eventos enviados em tempo real ao dashboard (estoque, jobs, alertas)."""
+    __tablename__ = 'user_events'
+    id = db.Column(db.Integer, primary_key=True) # Também é o id do evento no stream SSE
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    event_type = db.Column(db.String(50), nullable=False) # Ex: 'stock_change', 'sync_job', 'low_stock'
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    __table_args__ = (db.Index('ix_user_events_user_id_id', 'user_id', 'id'),)
+
+
+class AlertSettings(db.Model):
+    """Modelo com as configurações globais de alertas de estoque do usuário."""
+    __tablename__ = 'alert_settings'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    threshold = db.Column(db.Integer, nullable=False, default=5) # Estoque disponível abaixo do qual o alerta é aberto
+    notification_email = db.Column(db.String(200), nullable=True)
+    notification_dashboard = db.Column(db.Boolean, nullable=False, default=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ProductAlertThreshold(db.Model):
+    """Modelo com o limite de estoque baixo específico de um produto (substitui o global)."""
+    __tablename__ = 'product_alert_thresholds'
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    threshold = db.Column(db.Integer, nullable=False)
+
+class StockAlert(db.Model):
+    """Modelo com os alertas de estoque baixo, abertos na gravação do estoque e resolvidos quando ele volta ao normal."""
+    __tablename__ = 'stock_alerts'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    alert_type = db.Column(db.String(50), nullable=False, default='low_stock')
+    status = db.Column(db.String(20), nullable=False, default='open') # 'open' ou 'resolved'
+    threshold = db.Column(db.Integer, nullable=False)
+    available_quantity = db.Column(db.Integer, nullable=False) # Estoque disponível mais recente enquanto aberto
+    read = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_stock_alerts_user_status_created', 'user_id', 'status', 'created_at', 'id'),
+        db.Index('ix_stock_alerts_product_status', 'product_id', 'status'),
+    )
+
+class Shipment(db.Model):
+    """Modelo com os envios de estoque aos centros de distribuição do Full."""
+    __tablename__ = 'shipments'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='draft') # 'draft', 'pending', 'in_transit', 'delivered' ou 'cancelled'
+    destination_warehouse = db.Column(db.String(200), nullable=False)
+    notes = db.Column(db.Text, nullable=True)
+    tracking_number = db.Column(db.String(100), nullable=True)
+    estimated_delivery = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_shipments_user_status_created', 'user_id', 'status', 'created_at'),)
+
+class ShipmentItem(db.Model):
+    """Modelo com a quantidade de cada produto em um envio."""
+    __tablename__ = 'shipment_items'
+    id = db.Column(db.Integer, primary_key=True)
+    shipment_id = db.Column(db.Integer, db.ForeignKey('shipments.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('shipment_id', 'product_id', name='_shipment_product_uc'),)
+
+class ProductInTransit(db.Model):
+    """Modelo com a quantidade de cada produto em envios ainda não entregues (pendentes ou em trânsito)."""
+    __tablename__ = 'product_in_transit'
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MLNotification(db.Model):
+    """Modelo com a fila de notificações do Mercado Livre: um registro por recurso a ser relido na API."""
+    __tablename__ = 'ml_notifications'
+    id = db.Column(db.Integer, primary_key=True)
+    ml_user_id = db.Column(db.String(50), nullable=False) # ID do vendedor no Mercado Livre
+    kind = db.Column(db.String(20), nullable=False) # 'item', 'order' ou 'stock'
+    resource_id = db.Column(db.String(50), nullable=False) # ID do anúncio, do pedido ou do inventário
+    topic = db.Column(db.String(50), nullable=False) # Tópico da última notificação recebida
+    status = db.Column(db.String(20), nullable=False, default='pending') # 'pending', 'processing' ou 'failed' (registros concluídos são removidos)
+    received_count = db.Column(db.Integer, nullable=False, default=1) # Notificações agrupadas neste registro
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    claim_token = db.Column(db.String(32), nullable=True) # Identifica o worker que está processando o registro
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow) # Última notificação recebida
+    claimed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Notificações repetidas do mesmo recurso se agrupam em um único registro
+        db.UniqueConstraint('ml_user_id', 'kind', 'resource_id', name='_ml_notification_resource_uc'),
+        db.Index('ix_ml_notifications_status_received', 'status', 'received_at'),
+    )
+
+class ProductPollSchedule(db.Model):
+    """Modelo com a agenda de leitura do estoque de cada produto no Full (frequência conforme a atividade)."""
+    __tablename__ = 'product_poll_schedules'
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    next_poll_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    interval_seconds = db.Column(db.Integer, nullable=False) # Intervalo calculado na última leitura
+    last_polled_at = db.Column(db.DateTime, nullable=True)
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Notificações do Mercado Livre: fila local dos recursos alterados e o worker que os relê na API.
+
+O callback apenas grava o recurso avisado na tabela ml_notifications e responde na
+hora. Notificações repetidas do mesmo recurso atualizam o mesmo registro, de modo
+que uma rajada vira uma única leitura na API: o worker (`flask process-notifications`)
+só relê o recurso ML_NOTIFICATIONS_DEBOUNCE_SECONDS após a primeira notificação
+pendente, e o que chegar depois disso volta a ficar pendente para a próxima leitura.
+"""
+
+import re
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
+
+from .models import db, ApiCredentials, MLNotification
+from .sync import get_user_ml_api, sync_user_resources
+
+# Tópicos acompanhados -> tipo do recurso
+NOTIFICATION_TOPICS = {
+    'items': 'item',
+    'orders_v2': 'order',
+    'orders': 'order',
+    'stock': 'stock',
+    'marketplace_fbm_stock': 'stock'
+}
+
+# Formato do campo `resource` de cada tipo; o grupo é o id relido na API
+RESOURCE_PATTERNS = {
+    'item': re.compile(r'^/items/([A-Za-z0-9]+)'),
+    'order': re.compile(r'^/orders/(\d+)'),
+    'stock': re.compile(r'^/inventories/([A-Za-z0-9]+)')
+}
+
+# Parâmetros de sync_user_resources de cada tipo
+RESOURCE_ARGUMENTS = {'item': 'item_ids', 'stock': 'inventory_ids', 'order': 'order_ids'}
+
+def parse_notification(payload, app_id=None):
+    """Extrai o vendedor, o tipo e o id do recurso de uma notificação do Mercado Livre.
+
+    Retorna None para tópicos ou recursos não acompanhados (a notificação deve ser
+    confirmada mesmo assim). Lança ValueError se a notificação for inválida ou de
+    outra aplicação.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Notificação inválida: corpo JSON esperado")
+
+    ml_user_id = payload.get('user_id')
+    topic = payload.get('topic')
+    resource = payload.get('resource')
+    if ml_user_id in (None, '') or not isinstance(topic, str) or not isinstance(resource, str):
+        raise ValueError("Notificação inválida: user_id, topic e resource são obrigatórios")
+
+    application_id = payload.get('application_id')
+    if app_id and application_id is not None and str(application_id) != str(app_id):
+        raise ValueError("Notificação de outra aplicação")
+
+    kind = NOTIFICATION_TOPICS.get(topic)
+    if kind is None:
+        return None
+    match = RESOURCE_PATTERNS[kind].match(resource)
+    if not match:
+        return None
+
+    return {"ml_user_id": str(ml_user_id), "kind": kind, "resource_id": match.group(1), "topic": topic}
+
+def enqueue_notification(ml_user_id, kind, resource_id, topic):
+    """Enfileira o recurso na transação atual, agrupando com o registro já existente.
+
+    Retorna True se um registro novo foi criado e False se a notificação foi agrupada.
+    """
+    now = datetime.utcnow()
+    key = (
+        MLNotification.ml_user_id == ml_user_id,
+        MLNotification.kind == kind,
+        MLNotification.resource_id == resource_id
+    )
+    values = {
+        "status": 'pending',
+        "topic": topic,
+        "received_count": MLNotification.received_count + 1,
+        # Um registro já pendente mantém a data da primeira notificação (a rajada espera junto)
+        "received_at": case((MLNotification.status == 'pending', MLNotification.received_at), else_=now),
+        "attempts": case((MLNotification.status == 'failed', 0), else_=MLNotification.attempts)
+    }
+
+    updated = MLNotification.query.filter(*key).update(values, synchronize_session=False)
+    if updated:
+        return False
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(MLNotification(
+                ml_user_id=ml_user_id, kind=kind, resource_id=resource_id, topic=topic, received_at=now
+            ))
+        return True
+    except IntegrityError:
+        # Outra requisição criou o registro ao mesmo tempo
+        MLNotification.query.filter(*key).update(values, synchronize_session=False)
+        return False
+
+def build_fake_notification(ml_user_id, topic, resource, app_id=None):
+    """Monta uma notificação no formato enviado pelo Mercado Livre (para testes locais)."""
+    now = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    return {
+        "_id": uuid.uuid4().hex,
+        "resource": resource,
+        "user_id": int(ml_user_id) if str(ml_user_id).isdigit() else ml_user_id,
+        "topic": topic,
+        "application_id": int(app_id) if app_id and str(app_id).isdigit() else app_id,
+        "attempts": 1,
+        "sent": now,
+        "received": now
+    }
+
+def _finish(ids, token, error=None, max_attempts=5):
+    """Conclui os registros reivindicados com `token`.
+
+    Sem erro, os registros são removidos da fila; com erro, voltam a ficar pendentes
+    (ou falham de vez após `max_attempts` tentativas). Registros que receberam
+    notificações novas durante a leitura já voltaram a 'pending' e não são alterados.
+    """
+    if not ids:
+        return
+    claimed = MLNotification.query.filter(
+        MLNotification.id.in_(ids),
+        MLNotification.claim_token == token,
+        MLNotification.status == 'processing'
+    )
+    if error is None:
+        claimed.delete(synchronize_session=False)
+        return
+    claimed.update({
+        "status": case((MLNotification.attempts >= max_attempts, 'failed'), else_='pending'),
+        "last_error": error,
+        "claim_token": None,
+        # A nova tentativa espera o mesmo intervalo de agrupamento
+        "received_at": datetime.utcnow()
+    }, synchronize_session=False)
+
+def process_notifications(batch_size=200, debounce_seconds=5, max_attempts=5, stale_seconds=300):
+    """Relê na API os recursos pendentes na fila e remove os processados.
+
+    Registros presos em 'processing' há mais de `stale_seconds` (worker interrompido)
+    são reivindicados de novo. Retorna um dicionário com a contagem de registros
+    reivindicados, concluídos, reagendados e sem vendedor cadastrado.
+    """
+    now = datetime.utcnow()
+    ready = db.or_(
+        db.and_(
+            MLNotification.status == 'pending',
+            MLNotification.received_at <= now - timedelta(seconds=debounce_seconds)
+        ),
+        db.and_(
+            MLNotification.status == 'processing',
+            MLNotification.claimed_at <= now - timedelta(seconds=stale_seconds)
+        )
+    )
+    counts = {"claimed": 0, "done": 0, "retried": 0, "unknown_seller": 0}
+
+    ids = [
+        notification_id for (notification_id,) in db.session.query(MLNotification.id).filter(
+            ready
+        ).order_by(MLNotification.received_at).limit(batch_size)
+    ]
+    if not ids:
+        return counts
+
+    # Reivindicar os registros; outro worker que leu os mesmos ids não os encontra mais prontos
+    token = uuid.uuid4().hex
+    MLNotification.query.filter(MLNotification.id.in_(ids), ready).update({
+        "status": 'processing',
+        "claim_token": token,
+        "claimed_at": now,
+        "attempts": MLNotification.attempts + 1
+    }, synchronize_session=False)
+    db.session.commit()
+
+    # Apenas as colunas usadas: os commits abaixo expiram objetos do ORM
+    notifications = db.session.query(
+        MLNotification.id, MLNotification.ml_user_id, MLNotification.kind, MLNotification.resource_id
+    ).filter(MLNotification.claim_token == token).all()
+    counts["claimed"] = len(notifications)
+
+    by_seller = {}
+    for notification in notifications:
+        by_seller.setdefault(notification.ml_user_id, []).append(notification)
+
+    credentials_by_seller = {
+        credentials.ml_user_id: credentials
+        for credentials in ApiCredentials.query.filter(ApiCredentials.ml_user_id.in_(list(by_seller))).all()
+    }
+
+    for ml_user_id, seller_notifications in by_seller.items():
+        ids = [notification.id for notification in seller_notifications]
+        credentials = credentials_by_seller.get(ml_user_id)
+        if credentials is None:
+            # Vendedor sem credenciais: não há como reler o recurso, o registro falha sem novas tentativas
+            _finish(ids, token, error="Vendedor sem credenciais cadastradas", max_attempts=0)
+            db.session.commit()
+            counts["unknown_seller"] += len(ids)
+            continue
+
+        resources = {argument: [] for argument in RESOURCE_ARGUMENTS.values()}
+        for notification in seller_notifications:
+            resources[RESOURCE_ARGUMENTS[notification.kind]].append(notification.resource_id)
+
+        try:
+            ml_api = get_user_ml_api(credentials)
+            result = sync_user_resources(credentials.user_id, ml_api, **resources)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao processar notificações do vendedor {ml_user_id}: {e}")
+            _finish(ids, token, error=str(e), max_attempts=max_attempts)
+            db.session.commit()
+            counts["retried"] += len(ids)
+            continue
+
+        done_ids = []
+        failed_ids = []
+        for notification in seller_notifications:
+            if notification.resource_id in result["failed"][notification.kind]:
+                failed_ids.append(notification.id)
+            else:
+                done_ids.append(notification.id)
+        _finish(done_ids, token)
+        _finish(failed_ids, token, error="Falha ao reler o recurso na API", max_attempts=max_attempts)
+        db.session.commit()
+        counts["done"] += len(done_ids)
+        counts["retried"] += len(failed_ids)
+
+    return counts
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Paginação por cursor (keyset) nas listagens ordenadas por data."""
+
+import base64
+import json
+from datetime import datetime
+
+from flask import jsonify
+from sqlalchemy import and_, or_
+
+# Itens por página quando `limit` não é informado, e o máximo aceito
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+def page_limit(value):
+    """Normaliza o parâmetro `limit` para o intervalo aceito."""
+    if value is None:
+        return DEFAULT_PAGE_LIMIT
+    return max(1, min(value, MAX_PAGE_LIMIT))
+
+def paged_limit(value, cursor):
+    """Limite da página para listagens que também respondem sem paginação.
+
+    Sem `limit` e sem `cursor` a listagem não é paginada (retorna None); caso
+    contrário, o limite é normalizado como em `page_limit`.
+    """
+    if value is None and cursor is None:
+        return None
+    return page_limit(value)
+
+def encode_cursor(timestamp, kind, row_id):
+    """Gera o cursor opaco que aponta para o registro (timestamp, tipo, id)."""
+    payload = json.dumps([timestamp.isoformat(), kind, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(value):
+    """Lê um cursor gerado por `encode_cursor`. Lança ValueError se for inválido."""
+    try:
+        payload = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        timestamp, kind, row_id = json.loads(payload)
+        return datetime.fromisoformat(timestamp), str(kind), int(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor inválido")
+
+def keyset_before(cursor, kind, timestamp_column, id_column):
+    """Condição para os registros de uma fonte que vêm depois do cursor.
+
+    A ordem é (timestamp, tipo, id) decrescente, e `kind` é o tipo (constante)
+    dos registros da fonte. O termo `timestamp <= cursor` isolado permite que o
+    banco percorra o índice (timestamp, id) como intervalo.
+    """
+    timestamp, cursor_kind, row_id = cursor
+    if kind < cursor_kind:
+        return timestamp_column <= timestamp
+    if kind > cursor_kind:
+        return timestamp_column < timestamp
+    return and_(
+        timestamp_column <= timestamp,
+        or_(timestamp_column < timestamp, id_column < row_id)
+    )
+
+def paginated_response(items, next_cursor):
+    """Resposta com a lista de itens e o cursor da próxima página no cabeçalho X-Next-Cursor."""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
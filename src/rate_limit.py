@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Limitação de taxa (token bucket) para as chamadas à API do Mercado Livre."""
+
+import os
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+class RateLimitError(Exception):
+    """Erro lançado quando a API responde 429 e as novas tentativas se esgotam."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def parse_retry_after(value, default=1.0):
+    """Converte o cabeçalho Retry-After (segundos ou data HTTP) em segundos de espera."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+class TokenBucket:
+    """Token bucket em memória, compartilhado por todas as threads do processo.
+
+    `rate` é a quantidade de requisições liberadas por segundo e `capacity`
+    o tamanho máximo da rajada.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """Repõe os tokens acumulados desde a última leitura (nada se acumula durante um bloqueio)."""
+        elapsed = max(0.0, now - max(self._updated_at, self._blocked_until))
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def acquire(self):
+        """Bloqueia até haver um token disponível e o consome. Retorna o tempo esperado."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+            waited += wait
+
+    def penalize(self, retry_after):
+        """Suspende todas as requisições por `retry_after` segundos (resposta 429)."""
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+            self._tokens = 0.0
+            self._updated_at = now
+
+    def status(self):
+        """Retorna o orçamento atual do limitador."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "rate": self.rate,
+                "capacity": self.capacity,
+                "available": round(self._tokens, 2),
+                "blocked_for": round(max(0.0, self._blocked_until - now), 2),
+                "shared": False
+            }
+
+class SQLiteTokenBucket:
+    """Token bucket com estado em um arquivo SQLite, compartilhado entre processos.
+
+    Permite que vários workers do gunicorn dividam o mesmo limite de taxa. Cada
+    leitura/consumo acontece em uma transação `BEGIN IMMEDIATE`, que serializa
+    o acesso ao bucket entre processos.
+    """
+
+    def __init__(self, rate, capacity, path, name="mercadolivre"):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.path = path
+        self.name = name
+        self._local = threading.local()
+
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+            "updated_at REAL NOT NULL, blocked_until REAL NOT NULL)"
+        )
+        connection.execute(
+            "INSERT OR IGNORE INTO token_buckets VALUES (?, ?, ?, 0)",
+            (self.name, self.capacity, time.time())
+        )
+
+    def _connection(self):
+        """Retorna a conexão SQLite da thread atual."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def _update(self, consume=False, block_for=None):
+        """Repõe os tokens e, opcionalmente, consome um ou aplica um bloqueio.
+
+        Retorna (consumido, espera_sugerida, tokens, bloqueado_por).
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, updated_at, blocked_until = connection.execute(
+                "SELECT tokens, updated_at, blocked_until FROM token_buckets WHERE name = ?",
+                (self.name,)
+            ).fetchone()
+            now = time.time()
+            tokens = min(self.capacity, tokens + max(0.0, now - max(updated_at, blocked_until)) * self.rate)
+
+            if block_for is not None:
+                blocked_until = max(blocked_until, now + block_for)
+                tokens = 0.0
+
+            consumed = False
+            if consume and now >= blocked_until and tokens >= 1:
+                tokens -= 1
+                consumed = True
+
+            connection.execute(
+                "UPDATE token_buckets SET tokens = ?, updated_at = ?, blocked_until = ? WHERE name = ?",
+                (tokens, now, blocked_until, self.name)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        wait = max(blocked_until - now, (1 - tokens) / self.rate, 0.0)
+        return consumed, wait, tokens, max(0.0, blocked_until - now)
+
+    def acquire(self):
+        """Bloqueia até haver um token disponível e o consome. Retorna o tempo esperado."""
+        waited = 0.0
+        while True:
+            consumed, wait, _, _ = self._update(consume=True)
+            if consumed:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def penalize(self, retry_after):
+        """Suspende as requisições de todos os processos por `retry_after` segundos."""
+        self._update(block_for=retry_after)
+
+    def status(self):
+        """Retorna o orçamento atual do limitador."""
+        _, _, tokens, blocked_for = self._update()
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "available": round(tokens, 2),
+            "blocked_for": round(blocked_for, 2),
+            "shared": True
+        }
+
+# Limitadores compartilhados pelo processo, indexados pela configuração
+_shared_limiters = {}
+_shared_limiters_lock = threading.Lock()
+
+def get_rate_limiter(rate=15, capacity=30, path=None):
+    """Retorna o limitador de taxa compartilhado pelo processo.
+
+    Com `path`, o estado fica em um arquivo SQLite e é dividido entre os workers;
+    sem ele, o limite vale apenas para as threads do processo atual.
+    """
+    key = (rate, capacity, path)
+    with _shared_limiters_lock:
+        limiter = _shared_limiters.get(key)
+        if limiter is None:
+            if path:
+                limiter = SQLiteTokenBucket(rate, capacity, os.path.abspath(path))
+            else:
+                limiter = TokenBucket(rate, capacity)
+            _shared_limiters[key] = limiter
+    return limiter
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Sugestão de reposição para os envios ao Full: velocidade de venda, dias de cobertura e quantidade.
+
+Todos os produtos do usuário são calculados de uma vez: o total vendido na janela
+(da consolidação diária), o estoque atual e o em trânsito são carregados em duas
+consultas e a conta é feita em arrays do NumPy, sem percorrer os produtos um a um
+pelo ORM.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+
+from .models import db, DailySales, Product, ProductInTransit, ProductStock
+
+def replenishment_plan(user_id, days=30, lead_time_days=14, safety_days=7, coverage_days=30,
+                       suggested_only=False, today=None):
+    """Calcula a reposição sugerida de todos os produtos do usuário.
+
+    A velocidade é a média diária vendida nos últimos `days` dias completos. O
+    produto precisa de reposição quando o estoque projetado (disponível mais a
+    caminho do Full) não cobre o prazo de entrega mais o estoque de segurança (`lead_time_days + safety_days` dias
+    de venda); a quantidade sugerida leva o estoque a cobrir também
+    `coverage_days` dias após a chegada. Retorna a lista de produtos ordenada
+    pelos dias de cobertura (os mais urgentes primeiro); com `suggested_only`,
+    apenas os que precisam de reposição.
+    """
+    today = today or datetime.utcnow().date()
+
+    # Consultas pelo Core (sem o carregamento de linhas do ORM), que domina o tempo em catálogos grandes
+    connection = db.session.connection()
+    products = connection.execute(
+        select(
+            Product.id,
+            Product.sku,
+            Product.title,
+            func.coalesce(ProductStock.available_quantity, 0),
+            func.coalesce(ProductInTransit.quantity, 0)
+        ).outerjoin(
+            ProductStock, ProductStock.product_id == Product.id
+        ).outerjoin(
+            ProductInTransit, ProductInTransit.product_id == Product.id
+        ).where(
+            Product.user_id == user_id
+        ).order_by(Product.id)
+    ).all()
+    if not products:
+        return []
+
+    product_ids, skus, titles, available, in_transit = zip(*products)
+    product_ids = np.array(product_ids, dtype=np.int64)
+    available = np.array(available, dtype=np.float64)
+    in_transit = np.array(in_transit, dtype=np.float64)
+
+    # Total vendido por produto na janela, somado no banco a partir da consolidação diária
+    sales = connection.execute(
+        select(DailySales.product_id, func.sum(DailySales.quantity_sold)).where(
+            DailySales.user_id == user_id,
+            DailySales.day >= today - timedelta(days=days),
+            DailySales.day < today
+        ).group_by(DailySales.product_id)
+    ).all()
+    sold = np.zeros(len(product_ids))
+    if sales:
+        sale_product_ids, quantities = (np.array(column) for column in zip(*sales))
+        # product_ids está ordenado: a posição de cada venda é encontrada por busca binária
+        positions = np.searchsorted(product_ids, sale_product_ids)
+        sold = np.bincount(positions, weights=quantities, minlength=len(product_ids))
+
+    velocity = sold / days
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(velocity > 0, available / velocity, np.inf)
+
+    # Estoque projetado: o que já está a caminho do Full também cobre o prazo de entrega
+    projected = available + in_transit
+    reorder_point = velocity * (lead_time_days + safety_days)
+    order_up_to = reorder_point + velocity * coverage_days
+    needs_reorder = (velocity > 0) & (projected <= reorder_point)
+    suggested = np.where(needs_reorder, np.ceil(order_up_to - projected), 0).astype(np.int64)
+
+    # Mais urgentes primeiro; apenas os produtos incluídos na resposta são convertidos para Python
+    order = np.argsort(days_of_cover, kind='stable')
+    if suggested_only:
+        order = order[suggested[order] > 0]
+    cover = np.round(days_of_cover[order], 1).astype(object)
+    cover[~np.isfinite(days_of_cover[order])] = None  # Produto sem vendas na janela
+
+    return [
+        {
+            "product_id": product_id,
+            "sku": skus[index],
+            "title": titles[index],
+            "available": stock,
+            "in_transit": inbound,
+            "daily_velocity": daily_velocity,
+            "days_of_cover": cover_days,
+            "reorder_point": point,
+            "suggested_quantity": quantity
+        }
+        for index, product_id, stock, inbound, daily_velocity, cover_days, point, quantity in zip(
+            order.tolist(),
+            product_ids[order].tolist(),
+            available[order].astype(np.int64).tolist(),
+            in_transit[order].astype(np.int64).tolist(),
+            np.round(velocity[order], 3).tolist(),
+            cover.tolist(),
+            np.round(reorder_point[order], 1).tolist(),
+            suggested[order].tolist()
+        )
+    ]
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Cache das respostas GET da API do Mercado Livre, com validade por tipo de recurso.
+
+As respostas ficam em memória (LRU limitado em bytes) e, opcionalmente, em um arquivo
+SQLite dividido pelos workers do gunicorn. Respostas com ETag continuam guardadas após
+vencer: a próxima leitura envia `If-None-Match` e um 304 renova a validade sem baixar
+o corpo de novo. Descartar uma resposta vale para o processo atual e para o arquivo;
+cópias na memória de outros workers continuam valendo até vencer.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlencode
+
+# Resposta em cache: corpo JSON (texto), ETag e instante (epoch) em que deixa de valer
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag', 'expires_at'])
+
+# Validade padrão (segundos) de cada tipo de recurso; 0 guarda apenas para revalidar pela ETag
+DEFAULT_TTLS = {
+    'user': 3600,
+    'item': 300,
+    'order': 60,
+    'stock': 0
+}
+
+# Respostas vencidas mantidas no arquivo para revalidação por até este tempo (segundos)
+DISK_STALE_SECONDS = 86400
+
+# Gravações no arquivo entre limpezas das respostas vencidas
+DISK_PRUNE_EVERY = 500
+
+def resource_type(endpoint):
+    """Classifica o endpoint pelo tipo de recurso; None para endpoints que não entram no cache.
+
+    Buscas paginadas (/items/search, /orders/search) não são guardadas: os parâmetros
+    mudam a cada página e o resultado depende do momento da leitura.
+    """
+    if endpoint == '/users/me':
+        return 'user'
+    if endpoint.startswith('/items/search') or endpoint.startswith('/orders/search'):
+        return None
+    if endpoint.startswith('/items/'):
+        return 'item'
+    if endpoint.startswith('/orders/'):
+        return 'order'
+    if endpoint.startswith('/inventories/'):
+        return 'stock'
+    return None
+
+def cache_key(namespace, endpoint, params=None):
+    """Chave da resposta: vendedor (namespace), endpoint e parâmetros em ordem fixa."""
+    query = urlencode(sorted((params or {}).items()))
+    return f"{namespace}|{endpoint}?{query}"
+
+class ResponseCache:
+    """Cache LRU de respostas em memória, com uma camada opcional em arquivo SQLite.
+
+    `max_bytes` limita o tamanho somado dos corpos em memória; `ttls` substitui a
+    validade padrão de cada tipo de recurso. Com `path`, as respostas também são
+    gravadas no arquivo, e uma leitura que não está na memória do processo é buscada
+    lá (e promovida à memória).
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttls=None, path=None):
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.path = path
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._disk_writes = 0
+
+        if path:
+            connection = self._connection()
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, body TEXT NOT NULL, etag TEXT, expires_at REAL NOT NULL)"
+            )
+
+    def _connection(self):
+        """Retorna a conexão SQLite da thread atual."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def ttl_for(self, endpoint):
+        """Validade (segundos) das respostas do endpoint; None se ele não entra no cache."""
+        kind = resource_type(endpoint)
+        return self.ttls.get(kind) if kind else None
+
+    def _remember(self, key, entry):
+        """Guarda a resposta na memória, descartando as usadas há mais tempo acima do limite."""
+        size = len(entry.body)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.body)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+
+    def get(self, key):
+        """Retorna a resposta guardada (mesmo vencida, para revalidação) ou None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        # Vencida na memória: outro worker pode já ter renovado a resposta no arquivo
+        if not self.path or (entry is not None and entry.expires_at > time.time()):
+            return entry
+
+        row = self._connection().execute(
+            "SELECT body, etag, expires_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (entry is not None and row[2] <= entry.expires_at):
+            return entry
+        entry = CachedResponse(*row)
+        self._remember(key, entry)
+        return entry
+
+    def set(self, key, body, etag, ttl):
+        """Guarda a resposta por `ttl` segundos. Sem ETag e sem validade, não há o que guardar."""
+        if not ttl and not etag:
+            self.invalidate(key)
+            return
+        entry = CachedResponse(body, etag, time.time() + ttl)
+        self._remember(key, entry)
+
+        if self.path:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO response_cache (key, body, etag, expires_at) VALUES (?, ?, ?, ?)",
+                (key, body, etag, entry.expires_at)
+            )
+            self._disk_writes += 1
+            if self._disk_writes % DISK_PRUNE_EVERY == 0:
+                connection.execute(
+                    "DELETE FROM response_cache WHERE expires_at < ?", (time.time() - DISK_STALE_SECONDS,)
+                )
+
+    def refresh(self, key, entry, ttl):
+        """Renova a validade de uma resposta confirmada pela API (304 Not Modified)."""
+        self.set(key, entry.body, entry.etag, ttl)
+
+    def invalidate(self, key):
+        """Descarta a resposta guardada (ex: o recurso mudou, avisado por notificação)."""
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.body)
+        if self.path:
+            self._connection().execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+# Caches compartilhados pelo processo, indexados pela configuração
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+def get_response_cache(max_bytes=32 * 1024 * 1024, ttls=None, path=None):
+    """Retorna o cache de respostas compartilhado pelo processo.
+
+    Com `path`, as respostas também ficam em um arquivo SQLite dividido entre os
+    workers; sem ele, cada processo tem apenas o cache em memória.
+    """
+    key = (max_bytes, tuple(sorted((ttls or {}).items())), path)
+    with _shared_caches_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = ResponseCache(max_bytes, ttls, os.path.abspath(path) if path else None)
+            _shared_caches[key] = cache
+    return cache
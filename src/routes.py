@@ -1,9 +1,26 @@
 # -*- coding: utf-8 -*-
 """Rotas da aplicação Flask para autenticação e API."""
 
-from flask import Blueprint, request, redirect, url_for, jsonify, session, current_app
-from .models import db, User, ApiCredentials, Product, StockLevel, Sale, StockAdjustment
-from .ml_api import MercadoLivreAPI
+from flask import Blueprint, request, redirect, url_for, jsonify, session, current_app, Response, stream_with_context
+from .models import (
+    db, User, ApiCredentials, Product, ProductStock, StockLevel, Sale, DailySales, StockAdjustment, SyncJob,
+    AlertSettings, ProductAlertThreshold, StockAlert, Shipment, ShipmentItem, ProductInTransit
+)
+from .sync import get_ml_api, get_user_ml_api, sync_user_products, sync_user_stock, sync_user_orders
+from .jobs import enqueue_sync_job, serialize_sync_job, SYNC_JOB_TYPES
+from .stock import record_stock_levels, stock_history
+from .alerts import get_alert_settings, reevaluate_user_alerts, serialize_alert, DEFAULT_ALERT_THRESHOLD
+from .cache import bump_data_version, cached_for_user, conditional_get
+from .pagination import DEFAULT_PAGE_LIMIT, page_limit, paged_limit, decode_cursor, encode_cursor, keyset_before, paginated_response
+from .activities import activity_feed
+from .export import iter_export, EXPORT_DATASETS, EXPORT_FORMATS
+from .replenishment import replenishment_plan
+from .shipments import (
+    SHIPMENT_STATUSES, SHIPMENT_TRANSITIONS, EDITABLE_STATUSES, parse_shipment_items, parse_estimated_delivery,
+    shipment_quantities, replace_shipment_items, apply_in_transit_change, serialize_shipment
+)
+from .events import iter_events
+from .notifications import parse_notification, enqueue_notification
 import os
 from datetime import datetime, timedelta
 from sqlalchemy import func
@@ -12,15 +29,6 @@ from sqlalchemy import func
 auth_bp = Blueprint('auth', __name__)
 api_bp = Blueprint('api', __name__)
 
-# Instância da API do Mercado Livre
-def get_ml_api():
-    """Retorna uma instância configurada da API do Mercado Livre."""
-    return MercadoLivreAPI(
-        app_id=current_app.config.get('ML_APP_ID'),
-        client_secret=current_app.config.get('ML_SECRET_KEY'),
-        redirect_uri=current_app.config.get('ML_REDIRECT_URI')
-    )
-
 @auth_bp.route('/login')
 def login():
     """Inicia o fluxo de autenticação com o Mercado Livre."""
@@ -60,6 +68,7 @@ def callback():
         credentials.refresh_token = token_data["refresh_token"]
         credentials.expires_in = token_data["expires_in"]
         credentials.last_refresh_time = datetime.utcnow()
+        credentials.ml_user_id = str(user_info["id"])
         
         db.session.add(credentials)
         db.session.commit()
@@ -91,19 +100,25 @@ def get_user():
     })
 
 @api_bp.route('/products')
+@conditional_get
 def get_products():
     """Retorna os produtos do usuário."""
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"error": "Usuário não autenticado"}), 401
     
-    products = Product.query.filter_by(user_id=user_id).all()
+    # Produtos, estoque atual e quantidade a caminho do Full em uma única consulta
+    products = db.session.query(Product, ProductStock, ProductInTransit.quantity).outerjoin(
+        ProductStock, ProductStock.product_id == Product.id
+    ).outerjoin(
+        ProductInTransit, ProductInTransit.product_id == Product.id
+    ).filter(
+        Product.user_id == user_id
+    ).all()
     result = []
     
-    for product in products:
-        # Obter o último nível de estoque
-        last_stock = StockLevel.query.filter_by(product_id=product.id).order_by(StockLevel.timestamp.desc()).first()
-        
+    for product, current_stock, in_transit in products:
+        available = current_stock.available_quantity if current_stock else 0
         product_data = {
             "id": product.id,
             "sku": product.sku,
@@ -112,10 +127,12 @@ def get_products():
             "title": product.title,
             "created_at": product.created_at.isoformat(),
             "stock": {
-                "total": last_stock.total_quantity if last_stock else 0,
-                "available": last_stock.available_quantity if last_stock else 0,
-                "not_available": last_stock.not_available_quantity if last_stock else 0,
-                "last_updated": last_stock.timestamp.isoformat() if last_stock else None
+                "total": current_stock.total_quantity if current_stock else 0,
+                "available": available,
+                "not_available": current_stock.not_available_quantity if current_stock else 0,
+                "in_transit": in_transit or 0,
+                "projected": available + (in_transit or 0),
+                "last_updated": current_stock.updated_at.isoformat() if current_stock else None
             }
         }
         result.append(product_data)
@@ -134,70 +151,13 @@ def sync_products():
         return jsonify({"error": "Credenciais não encontradas"}), 404
     
     try:
-        ml_api = get_ml_api()
-        ml_api.access_token = credentials.access_token
-        ml_api.refresh_token = credentials.refresh_token
-        
-        # Obter informações do usuário
-        user_info = ml_api.get_user_info()
-        ml_user_id = user_info["id"]
-        
-        # Obter itens do usuário
-        items_result = ml_api.get_user_items(ml_user_id)
-        
-        new_count = 0
-        updated_count = 0
-        
-        for item_id in items_result.get("results", []):
-            # Obter detalhes do item
-            item_details = ml_api.get_item_details(item_id)
-            
-            # Verificar se o item já existe
-            product = Product.query.filter_by(user_id=user_id, ml_item_id=item_id).first()
-            
-            if not product:
-                # Criar novo produto
-                product = Product(
-                    user_id=user_id,
-                    sku=item_details.get("seller_custom_field", ""),
-                    ml_item_id=item_id,
-                    ml_inventory_id=item_details.get("inventory_id"),
-                    title=item_details.get("title", "")
-                )
-                db.session.add(product)
-                new_count += 1
-            else:
-                # Atualizar produto existente
-                product.ml_inventory_id = item_details.get("inventory_id")
-                product.title = item_details.get("title", "")
-                if not product.sku and item_details.get("seller_custom_field"):
-                    product.sku = item_details.get("seller_custom_field", "")
-                db.session.add(product)
-                updated_count += 1
-            
-            # Se o produto tem inventory_id, sincronizar estoque
-            if product.ml_inventory_id:
-                try:
-                    stock_data = ml_api.get_fulfillment_stock(product.ml_inventory_id)
-                    
-                    # Registrar nível de estoque
-                    stock_level = StockLevel(
-                        product_id=product.id,
-                        total_quantity=stock_data.get("total", 0),
-                        available_quantity=stock_data.get("available_quantity", 0),
-                        not_available_quantity=stock_data.get("not_available_quantity", 0)
-                    )
-                    db.session.add(stock_level)
-                except Exception as e:
-                    # Continuar mesmo se houver erro em um item específico
-                    print(f"Erro ao sincronizar estoque do produto {item_id}: {str(e)}")
-        
-        db.session.commit()
+        ml_api = get_user_ml_api(credentials)
+        result = sync_user_products(user_id, ml_api)
         
         return jsonify({
             "success": True,
-            "new_products": new_count,
-            "updated_products": updated_count
+            "new_products": result["new_products"],
+            "updated_products": result["updated_products"]
         })
     
     except Exception as e:
@@ -216,145 +176,239 @@ def sync_stock():
         return jsonify({"error": "Credenciais não encontradas"}), 404
     
     try:
-        ml_api = get_ml_api()
-        ml_api.access_token = credentials.access_token
-        ml_api.refresh_token = credentials.refresh_token
-        
-        # Obter produtos com inventory_id
-        products = Product.query.filter(
-            Product.user_id == user_id,
-            Product.ml_inventory_id.isnot(None)
-        ).all()
-        
-        updated_count = 0
-        
-        for product in products:
-            try:
-                stock_data = ml_api.get_fulfillment_stock(product.ml_inventory_id)
-                
-                # Registrar nível de estoque
-                stock_level = StockLevel(
-                    product_id=product.id,
-                    total_quantity=stock_data.get("total", 0),
-                    available_quantity=stock_data.get("available_quantity", 0),
-                    not_available_quantity=stock_data.get("not_available_quantity", 0)
-                )
-                db.session.add(stock_level)
-                updated_count += 1
-            except Exception as e:
-                # Continuar mesmo se houver erro em um item específico
-                print(f"Erro ao sincronizar estoque do produto {product.ml_item_id}: {str(e)}")
-        
-        db.session.commit()
+        ml_api = get_user_ml_api(credentials)
+        result = sync_user_stock(user_id, ml_api)
         
         return jsonify({
             "success": True,
-            "updated_products": updated_count
+            "updated_products": result["updated_products"],
+            "changed_products": result["changed_products"],
+            "failed_products": result["failed_products"]
         })
     
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
-@api_bp.route('/stats')
-def get_stats():
-    """Retorna estatísticas para o dashboard."""
+@api_bp.route('/sync/orders')
+def sync_orders():
+    """Importa os pedidos novos ou alterados do Mercado Livre para o histórico de vendas."""
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"error": "Usuário não autenticado"}), 401
     
-    # Contar produtos
-    product_count = Product.query.filter_by(user_id=user_id).count()
+    credentials = ApiCredentials.query.filter_by(user_id=user_id).first()
+    if not credentials:
+        return jsonify({"error": "Credenciais não encontradas"}), 404
     
-    # Calcular estoque disponível total
-    available_stock = db.session.query(db.func.sum(StockLevel.available_quantity)).join(
-        Product, Product.id == StockLevel.product_id
-    ).filter(
-        Product.user_id == user_id
-    ).group_by(
-        StockLevel.product_id
-    ).all()
+    try:
+        ml_api = get_user_ml_api(credentials)
+        result = sync_user_orders(user_id, ml_api)
+        
+        result["success"] = True
+        return jsonify(result)
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@api_bp.route('/sync/jobs', methods=['POST'])
+def create_sync_job():
+    """Inicia um job de sincronização em segundo plano (ou retorna o job já em andamento)."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    data = request.get_json(silent=True) or {}
+    job_type = data.get('type')
+    if job_type not in SYNC_JOB_TYPES:
+        return jsonify({"error": f"Tipo de job inválido. Tipos válidos: {', '.join(SYNC_JOB_TYPES)}"}), 400
+    
+    credentials = ApiCredentials.query.filter_by(user_id=user_id).first()
+    if not credentials:
+        return jsonify({"error": "Credenciais não encontradas"}), 404
+    
+    job, created = enqueue_sync_job(user_id, job_type)
+    
+    response = serialize_sync_job(job)
+    response["job_id"] = job.id
+    response["joined"] = not created
+    return jsonify(response), 202 if created else 200
+
+@api_bp.route('/sync/jobs/<int:job_id>')
+def get_sync_job(job_id):
+    """Retorna o status e o progresso de um job de sincronização."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    job = SyncJob.query.filter_by(id=job_id, user_id=user_id).first()
+    if not job:
+        return jsonify({"error": "Job não encontrado"}), 404
+    
+    return jsonify(serialize_sync_job(job))
+
+@api_bp.route('/sync/rate-limit')
+def get_rate_limit_status():
+    """Retorna o orçamento atual de requisições à API do Mercado Livre."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    return jsonify(get_ml_api().get_rate_limit_status())
+
+@api_bp.route('/events')
+def stream_events():
+    """Stream SSE com mudanças de estoque, progresso dos jobs de sincronização e alertas."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    # Retomar a partir do último evento recebido (cabeçalho enviado pelo EventSource ao reconectar)
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID inválido"}), 400
+    
+    events = iter_events(
+        user_id,
+        last_event_id,
+        stream_seconds=current_app.config.get('EVENTS_STREAM_SECONDS', 25),
+        poll_seconds=current_app.config.get('EVENTS_POLL_SECONDS', 2)
+    )
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Desativar o buffer do Nginx para o stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@api_bp.route('/notifications/ml', methods=['POST'])
+def receive_ml_notification():
+    """Callback das notificações do Mercado Livre: enfileira o recurso alterado e responde na hora.
+
+    Não usa a sessão: o vendedor é identificado pelo user_id da notificação. A leitura
+    do recurso na API fica para o worker (`flask process-notifications`).
+    """
+    try:
+        notification = parse_notification(request.get_json(silent=True), current_app.config.get('ML_APP_ID'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if notification is None:
+        # Tópico não acompanhado: confirmar mesmo assim para o Mercado Livre não reenviar
+        return jsonify({"received": True, "queued": False})
     
-    total_available = sum([stock[0] for stock in available_stock]) if available_stock else 0
+    created = enqueue_notification(**notification)
+    db.session.commit()
+    return jsonify({"received": True, "queued": True, "coalesced": not created})
+
+@api_bp.route('/stats')
+@conditional_get
+def get_stats():
+    """Retorna estatísticas para o dashboard."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
     
-    # Contar vendas do mês atual
     first_day_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    sales_count = db.session.query(db.func.sum(Sale.quantity_sold)).join(
-        Product, Product.id == Sale.product_id
-    ).filter(
-        Product.user_id == user_id,
-        Sale.sale_timestamp >= first_day_of_month
-    ).scalar() or 0
     
-    # Contar produtos com estoque baixo (menos de 5 unidades disponíveis)
-    low_stock_products = db.session.query(Product).join(
-        StockLevel, StockLevel.product_id == Product.id
-    ).filter(
-        Product.user_id == user_id,
-        StockLevel.available_quantity < 5
-    ).distinct().count()
+    def compute_stats():
+        # Contar produtos
+        product_count = Product.query.filter_by(user_id=user_id).count()
+        
+        # Estoque atual (último registro de cada produto): total disponível
+        total_available = db.session.query(
+            func.coalesce(func.sum(ProductStock.available_quantity), 0)
+        ).join(
+            Product, Product.id == ProductStock.product_id
+        ).filter(
+            Product.user_id == user_id
+        ).scalar()
+        
+        # Produtos com estoque baixo: alertas abertos, mantidos a cada gravação do estoque
+        low_stock_products = StockAlert.query.filter_by(user_id=user_id, status='open').count()
+        
+        # Contar vendas do mês atual
+        sales_count = db.session.query(db.func.sum(Sale.quantity_sold)).join(
+            Product, Product.id == Sale.product_id
+        ).filter(
+            Product.user_id == user_id,
+            Sale.sale_timestamp >= first_day_of_month
+        ).scalar() or 0
+        
+        return {
+            "product_count": product_count,
+            "available_stock": total_available,
+            "monthly_sales": sales_count,
+            "low_stock_alerts": low_stock_products
+        }
     
-    return jsonify({
-        "product_count": product_count,
-        "available_stock": total_available,
-        "monthly_sales": sales_count,
-        "low_stock_alerts": low_stock_products
-    })
+    # Recalculado apenas quando os dados do usuário mudam (ou o mês vira)
+    stats = cached_for_user('stats', user_id, compute_stats, key=first_day_of_month.isoformat())
+    return jsonify(stats)
 
 @api_bp.route('/charts/sales')
+@conditional_get
 def get_sales_chart_data():
-    """Retorna dados de vendas dos últimos 30 dias para gráficos."""
+    """Retorna dados de vendas dos últimos dias (padrão: 30) para gráficos."""
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"error": "Usuário não autenticado"}), 401
     
-    # Data de 30 dias atrás
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    # Janela do gráfico em dias (ex: 7, 30, 90, 365)
+    days = request.args.get('days', default=30, type=int)
+    
+    # Primeiro dia da janela (a consolidação é diária): `days` dias, incluindo hoje
+    first_day = (datetime.utcnow() - timedelta(days=days - 1)).date()
     
-    # Buscar os 5 produtos mais vendidos nos últimos 30 dias
+    # Buscar os 5 produtos mais vendidos na janela, a partir da consolidação diária
     top_products = db.session.query(
         Product.id,
         Product.title,
-        func.sum(Sale.quantity_sold).label('total_sold')
+        func.sum(DailySales.quantity_sold).label('total_sold')
     ).join(
-        Sale, Sale.product_id == Product.id
+        Product, Product.id == DailySales.product_id
     ).filter(
-        Product.user_id == user_id,
-        Sale.sale_timestamp >= thirty_days_ago
+        DailySales.user_id == user_id,
+        DailySales.day >= first_day
     ).group_by(
-        Product.id
+        Product.id,
+        Product.title
     ).order_by(
-        func.sum(Sale.quantity_sold).desc()
+        func.sum(DailySales.quantity_sold).desc()
     ).limit(5).all()
     
-    result = []
-    
-    for product_id, title, total_sold in top_products:
-        # Buscar vendas diárias para este produto
+    # Vendas diárias dos produtos selecionados, em uma única leitura
+    daily_by_product = {}
+    if top_products:
         daily_sales = db.session.query(
-            func.date(Sale.sale_timestamp).label('date'),
-            func.sum(Sale.quantity_sold).label('quantity')
+            DailySales.product_id,
+            DailySales.day,
+            DailySales.quantity_sold
         ).filter(
-            Sale.product_id == product_id,
-            Sale.sale_timestamp >= thirty_days_ago
-        ).group_by(
-            func.date(Sale.sale_timestamp)
+            DailySales.user_id == user_id,
+            DailySales.product_id.in_([product_id for product_id, _, _ in top_products]),
+            DailySales.day >= first_day
+        ).order_by(
+            DailySales.day
         ).all()
         
-        # Criar dicionário com datas e quantidades
-        sales_data = {
+        for product_id, day, quantity in daily_sales:
+            daily_by_product.setdefault(product_id, []).append({
+                'date': day.strftime('%Y-%m-%d'),
+                'quantity': quantity
+            })
+    
+    result = []
+    
+    for product_id, title, total_sold in top_products:
+        result.append({
             'id': product_id,
             'title': title,
             'total_sold': total_sold,
-            'daily_data': [
-                {
-                    'date': date.strftime('%Y-%m-%d'),
-                    'quantity': quantity
-                } for date, quantity in daily_sales
-            ]
-        }
-        
-        result.append(sales_data)
+            'daily_data': daily_by_product.get(product_id, [])
+        })
     
     # Se não houver dados reais, gerar dados de exemplo para visualização
     if not result:
@@ -368,7 +422,7 @@ def get_sales_chart_data():
         ]
         
         import random
-        from datetime import date, timedelta
+        from datetime import date
         
         today = date.today()
         
@@ -376,8 +430,8 @@ def get_sales_chart_data():
             total_sold = 0
             daily_data = []
             
-            for i in range(30):
-                day = today - timedelta(days=29-i)
+            for i in range(days):
+                day = today - timedelta(days=days-1-i)
                 quantity = random.randint(0, 10)
                 total_sold += quantity
                 
@@ -396,60 +450,67 @@ def get_sales_chart_data():
     return jsonify(result)
 
 @api_bp.route('/charts/stock')
+@conditional_get
 def get_stock_chart_data():
     """Retorna dados históricos de estoque para gráficos."""
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"error": "Usuário não autenticado"}), 401
     
-    # Data de 30 dias atrás
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    # Parâmetros de filtro
+    days = request.args.get('days', default=30, type=int)
+    
+    # Data limite para o filtro
+    date_limit = datetime.utcnow() - timedelta(days=days)
+    retention = (
+        current_app.config.get('STOCK_RAW_RETENTION_DAYS', 7),
+        current_app.config.get('STOCK_HOURLY_RETENTION_DAYS', 90)
+    )
     
-    # Buscar produtos com mais registros de estoque
+    # Buscar produtos com mais registros de estoque (brutos e consolidados)
+    history = stock_history(date_limit, *retention, user_id=user_id)
     products_with_stock = db.session.query(
         Product.id,
         Product.title,
-        func.count(StockLevel.id).label('stock_count')
+        func.count().label('stock_count')
     ).join(
-        StockLevel, StockLevel.product_id == Product.id
-    ).filter(
-        Product.user_id == user_id,
-        StockLevel.timestamp >= thirty_days_ago
+        history, history.c.product_id == Product.id
     ).group_by(
         Product.id
     ).order_by(
-        func.count(StockLevel.id).desc()
+        func.count().desc()
     ).limit(5).all()
     
     result = []
     
-    for product_id, title, _ in products_with_stock:
-        # Buscar níveis de estoque para este produto
+    if products_with_stock:
+        # Buscar o histórico dos produtos selecionados em uma única consulta
+        product_ids = [product_id for product_id, _, _ in products_with_stock]
+        history = stock_history(date_limit, *retention, product_ids=product_ids)
         stock_levels = db.session.query(
-            StockLevel.timestamp,
-            StockLevel.available_quantity,
-            StockLevel.total_quantity
-        ).filter(
-            StockLevel.product_id == product_id,
-            StockLevel.timestamp >= thirty_days_ago
+            history.c.product_id,
+            history.c.timestamp,
+            history.c.available_quantity,
+            history.c.total_quantity
         ).order_by(
-            StockLevel.timestamp
+            history.c.product_id,
+            history.c.timestamp
         ).all()
         
-        # Criar dicionário com timestamps e quantidades
-        stock_data = {
-            'id': product_id,
-            'title': title,
-            'stock_history': [
-                {
-                    'date': timestamp.strftime('%Y-%m-%d'),
-                    'available': available,
-                    'total': total
-                } for timestamp, available, total in stock_levels
-            ]
-        }
+        history_by_product = {}
+        for product_id, timestamp, available, total in stock_levels:
+            history_by_product.setdefault(product_id, []).append({
+                'date': timestamp.strftime('%Y-%m-%d'),
+                'available': available,
+                'total': total
+            })
         
-        result.append(stock_data)
+        for product_id, title, _ in products_with_stock:
+            result.append({
+                'id': product_id,
+                'title': title,
+                'stock_history': history_by_product.get(product_id, [])
+            })
     
     # Se não houver dados reais, gerar dados de exemplo para visualização
     if not result:
@@ -463,12 +524,12 @@ def get_stock_chart_data():
         ]
         
         import random
-        from datetime import date, timedelta
+        from datetime import date
         
         today = date.today()
         
         for product in example_products:
-            stock_history = []
+            example_history = []
             
             # Valor inicial de estoque
             total = random.randint(50, 100)
@@ -484,7 +545,7 @@ def get_stock_chart_data():
                     available = max(0, available - reduction)
                     total = max(available, total - random.randint(0, 3))  # Às vezes reduz o total também
                 
-                stock_history.append({
+                example_history.append({
                     'date': day.strftime('%Y-%m-%d'),
                     'available': available,
                     'total': total
@@ -493,25 +554,414 @@ def get_stock_chart_data():
             result.append({
                 'id': product["id"],
                 'title': product["title"],
-                'stock_history': stock_history
+                'stock_history': example_history
             })
     
     return jsonify(result)
 
+@api_bp.route('/replenishment')
+@conditional_get
+def get_replenishment():
+    """Retorna velocidade de venda, dias de cobertura e reposição sugerida de todos os produtos."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    days = request.args.get('days', default=30, type=int)
+    lead_time_days = request.args.get('lead_time_days', default=current_app.config.get('REPLENISHMENT_LEAD_TIME_DAYS', 14), type=int)
+    safety_days = request.args.get('safety_days', default=current_app.config.get('REPLENISHMENT_SAFETY_DAYS', 7), type=int)
+    coverage_days = request.args.get('coverage_days', default=current_app.config.get('REPLENISHMENT_COVERAGE_DAYS', 30), type=int)
+    suggested_only = request.args.get('suggested_only', default='false').lower() in ('1', 'true')
+    if days < 1 or min(lead_time_days, safety_days, coverage_days) < 0:
+        return jsonify({"error": "Parâmetros inválidos: days deve ser positivo e os prazos não negativos"}), 400
+    
+    today = datetime.utcnow().date()
+    
+    def compute_plan():
+        return replenishment_plan(user_id, days, lead_time_days, safety_days, coverage_days, suggested_only, today)
+    
+    # Recalculado apenas quando os dados do usuário mudam, o dia vira ou os parâmetros mudam
+    plan = cached_for_user(
+        'replenishment', user_id, compute_plan,
+        key=(days, lead_time_days, safety_days, coverage_days, suggested_only, today.isoformat())
+    )
+    
+    return jsonify({
+        "days": days,
+        "lead_time_days": lead_time_days,
+        "safety_days": safety_days,
+        "coverage_days": coverage_days,
+        "products": plan
+    })
+
+@api_bp.route('/alerts')
+@conditional_get
+def get_alerts():
+    """Retorna os alertas de estoque baixo do usuário (padrão: apenas os abertos)."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    status = request.args.get('status', default='open')
+    if status not in ('open', 'resolved', 'all'):
+        return jsonify({"error": "Status inválido. Status válidos: open, resolved, all"}), 400
+    limit = page_limit(request.args.get('limit', type=int))
+    try:
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Consulta pelo índice (user_id, status, created_at, id), do alerta mais recente para o mais antigo
+    alerts_query = db.session.query(StockAlert, Product.title).join(
+        Product, Product.id == StockAlert.product_id
+    ).filter(StockAlert.user_id == user_id)
+    if status != 'all':
+        alerts_query = alerts_query.filter(StockAlert.status == status)
+    if cursor:
+        alerts_query = alerts_query.filter(keyset_before(cursor, 'alert', StockAlert.created_at, StockAlert.id))
+    
+    alerts = alerts_query.order_by(
+        StockAlert.created_at.desc(),
+        StockAlert.id.desc()
+    ).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(alerts) > limit:
+        alerts = alerts[:limit]
+        next_cursor = encode_cursor(alerts[-1][0].created_at, 'alert', alerts[-1][0].id)
+    
+    unread_count = StockAlert.query.filter_by(user_id=user_id, status='open', read=False).count()
+    
+    return paginated_response({
+        "alerts": [serialize_alert(alert, product_title) for alert, product_title in alerts],
+        "unread_count": unread_count
+    }, next_cursor)
+
+@api_bp.route('/alerts/<int:alert_id>/read', methods=['POST'])
+def mark_alert_read(alert_id):
+    """Marca um alerta como lido."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    alert = StockAlert.query.filter_by(id=alert_id, user_id=user_id).first()
+    if not alert:
+        return jsonify({"error": "Alerta não encontrado"}), 404
+    
+    alert.read = True
+    bump_data_version(user_id)
+    db.session.commit()
+    
+    return jsonify({"success": True})
+
+@api_bp.route('/alerts/settings')
+def get_alert_settings_route():
+    """Retorna as configurações de alertas globais e os limites por produto."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    settings = get_alert_settings(user_id)
+    product_thresholds = db.session.query(
+        ProductAlertThreshold.product_id,
+        Product.title,
+        ProductAlertThreshold.threshold
+    ).join(
+        Product, Product.id == ProductAlertThreshold.product_id
+    ).filter(
+        Product.user_id == user_id
+    ).order_by(Product.title).all()
+    
+    return jsonify({
+        "global": {
+            "enabled": settings.enabled,
+            "threshold": settings.threshold,
+            "notification_email": settings.notification_email or '',
+            "notification_dashboard": settings.notification_dashboard
+        },
+        "products": [
+            {"product_id": product_id, "product_title": title, "threshold": threshold}
+            for product_id, title, threshold in product_thresholds
+        ]
+    })
+
+@api_bp.route('/alerts/settings', methods=['POST'])
+def update_alert_settings():
+    """Atualiza as configurações de alertas e reavalia os alertas dos produtos."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    data = request.json
+    if not data:
+        return jsonify({"error": "Dados não fornecidos"}), 400
+    
+    global_data = data.get('global') or {}
+    threshold = global_data.get('threshold', DEFAULT_ALERT_THRESHOLD)
+    if not isinstance(threshold, int) or threshold < 0:
+        return jsonify({"error": "Limite global inválido. Deve ser um inteiro não negativo."}), 400
+    
+    # Limites por produto: a lista enviada substitui a anterior
+    product_thresholds = {}
+    for item in data.get('products') or []:
+        if not isinstance(item.get('threshold'), int) or item['threshold'] < 0:
+            return jsonify({"error": f"Limite inválido para o produto {item.get('product_id')}"}), 400
+        product_thresholds[item.get('product_id')] = item['threshold']
+    
+    user_product_ids = {
+        product_id for (product_id,) in db.session.query(Product.id).filter(Product.user_id == user_id)
+    }
+    unknown = [product_id for product_id in product_thresholds if product_id not in user_product_ids]
+    if unknown:
+        return jsonify({"error": f"Produto não encontrado ou não pertence ao usuário: {unknown[0]}"}), 404
+    
+    try:
+        settings = db.session.get(AlertSettings, user_id)
+        if settings is None:
+            settings = AlertSettings(user_id=user_id)
+            db.session.add(settings)
+        settings.enabled = bool(global_data.get('enabled', True))
+        settings.threshold = threshold
+        settings.notification_email = global_data.get('notification_email') or None
+        settings.notification_dashboard = bool(global_data.get('notification_dashboard', True))
+        
+        ProductAlertThreshold.query.filter(
+            ProductAlertThreshold.product_id.in_(db.session.query(Product.id).filter(Product.user_id == user_id))
+        ).delete(synchronize_session=False)
+        db.session.add_all(
+            ProductAlertThreshold(product_id=product_id, threshold=product_threshold)
+            for product_id, product_threshold in product_thresholds.items()
+        )
+        
+        # Abrir ou resolver os alertas conforme os novos limites
+        reevaluate_user_alerts(user_id, settings)
+        bump_data_version(user_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+    
+    return jsonify({"success": True, "message": "Configurações de alertas salvas com sucesso"})
+
+@api_bp.route('/shipments')
+@conditional_get
+def get_shipments():
+    """Retorna os envios ao Full do usuário, do mais recente para o mais antigo."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    status = request.args.get('status', default='all')
+    if status != 'all' and status not in SHIPMENT_STATUSES:
+        return jsonify({"error": f"Status inválido. Status válidos: all, {', '.join(SHIPMENT_STATUSES)}"}), 400
+    page = max(1, request.args.get('page', default=1, type=int))
+    limit = page_limit(request.args.get('limit', type=int))
+    
+    shipments_query = Shipment.query.filter(Shipment.user_id == user_id)
+    if status != 'all':
+        shipments_query = shipments_query.filter(Shipment.status == status)
+    total = shipments_query.count()
+    
+    # Quantidade de itens e de unidades de cada envio em uma única consulta agregada
+    items_totals = db.session.query(
+        ShipmentItem.shipment_id,
+        func.count(ShipmentItem.id).label('items_count'),
+        func.sum(ShipmentItem.quantity).label('total_items')
+    ).group_by(ShipmentItem.shipment_id).subquery()
+    
+    shipments = db.session.query(
+        Shipment,
+        items_totals.c.items_count,
+        items_totals.c.total_items
+    ).outerjoin(
+        items_totals, items_totals.c.shipment_id == Shipment.id
+    ).filter(
+        Shipment.id.in_(shipments_query.with_entities(Shipment.id).order_by(
+            Shipment.created_at.desc(), Shipment.id.desc()
+        ).offset((page - 1) * limit).limit(limit))
+    ).order_by(Shipment.created_at.desc(), Shipment.id.desc()).all()
+    
+    return jsonify({
+        "shipments": [
+            serialize_shipment(shipment, items_count or 0, total_items or 0)
+            for shipment, items_count, total_items in shipments
+        ],
+        "total": total,
+        "page": page,
+        "limit": limit
+    })
+
+@api_bp.route('/shipments/<int:shipment_id>')
+@conditional_get
+def get_shipment(shipment_id):
+    """Retorna um envio com os seus itens."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    shipment = Shipment.query.filter_by(id=shipment_id, user_id=user_id).first()
+    if not shipment:
+        return jsonify({"error": "Envio não encontrado"}), 404
+    
+    items = db.session.query(
+        ShipmentItem.product_id,
+        Product.title,
+        ShipmentItem.quantity
+    ).join(
+        Product, Product.id == ShipmentItem.product_id
+    ).filter(
+        ShipmentItem.shipment_id == shipment.id
+    ).order_by(Product.title).all()
+    
+    result = serialize_shipment(shipment)
+    result["items"] = [
+        {"product_id": product_id, "product_title": title, "quantity": quantity}
+        for product_id, title, quantity in items
+    ]
+    return jsonify(result)
+
+@api_bp.route('/shipments', methods=['POST'])
+def create_shipment():
+    """Cria um envio ao Full (rascunho ou pendente) com os seus itens."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    data = request.json
+    if not data:
+        return jsonify({"error": "Dados não fornecidos"}), 400
+    if not data.get('destination_warehouse'):
+        return jsonify({"error": "Campo obrigatório não fornecido: destination_warehouse"}), 400
+    
+    status = data.get('status', 'draft')
+    if status not in ('draft', 'pending'):
+        return jsonify({"error": "Status inicial inválido. Status válidos: draft, pending"}), 400
+    
+    try:
+        quantities = parse_shipment_items(user_id, data.get('items', []))
+        estimated_delivery = parse_estimated_delivery(data.get('estimated_delivery'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not quantities:
+        return jsonify({"error": "O envio deve ter ao menos um item"}), 400
+    
+    try:
+        shipment = Shipment(
+            user_id=user_id,
+            status=status,
+            destination_warehouse=data['destination_warehouse'],
+            notes=data.get('notes'),
+            tracking_number=data.get('tracking_number'),
+            estimated_delivery=estimated_delivery
+        )
+        db.session.add(shipment)
+        db.session.flush()
+        
+        replace_shipment_items(shipment, quantities)
+        apply_in_transit_change(None, {}, status, quantities)
+        bump_data_version(user_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+    
+    return jsonify({
+        "success": True,
+        "message": "Envio criado com sucesso",
+        "shipment": {
+            "id": shipment.id,
+            "status": shipment.status,
+            "created_at": shipment.created_at.isoformat(),
+            "tracking_number": shipment.tracking_number
+        }
+    }), 201
+
+@api_bp.route('/shipments/<int:shipment_id>', methods=['PUT'])
+def update_shipment(shipment_id):
+    """Atualiza o status, os dados ou os itens de um envio."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    data = request.json
+    if not data:
+        return jsonify({"error": "Dados não fornecidos"}), 400
+    
+    shipment = Shipment.query.filter_by(id=shipment_id, user_id=user_id).first()
+    if not shipment:
+        return jsonify({"error": "Envio não encontrado"}), 404
+    
+    before_status = shipment.status
+    if not SHIPMENT_TRANSITIONS[before_status]:
+        return jsonify({"error": f"Envio com status {before_status} não pode ser alterado"}), 400
+    status = data.get('status', before_status)
+    if status != before_status and status not in SHIPMENT_TRANSITIONS[before_status]:
+        return jsonify({"error": f"Não é possível alterar o status de {before_status} para {status}"}), 400
+    
+    quantities = None
+    if 'items' in data and (before_status not in EDITABLE_STATUSES or status not in EDITABLE_STATUSES):
+        return jsonify({"error": "Os itens só podem ser alterados em envios em rascunho ou pendentes"}), 400
+    try:
+        if 'items' in data:
+            quantities = parse_shipment_items(user_id, data['items'])
+        estimated_delivery = parse_estimated_delivery(data['estimated_delivery']) if 'estimated_delivery' in data else shipment.estimated_delivery
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if quantities is not None and not quantities:
+        return jsonify({"error": "O envio deve ter ao menos um item"}), 400
+    
+    try:
+        before_quantities = shipment_quantities(shipment.id)
+        shipment.estimated_delivery = estimated_delivery
+        for field in ('destination_warehouse', 'notes', 'tracking_number'):
+            if field in data:
+                setattr(shipment, field, data[field])
+        shipment.status = status
+        shipment.updated_at = datetime.utcnow()
+        
+        if quantities is not None:
+            replace_shipment_items(shipment, quantities)
+        apply_in_transit_change(
+            before_status, before_quantities,
+            status, quantities if quantities is not None else before_quantities
+        )
+        bump_data_version(user_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+    
+    return jsonify({
+        "success": True,
+        "message": "Envio atualizado com sucesso",
+        "shipment": {
+            "id": shipment.id,
+            "status": shipment.status,
+            "updated_at": shipment.updated_at.isoformat()
+        }
+    })
+
 @api_bp.route('/sales')
+@conditional_get
 def get_sales():
     """Retorna o histórico de vendas."""
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"error": "Usuário não autenticado"}), 401
     
-    # Parâmetros de filtro
+    # Parâmetros de filtro e paginação
     days = request.args.get('days', default=30, type=int)
+    try:
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # Sem `limit` nem `cursor`, retorna o período inteiro (como antes da paginação)
+    limit = paged_limit(request.args.get('limit', type=int), cursor)
     
     # Data limite para o filtro
     date_limit = datetime.utcnow() - timedelta(days=days)
     
-    # Buscar vendas
+    # Buscar vendas (do registro mais recente para o mais antigo)
     sales_query = db.session.query(
         Sale.id,
         Sale.ml_order_id,
@@ -524,12 +974,20 @@ def get_sales():
     ).filter(
         Product.user_id == user_id,
         Sale.sale_timestamp >= date_limit
-    ).order_by(
-        Sale.sale_timestamp.desc()
     )
+    if cursor:
+        sales_query = sales_query.filter(keyset_before(cursor, 'sale', Sale.sale_timestamp, Sale.id))
     
-    # Executar a consulta
-    sales = sales_query.all()
+    # Executar a consulta (um registro a mais indica que existe próxima página)
+    sales = sales_query.order_by(
+        Sale.sale_timestamp.desc(),
+        Sale.id.desc()
+    ).limit(limit + 1 if limit else None).all()
+    
+    next_cursor = None
+    if limit and len(sales) > limit:
+        sales = sales[:limit]
+        next_cursor = encode_cursor(sales[-1].sale_timestamp, 'sale', sales[-1].id)
     
     # Formatar resultados
     result = []
@@ -544,9 +1002,10 @@ def get_sales():
         })
     
     # Se não houver dados reais, gerar dados de exemplo para visualização
-    if not result:
-        # Gerar dados de exemplo para demonstração
+    if not result and not cursor:
+        # Gerar dados de exemplo para demonstração (sem `limit`, uma página padrão)
         import random
+        example_count = limit or DEFAULT_PAGE_LIMIT
         
         products = Product.query.filter_by(user_id=user_id).all()
         
@@ -560,7 +1019,7 @@ def get_sales():
                 {"id": 5, "title": "Câmera Canon EOS"}
             ]
             
-            for i in range(50):
+            for i in range(example_count):
                 product = random.choice(example_products)
                 sale_date = date_limit + timedelta(days=random.randint(0, days))
                 
@@ -573,7 +1032,7 @@ def get_sales():
                     'product_title': product["title"]
                 })
         else:
-            for i in range(50):
+            for i in range(example_count):
                 product = random.choice(products)
                 sale_date = date_limit + timedelta(days=random.randint(0, days))
                 
@@ -586,114 +1045,85 @@ def get_sales():
                     'product_title': product.title
                 })
     
-    return jsonify(result)
+    return paginated_response(result, next_cursor)
 
 @api_bp.route('/activities')
+@conditional_get
 def get_activities():
     """Retorna o histórico de atividades (vendas, ajustes, sincronizações)."""
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"error": "Usuário não autenticado"}), 401
     
-    # Parâmetros de filtro
+    # Parâmetros de filtro e paginação
     days = request.args.get('days', default=30, type=int)
     activity_type = request.args.get('type', default='all')
+    try:
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # Sem `limit` nem `cursor`, retorna o período inteiro (como antes da paginação)
+    limit = paged_limit(request.args.get('limit', type=int), cursor)
     
     # Data limite para o filtro
     date_limit = datetime.utcnow() - timedelta(days=days)
     
-    activities = []
+    # Uma única consulta (UNION ALL das fontes) com ordenação e limite no banco;
+    # um registro a mais indica que existe próxima página
+    rows = activity_feed(
+        user_id,
+        date_limit,
+        activity_type,
+        cursor=cursor,
+        limit=limit + 1 if limit else None,
+        raw_days=current_app.config.get('STOCK_RAW_RETENTION_DAYS', 7),
+        hourly_days=current_app.config.get('STOCK_HOURLY_RETENTION_DAYS', 90)
+    )
     
-    # Buscar vendas se o tipo for 'all' ou 'sale'
-    if activity_type in ['all', 'sale']:
-        sales = db.session.query(
-            Sale.id,
-            Sale.ml_order_id,
-            Sale.quantity_sold,
-            Sale.sale_timestamp,
-            Product.id.label('product_id'),
-            Product.title.label('product_title')
-        ).join(
-            Product, Product.id == Sale.product_id
-        ).filter(
-            Product.user_id == user_id,
-            Sale.sale_timestamp >= date_limit
-        ).all()
-        
-        for sale in sales:
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].kind, rows[-1].id)
+    
+    activities = []
+    for row in rows:
+        if row.kind == 'sale':
             activities.append({
-                'id': f"sale_{sale.id}",
+                'id': f"sale_{row.id}",
                 'type': 'sale',
                 'description': f"Venda realizada pelo Mercado Livre",
-                'timestamp': sale.sale_timestamp.isoformat(),
-                'product_id': sale.product_id,
-                'product_title': sale.product_title,
-                'quantity': sale.quantity_sold,
-                'reference_id': sale.ml_order_id
+                'timestamp': row.timestamp.isoformat(),
+                'product_id': row.product_id,
+                'product_title': row.product_title,
+                'quantity': row.quantity,
+                'reference_id': row.reference
             })
-    
-    # Buscar ajustes de estoque se o tipo for 'all' ou 'adjustment'
-    if activity_type in ['all', 'adjustment']:
-        adjustments = db.session.query(
-            StockAdjustment.id,
-            StockAdjustment.adjustment_type,
-            StockAdjustment.quantity,
-            StockAdjustment.reason,
-            StockAdjustment.adjustment_timestamp,
-            Product.id.label('product_id'),
-            Product.title.label('product_title')
-        ).join(
-            Product, Product.id == StockAdjustment.product_id
-        ).filter(
-            Product.user_id == user_id,
-            StockAdjustment.adjustment_timestamp >= date_limit
-        ).all()
-        
-        for adjustment in adjustments:
+        elif row.kind == 'adjustment':
             activities.append({
-                'id': f"adjustment_{adjustment.id}",
+                'id': f"adjustment_{row.id}",
                 'type': 'adjustment',
-                'description': f"Ajuste manual de estoque: {adjustment.adjustment_type}",
-                'timestamp': adjustment.adjustment_timestamp.isoformat(),
-                'product_id': adjustment.product_id,
-                'product_title': adjustment.product_title,
-                'quantity': adjustment.quantity,
-                'reason': adjustment.reason
+                'description': f"Ajuste manual de estoque: {row.adjustment_type}",
+                'timestamp': row.timestamp.isoformat(),
+                'product_id': row.product_id,
+                'product_title': row.product_title,
+                'quantity': row.quantity,
+                'reason': row.reason
             })
-    
-    # Buscar atualizações de estoque se o tipo for 'all' ou 'stock_change'
-    if activity_type in ['all', 'stock_change']:
-        stock_changes = db.session.query(
-            StockLevel.id,
-            StockLevel.timestamp,
-            StockLevel.available_quantity,
-            StockLevel.total_quantity,
-            Product.id.label('product_id'),
-            Product.title.label('product_title')
-        ).join(
-            Product, Product.id == StockLevel.product_id
-        ).filter(
-            Product.user_id == user_id,
-            StockLevel.timestamp >= date_limit
-        ).all()
-        
-        for change in stock_changes:
+        else:
+            # Atualização de estoque: registro bruto ou consolidado por hora/dia
             activities.append({
-                'id': f"stock_{change.id}",
+                'id': f"stock_{row.id}" if row.kind == 'raw' else f"stock_{row.kind}_{row.id}",
                 'type': 'stock_change',
                 'description': f"Atualização de estoque no Fulfillment",
-                'timestamp': change.timestamp.isoformat(),
-                'product_id': change.product_id,
-                'product_title': change.product_title,
-                'available': change.available_quantity,
-                'total': change.total_quantity
+                'timestamp': row.timestamp.isoformat(),
+                'product_id': row.product_id,
+                'product_title': row.product_title,
+                'available': row.available_quantity,
+                'total': row.total_quantity
             })
     
-    # Ordenar atividades por data (mais recente primeiro)
-    activities.sort(key=lambda x: x['timestamp'], reverse=True)
-    
     # Se não houver dados reais, gerar dados de exemplo para visualização
-    if not activities:
+    if not activities and not cursor:
         # Gerar dados de exemplo para demonstração
         import random
         
@@ -835,8 +1265,47 @@ def get_activities():
         
         # Ordenar atividades por data (mais recente primeiro)
         activities.sort(key=lambda x: x['timestamp'], reverse=True)
+        activities = activities[:limit]
+    
+    return paginated_response(activities, next_cursor)
+
+@api_bp.route('/export/<dataset>')
+def export_dataset(dataset):
+    """Exporta vendas, histórico de estoque ou ajustes em CSV/NDJSON, em streaming."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Usuário não autenticado"}), 401
+    
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({"error": f"Exportação inválida. Opções: {', '.join(EXPORT_DATASETS)}"}), 404
+    
+    export_format = request.args.get('format', default='csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Formato inválido. Formatos válidos: {', '.join(EXPORT_FORMATS)}"}), 400
     
-    return jsonify(activities)
+    # Parâmetros de filtro
+    days = request.args.get('days', default=365, type=int)
+    date_limit = datetime.utcnow() - timedelta(days=days)
+    
+    # Compactar em gzip quando o cliente aceitar
+    compress = request.accept_encodings['gzip'] > 0
+    
+    chunks = iter_export(
+        dataset,
+        user_id,
+        date_limit,
+        export_format,
+        compress=compress,
+        raw_days=current_app.config.get('STOCK_RAW_RETENTION_DAYS', 7),
+        hourly_days=current_app.config.get('STOCK_HOURLY_RETENTION_DAYS', 90)
+    )
+    response = Response(stream_with_context(chunks), content_type=EXPORT_FORMATS[export_format])
+    filename = f"{dataset}_{datetime.utcnow().strftime('%Y%m%d')}.{export_format}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
 
 @api_bp.route('/stock/adjust', methods=['POST'])
 def adjust_stock():
@@ -878,8 +1347,8 @@ def adjust_stock():
         quantity = abs(quantity)
     
     try:
-        # Obter o último nível de estoque
-        last_stock = StockLevel.query.filter_by(product_id=product.id).order_by(StockLevel.timestamp.desc()).first()
+        # Obter o estoque atual
+        last_stock = ProductStock.query.get(product.id)
         
         if not last_stock:
             # Se não houver registro de estoque, criar um com valores zerados
@@ -890,8 +1359,7 @@ def adjust_stock():
                 not_available_quantity=0,
                 timestamp=datetime.utcnow() - timedelta(seconds=1)  # 1 segundo atrás
             )
-            db.session.add(last_stock)
-            db.session.flush()
+            record_stock_levels([last_stock])
         
         # Calcular novo estoque
         new_available = max(0, last_stock.available_quantity + quantity)
@@ -904,7 +1372,7 @@ def adjust_stock():
             available_quantity=new_available,
             not_available_quantity=new_total - new_available
         )
-        db.session.add(new_stock)
+        record_stock_levels([new_stock], user_id=user_id)
         
         # Registrar o ajuste
         adjustment = StockAdjustment(
@@ -916,6 +1384,7 @@ def adjust_stock():
         )
         db.session.add(adjustment)
         
+        bump_data_version(user_id)
         db.session.commit()
         
         return jsonify({
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Consolidação diária das vendas por produto (tabela daily_sales)."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+
+from .models import db, DailySales, Product, Sale
+
+# Linhas por INSERT em lote na reconstrução da consolidação
+DAILY_SALES_INSERT_CHUNK = 1000
+
+def _as_date(value):
+    """Normaliza o resultado de func.date() (texto no SQLite, date nos demais bancos)."""
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], '%Y-%m-%d').date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+def refresh_daily_sales(user_id, keys):
+    """Recalcula a consolidação diária para os pares (product_id, dia) informados.
+
+    Chamada pela importação de pedidos com os dias afetados pelas vendas inseridas,
+    alteradas ou removidas; apenas esses dias são relidos da tabela de vendas.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+
+    product_ids = {product_id for product_id, _ in keys}
+    first_day = min(day for _, day in keys)
+    last_day = max(day for _, day in keys)
+    range_start = datetime.combine(first_day, datetime.min.time())
+    range_end = datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+
+    # Totais atuais das vendas nos dias afetados
+    totals = {}
+    rows = db.session.query(
+        Sale.product_id,
+        func.date(Sale.sale_timestamp),
+        func.sum(Sale.quantity_sold)
+    ).filter(
+        Sale.product_id.in_(product_ids),
+        Sale.sale_timestamp >= range_start,
+        Sale.sale_timestamp < range_end
+    ).group_by(
+        Sale.product_id,
+        func.date(Sale.sale_timestamp)
+    ).all()
+    for product_id, day, quantity in rows:
+        totals[(product_id, _as_date(day))] = quantity
+
+    existing = {
+        (rollup.product_id, rollup.day): rollup
+        for rollup in DailySales.query.filter(
+            DailySales.product_id.in_(product_ids),
+            DailySales.day >= first_day,
+            DailySales.day <= last_day
+        ).all()
+    }
+
+    for key in keys:
+        quantity = totals.get(key, 0)
+        rollup = existing.get(key)
+        if quantity:
+            if rollup is None:
+                rollup = DailySales(user_id=user_id, product_id=key[0], day=key[1])
+                db.session.add(rollup)
+            rollup.quantity_sold = quantity
+        elif rollup is not None:
+            db.session.delete(rollup)
+
+def backfill_daily_sales():
+    """Reconstrói toda a consolidação diária a partir da tabela de vendas.
+
+    Retorna a quantidade de linhas (produto, dia) geradas.
+    """
+    rows = db.session.query(
+        Product.user_id,
+        Sale.product_id,
+        func.date(Sale.sale_timestamp),
+        func.sum(Sale.quantity_sold)
+    ).join(
+        Product, Product.id == Sale.product_id
+    ).group_by(
+        Product.user_id,
+        Sale.product_id,
+        func.date(Sale.sale_timestamp)
+    ).all()
+
+    db.session.query(DailySales).delete()
+    mappings = [
+        {"user_id": user_id, "product_id": product_id, "day": _as_date(day), "quantity_sold": quantity}
+        for user_id, product_id, day, quantity in rows
+    ]
+    for start in range(0, len(mappings), DAILY_SALES_INSERT_CHUNK):
+        db.session.execute(insert(DailySales), mappings[start:start + DAILY_SALES_INSERT_CHUNK])
+    db.session.commit()
+
+    return len(mappings)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Leitura agendada do estoque no Full, com frequência adaptada à atividade de cada produto.
+
+Cada produto com inventory_id tem um próximo horário de leitura (product_poll_schedules).
+A cada ciclo (`flask run-scheduler`) apenas os produtos vencidos são lidos na API; em
+seguida o intervalo de cada um é recalculado a partir das vendas e das mudanças de
+estoque recentes: produtos que giram muito voltam a ser lidos em poucos minutos e
+anúncios parados, algumas vezes por dia.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, insert, literal, select, update
+
+from .models import db, ApiCredentials, DailySales, Product, ProductPollSchedule, StockLevel
+from .sync import get_user_ml_api, sync_user_resources
+
+# Quantidade de produtos por consulta IN ao recalcular os intervalos
+SCHEDULE_CHUNK = 500
+
+SECONDS_PER_DAY = 86400
+
+def poll_interval(units_sold, stock_changes, window_days, min_seconds, max_seconds):
+    """Intervalo até a próxima leitura, em segundos, a partir da atividade na janela.
+
+    A meta é cerca de uma mudança esperada por leitura: o intervalo é um dia dividido
+    pelos eventos diários (unidades vendidas mais mudanças de estoque registradas),
+    limitado a [min_seconds, max_seconds].
+    """
+    events_per_day = (units_sold + stock_changes) / window_days
+    if events_per_day <= 0:
+        return max_seconds
+    return int(min(max_seconds, max(min_seconds, SECONDS_PER_DAY / events_per_day)))
+
+def _schedule_new_products(now, min_seconds):
+    """Agenda para leitura imediata os produtos com inventory_id que ainda não têm agenda."""
+    missing = select(
+        Product.id, literal(now), literal(min_seconds)
+    ).outerjoin(
+        ProductPollSchedule, ProductPollSchedule.product_id == Product.id
+    ).where(
+        Product.ml_inventory_id.isnot(None),
+        ProductPollSchedule.product_id.is_(None)
+    )
+    db.session.execute(
+        insert(ProductPollSchedule).from_select(['product_id', 'next_poll_at', 'interval_seconds'], missing)
+    )
+
+def _activity(product_ids, now, window_days):
+    """Retorna ({product_id: unidades vendidas}, {product_id: mudanças de estoque}) na janela."""
+    sold = {}
+    changes = {}
+    since = now - timedelta(days=window_days)
+    for start in range(0, len(product_ids), SCHEDULE_CHUNK):
+        chunk = product_ids[start:start + SCHEDULE_CHUNK]
+        sold.update(db.session.query(DailySales.product_id, func.sum(DailySales.quantity_sold)).filter(
+            DailySales.product_id.in_(chunk),
+            DailySales.day >= since.date()
+        ).group_by(DailySales.product_id))
+        # O histórico bruto guarda apenas as leituras em que o estoque mudou
+        changes.update(db.session.query(StockLevel.product_id, func.count(StockLevel.id)).filter(
+            StockLevel.product_id.in_(chunk),
+            StockLevel.timestamp >= since
+        ).group_by(StockLevel.product_id))
+    return sold, changes
+
+def _reschedule(rows, now):
+    """Grava o próximo horário de leitura: `rows` é uma lista de (product_id, intervalo em segundos)."""
+    if not rows:
+        return
+    schedules = ProductPollSchedule.__table__
+    db.session.execute(
+        update(schedules).where(
+            schedules.c.product_id == bindparam('target_product_id')
+        ).values(
+            next_poll_at=bindparam('next_poll_at'),
+            interval_seconds=bindparam('interval'),
+            last_polled_at=now
+        ),
+        [
+            {"target_product_id": product_id, "next_poll_at": now + timedelta(seconds=interval), "interval": interval}
+            for product_id, interval in rows
+        ]
+    )
+
+def run_scheduler_tick(batch_size=500, min_seconds=300, max_seconds=21600, window_days=7, now=None):
+    """Lê na API o estoque dos produtos vencidos e reagenda cada um conforme a atividade.
+
+    No máximo `batch_size` produtos são lidos por ciclo (os mais atrasados primeiro).
+    Produtos com falha na leitura voltam a ser tentados após `min_seconds`. Retorna um
+    dicionário com a contagem de produtos lidos, com falha e de usuários atendidos.
+    """
+    now = now or datetime.utcnow()
+    _schedule_new_products(now, min_seconds)
+    db.session.commit()
+
+    due = db.session.query(Product.id, Product.user_id, Product.ml_inventory_id).join(
+        ProductPollSchedule, ProductPollSchedule.product_id == Product.id
+    ).filter(
+        ProductPollSchedule.next_poll_at <= now,
+        Product.ml_inventory_id.isnot(None)
+    ).order_by(ProductPollSchedule.next_poll_at).limit(batch_size).all()
+
+    counts = {"polled": 0, "failed": 0, "users": 0}
+    by_user = {}
+    for product_id, user_id, inventory_id in due:
+        by_user.setdefault(user_id, []).append((product_id, inventory_id))
+
+    credentials_by_user = {
+        credentials.user_id: credentials
+        for credentials in ApiCredentials.query.filter(ApiCredentials.user_id.in_(list(by_user))).all()
+    }
+
+    for user_id, products in by_user.items():
+        credentials = credentials_by_user.get(user_id)
+        if credentials is None:
+            # Usuário sem credenciais: voltar a verificar apenas no intervalo máximo
+            _reschedule([(product_id, max_seconds) for product_id, _ in products], now)
+            db.session.commit()
+            continue
+
+        try:
+            ml_api = get_user_ml_api(credentials)
+            result = sync_user_resources(user_id, ml_api, inventory_ids=[inventory_id for _, inventory_id in products])
+            failed_inventories = result["failed"]["stock"]
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao ler o estoque agendado do usuário {user_id}: {e}")
+            failed_inventories = {inventory_id for _, inventory_id in products}
+
+        polled_ids = [product_id for product_id, inventory_id in products if inventory_id not in failed_inventories]
+        sold, changes = _activity(polled_ids, now, window_days)
+        _reschedule(
+            [
+                (product_id, poll_interval(sold.get(product_id, 0), changes.get(product_id, 0), window_days, min_seconds, max_seconds))
+                for product_id in polled_ids
+            ] + [
+                (product_id, min_seconds) for product_id, inventory_id in products if inventory_id in failed_inventories
+            ],
+            now
+        )
+        db.session.commit()
+
+        counts["users"] += 1
+        counts["polled"] += len(polled_ids)
+        counts["failed"] += len(products) - len(polled_ids)
+
+    return counts
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Envios ao Full e manutenção da quantidade em trânsito de cada produto (tabela product_in_transit)."""
+
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, insert, update
+
+from .models import db, Product, ProductInTransit, Shipment, ShipmentItem
+
+SHIPMENT_STATUSES = ('draft', 'pending', 'in_transit', 'delivered', 'cancelled')
+
+# Envios cujas quantidades contam como estoque a caminho do Full
+INBOUND_STATUSES = ('pending', 'in_transit')
+
+# Mudanças de status permitidas; envios entregues ou cancelados não mudam mais
+SHIPMENT_TRANSITIONS = {
+    'draft': ('pending', 'cancelled'),
+    'pending': ('draft', 'in_transit', 'cancelled'),
+    'in_transit': ('delivered', 'cancelled'),
+    'delivered': (),
+    'cancelled': ()
+}
+
+# Envios cujos itens ainda podem ser alterados
+EDITABLE_STATUSES = ('draft', 'pending')
+
+# Quantidade de produtos por consulta IN ao atualizar a quantidade em trânsito
+IN_TRANSIT_CHUNK = 500
+
+def parse_shipment_items(user_id, items):
+    """Valida os itens enviados pelo cliente e retorna {product_id: quantidade}.
+
+    Itens repetidos do mesmo produto são somados. Lança ValueError se algum item
+    for inválido ou se o produto não pertencer ao usuário.
+    """
+    if not isinstance(items, list):
+        raise ValueError("Itens inválidos: informe uma lista de produtos e quantidades")
+
+    quantities = {}
+    for item in items:
+        product_id = item.get('product_id') if isinstance(item, dict) else None
+        quantity = item.get('quantity') if isinstance(item, dict) else None
+        if not isinstance(product_id, int) or not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError("Item inválido: product_id e quantity (inteiro positivo) são obrigatórios")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+    product_ids = list(quantities)
+    found = set()
+    for start in range(0, len(product_ids), IN_TRANSIT_CHUNK):
+        found.update(product_id for (product_id,) in db.session.query(Product.id).filter(
+            Product.user_id == user_id,
+            Product.id.in_(product_ids[start:start + IN_TRANSIT_CHUNK])
+        ))
+    missing = [product_id for product_id in product_ids if product_id not in found]
+    if missing:
+        raise ValueError(f"Produto não encontrado ou não pertence ao usuário: {missing[0]}")
+
+    return quantities
+
+def shipment_quantities(shipment_id):
+    """Retorna {product_id: quantidade} dos itens gravados do envio."""
+    return dict(db.session.query(ShipmentItem.product_id, ShipmentItem.quantity).filter(
+        ShipmentItem.shipment_id == shipment_id
+    ))
+
+def replace_shipment_items(shipment, quantities):
+    """Substitui os itens do envio, gravando os novos em um único INSERT em lote."""
+    ShipmentItem.query.filter(ShipmentItem.shipment_id == shipment.id).delete(synchronize_session=False)
+    if quantities:
+        db.session.execute(insert(ShipmentItem), [
+            {"shipment_id": shipment.id, "product_id": product_id, "quantity": quantity}
+            for product_id, quantity in quantities.items()
+        ])
+
+def apply_in_transit_change(before_status, before_quantities, after_status, after_quantities):
+    """Atualiza a quantidade em trânsito dos produtos após a mudança de um envio.
+
+    Recebe o status e os itens do envio antes e depois da alteração; apenas os
+    produtos cuja quantidade a caminho mudou são gravados, na transação atual.
+    """
+    deltas = {}
+    if before_status in INBOUND_STATUSES:
+        for product_id, quantity in before_quantities.items():
+            deltas[product_id] = deltas.get(product_id, 0) - quantity
+    if after_status in INBOUND_STATUSES:
+        for product_id, quantity in after_quantities.items():
+            deltas[product_id] = deltas.get(product_id, 0) + quantity
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    # Incrementos atômicos no banco: envios alterados ao mesmo tempo não perdem atualizações
+    product_ids = list(deltas)
+    now = datetime.utcnow()
+    for start in range(0, len(product_ids), IN_TRANSIT_CHUNK):
+        chunk = product_ids[start:start + IN_TRANSIT_CHUNK]
+        existing = {
+            product_id for (product_id,) in db.session.query(ProductInTransit.product_id).filter(
+                ProductInTransit.product_id.in_(chunk)
+            )
+        }
+        if existing:
+            in_transit = ProductInTransit.__table__
+            db.session.execute(
+                update(in_transit).where(
+                    in_transit.c.product_id == bindparam('target_product_id')
+                ).values(
+                    quantity=in_transit.c.quantity + bindparam('delta'),
+                    updated_at=now
+                ),
+                [{"target_product_id": product_id, "delta": deltas[product_id]} for product_id in existing]
+            )
+        new_rows = [
+            {"product_id": product_id, "quantity": deltas[product_id], "updated_at": now}
+            for product_id in chunk
+            if product_id not in existing and deltas[product_id] > 0
+        ]
+        if new_rows:
+            db.session.execute(insert(ProductInTransit), new_rows)
+        ProductInTransit.query.filter(
+            ProductInTransit.product_id.in_(chunk),
+            ProductInTransit.quantity <= 0
+        ).delete(synchronize_session=False)
+
+def serialize_shipment(shipment, items_count=None, total_items=None):
+    """Converte um envio em dicionário para a resposta da API."""
+    data = {
+        "id": shipment.id,
+        "status": shipment.status,
+        "created_at": shipment.created_at.isoformat(),
+        "updated_at": shipment.updated_at.isoformat(),
+        "estimated_delivery": shipment.estimated_delivery.isoformat() if shipment.estimated_delivery else None,
+        "tracking_number": shipment.tracking_number,
+        "destination_warehouse": shipment.destination_warehouse,
+        "notes": shipment.notes
+    }
+    if items_count is not None:
+        data["items_count"] = items_count
+        data["total_items"] = total_items
+    return data
+
+def parse_estimated_delivery(value):
+    """Converte a data prevista de entrega (ISO 8601) enviada pelo cliente. Lança ValueError se inválida."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        raise ValueError("Data prevista de entrega inválida (use ISO 8601)")
+
+def backfill_in_transit():
+    """Reconstrói a tabela product_in_transit a partir dos envios pendentes e em trânsito.
+
+    Retorna a quantidade de produtos com estoque a caminho.
+    """
+    rows = db.session.query(
+        ShipmentItem.product_id,
+        func.sum(ShipmentItem.quantity)
+    ).join(
+        Shipment, Shipment.id == ShipmentItem.shipment_id
+    ).filter(
+        Shipment.status.in_(INBOUND_STATUSES)
+    ).group_by(ShipmentItem.product_id).all()
+
+    ProductInTransit.query.delete(synchronize_session=False)
+    now = datetime.utcnow()
+    if rows:
+        db.session.execute(insert(ProductInTransit), [
+            {"product_id": product_id, "quantity": quantity, "updated_at": now}
+            for product_id, quantity in rows
+        ])
+    db.session.commit()
+    return len(rows)
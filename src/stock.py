@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+"""Gravação dos níveis de estoque e manutenção do estoque atual de cada produto."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, insert, literal, select, union_all, update
+
+from .alerts import evaluate_stock_alerts
+from .cache import bump_data_version
+from .events import publish_event
+from .models import db, Product, ProductStock, StockLevel, StockLevelRollup
+
+# Quantidade de produtos por consulta IN ao carregar o estoque atual
+PRODUCT_STOCK_CHUNK = 500
+
+# Quantidade de produtos consolidados por transação na compactação do histórico
+COMPACTION_PRODUCT_CHUNK = 200
+
+# Registros lidos por vez ao percorrer o histórico na compactação
+COMPACTION_YIELD_PER = 5000
+
+def _same_stock(current, stock_level):
+    """Indica se o registro de estoque tem os mesmos valores do estoque atual do produto."""
+    return (
+        current.total_quantity == stock_level.total_quantity
+        and current.available_quantity == stock_level.available_quantity
+        and current.not_available_quantity == stock_level.not_available_quantity
+    )
+
+def record_stock_levels(stock_levels, only_changes=False, user_id=None):
+    """Registra novos níveis de estoque e atualiza o estoque atual dos produtos.
+
+    Todo ponto que grava StockLevel deve passar por aqui, para que a tabela
+    product_stocks continue refletindo o último registro de cada produto.
+    Com `only_changes`, registros iguais ao estoque atual do produto não são
+    gravados: apenas o `checked_at` do estoque atual é atualizado. Com `user_id`,
+    os alertas de estoque baixo dos produtos alterados são avaliados e as mudanças
+    do estoque atual são publicadas como eventos para o dashboard.
+    Retorna a lista de registros efetivamente gravados.
+    """
+    if not stock_levels:
+        return []
+
+    now = datetime.utcnow()
+    for stock_level in stock_levels:
+        if stock_level.timestamp is None:
+            stock_level.timestamp = now
+
+    # Estoque atual dos produtos envolvidos, carregado em lotes
+    product_ids = list(dict.fromkeys(stock_level.product_id for stock_level in stock_levels))
+    current_stocks = {}
+    for start in range(0, len(product_ids), PRODUCT_STOCK_CHUNK):
+        chunk = product_ids[start:start + PRODUCT_STOCK_CHUNK]
+        current_stocks.update(
+            (current.product_id, current)
+            for current in ProductStock.query.filter(ProductStock.product_id.in_(chunk)).all()
+        )
+
+    recorded = []
+    # Produtos cujo estoque atual foi alterado nesta gravação
+    changed_ids = {}
+    for stock_level in sorted(stock_levels, key=lambda stock_level: stock_level.timestamp):
+        current = current_stocks.get(stock_level.product_id)
+        if current is None:
+            current = ProductStock(product_id=stock_level.product_id)
+            db.session.add(current)
+            current_stocks[stock_level.product_id] = current
+        elif current.updated_at > stock_level.timestamp:
+            # Já existe um registro mais recente: apenas completar o histórico
+            recorded.append(stock_level)
+            continue
+        elif only_changes and _same_stock(current, stock_level):
+            current.checked_at = max(current.checked_at or stock_level.timestamp, stock_level.timestamp)
+            continue
+
+        changed_ids[stock_level.product_id] = None
+        current.total_quantity = stock_level.total_quantity
+        current.available_quantity = stock_level.available_quantity
+        current.not_available_quantity = stock_level.not_available_quantity
+        current.updated_at = stock_level.timestamp
+        current.checked_at = stock_level.timestamp
+        recorded.append(stock_level)
+
+    db.session.add_all(recorded)
+
+    if user_id is not None and changed_ids:
+        changed_stocks = [current_stocks[product_id] for product_id in changed_ids]
+        evaluate_stock_alerts(user_id, changed_stocks)
+        _publish_stock_change(user_id, changed_stocks)
+
+    return recorded
+
+def _publish_stock_change(user_id, changed_stocks):
+    """Publica a mudança do estoque atual dos produtos."""
+    publish_event(user_id, 'stock_change', {
+        "products": [
+            {
+                "product_id": current.product_id,
+                "total": current.total_quantity,
+                "available": current.available_quantity,
+                "not_available": current.not_available_quantity,
+                "updated_at": current.updated_at.isoformat()
+            }
+            for current in changed_stocks
+        ]
+    })
+
+def _latest_values(model, timestamp_column, product_ids=None):
+    """Último registro de cada produto em `model` (StockLevel ou StockLevelRollup).
+
+    Usa uma função de janela para pegar o último registro de cada produto em uma
+    única consulta. Retorna tuplas (product_id, total, disponível, indisponível,
+    timestamp, id).
+    """
+    row_number = func.row_number().over(
+        partition_by=model.product_id,
+        order_by=(timestamp_column.desc(), model.id.desc())
+    ).label('row_number')
+
+    query = db.session.query(
+        model.product_id,
+        model.total_quantity,
+        model.available_quantity,
+        model.not_available_quantity,
+        timestamp_column.label('timestamp'),
+        model.id,
+        row_number
+    )
+    if product_ids is not None:
+        query = query.filter(model.product_id.in_(product_ids))
+    ranked = query.subquery()
+
+    return db.session.query(
+        ranked.c.product_id,
+        ranked.c.total_quantity,
+        ranked.c.available_quantity,
+        ranked.c.not_available_quantity,
+        ranked.c.timestamp,
+        ranked.c.id
+    ).filter(ranked.c.row_number == 1).all()
+
+def backfill_product_stock():
+    """Reconstrói a tabela product_stocks a partir do histórico de estoque.
+
+    O estoque atual de cada produto é o seu último StockLevel ou, se o histórico
+    bruto já foi compactado, o intervalo consolidado mais recente. Produtos já
+    presentes na tabela são atualizados (mantendo o `checked_at` da última leitura
+    na API), a menos que o estoque atual seja mais recente que o histórico; os
+    demais são inseridos. Retorna a quantidade de produtos com estoque atual.
+    """
+    latest = {}
+    history = (
+        _latest_values(StockLevelRollup, StockLevelRollup.last_timestamp)
+        + _latest_values(StockLevel, StockLevel.timestamp)
+    )
+    for product_id, total, available, not_available, timestamp, _ in history:
+        if product_id not in latest or timestamp >= latest[product_id]["updated_at"]:
+            latest[product_id] = {
+                "product_id": product_id,
+                "total_quantity": total,
+                "available_quantity": available,
+                "not_available_quantity": not_available,
+                "updated_at": timestamp,
+                "checked_at": timestamp
+            }
+
+    product_ids = list(latest)
+    existing = {}
+    for start in range(0, len(product_ids), PRODUCT_STOCK_CHUNK):
+        existing.update(
+            (product_id, (updated_at, checked_at))
+            for product_id, updated_at, checked_at in db.session.query(
+                ProductStock.product_id, ProductStock.updated_at, ProductStock.checked_at
+            ).filter(ProductStock.product_id.in_(product_ids[start:start + PRODUCT_STOCK_CHUNK]))
+        )
+
+    new_rows = []
+    changed_rows = []
+    for product_id, row in latest.items():
+        if product_id not in existing:
+            new_rows.append(row)
+            continue
+        updated_at, checked_at = existing[product_id]
+        if updated_at > row["updated_at"]:
+            continue
+        changed_rows.append(dict(
+            row,
+            target_product_id=product_id,
+            checked_at=max(checked_at or row["checked_at"], row["checked_at"])
+        ))
+
+    product_stocks = ProductStock.__table__
+    update_stock = update(product_stocks).where(
+        product_stocks.c.product_id == bindparam('target_product_id')
+    ).values(
+        total_quantity=bindparam('total_quantity'),
+        available_quantity=bindparam('available_quantity'),
+        not_available_quantity=bindparam('not_available_quantity'),
+        updated_at=bindparam('updated_at'),
+        checked_at=bindparam('checked_at')
+    )
+    for start in range(0, len(changed_rows), PRODUCT_STOCK_CHUNK):
+        db.session.execute(update_stock, [
+            {key: value for key, value in row.items() if key != 'product_id'}
+            for row in changed_rows[start:start + PRODUCT_STOCK_CHUNK]
+        ])
+    for start in range(0, len(new_rows), PRODUCT_STOCK_CHUNK):
+        db.session.execute(insert(ProductStock), new_rows[start:start + PRODUCT_STOCK_CHUNK])
+    db.session.commit()
+
+    return len(latest)
+
+def _truncate_hour(timestamp):
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def _truncate_day(timestamp):
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _merge_rollups(resolution, product_ids, samples, truncate):
+    """Consolida amostras de estoque em intervalos (hora ou dia) de StockLevelRollup.
+
+    Cada amostra é uma tupla (product_id, timestamp, total, disponível, indisponível,
+    mínimo, máximo, registros). Intervalos já existentes são mesclados com as novas
+    amostras; os valores do intervalo são os do seu último registro.
+    """
+    buckets = {}
+    for product_id, timestamp, total, available, not_available, minimum, maximum, count in samples:
+        key = (product_id, truncate(timestamp))
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = {
+                "product_id": product_id,
+                "resolution": resolution,
+                "bucket_start": key[1],
+                "last_timestamp": timestamp,
+                "total_quantity": total,
+                "available_quantity": available,
+                "not_available_quantity": not_available,
+                "min_available_quantity": minimum,
+                "max_available_quantity": maximum,
+                "samples": count
+            }
+            continue
+
+        bucket["min_available_quantity"] = min(bucket["min_available_quantity"], minimum)
+        bucket["max_available_quantity"] = max(bucket["max_available_quantity"], maximum)
+        bucket["samples"] += count
+        if timestamp >= bucket["last_timestamp"]:
+            bucket["last_timestamp"] = timestamp
+            bucket["total_quantity"] = total
+            bucket["available_quantity"] = available
+            bucket["not_available_quantity"] = not_available
+
+    if not buckets:
+        return 0
+
+    # Intervalos que já existem (ex.: registros atrasados de uma hora já compactada)
+    existing_rollups = StockLevelRollup.query.filter(
+        StockLevelRollup.resolution == resolution,
+        StockLevelRollup.product_id.in_(product_ids),
+        StockLevelRollup.bucket_start >= min(key[1] for key in buckets),
+        StockLevelRollup.bucket_start <= max(key[1] for key in buckets)
+    ).all()
+    for rollup in existing_rollups:
+        bucket = buckets.pop((rollup.product_id, rollup.bucket_start), None)
+        if bucket is None:
+            continue
+        rollup.min_available_quantity = min(rollup.min_available_quantity, bucket["min_available_quantity"])
+        rollup.max_available_quantity = max(rollup.max_available_quantity, bucket["max_available_quantity"])
+        rollup.samples += bucket["samples"]
+        if bucket["last_timestamp"] >= rollup.last_timestamp:
+            rollup.last_timestamp = bucket["last_timestamp"]
+            rollup.total_quantity = bucket["total_quantity"]
+            rollup.available_quantity = bucket["available_quantity"]
+            rollup.not_available_quantity = bucket["not_available_quantity"]
+
+    rows = list(buckets.values())
+    for start in range(0, len(rows), PRODUCT_STOCK_CHUNK):
+        db.session.execute(insert(StockLevelRollup), rows[start:start + PRODUCT_STOCK_CHUNK])
+
+    return len(rows) + len(existing_rollups)
+
+def _compact_raw_levels(cutoff):
+    """Consolida por hora os registros de StockLevel anteriores a `cutoff` e os remove.
+
+    O último registro de cada produto é sempre mantido no histórico bruto, mesmo
+    fora da retenção: é a fonte do estoque atual em `backfill_product_stock`.
+    Retorna (registros compactados, produtos afetados).
+    """
+    # Produtos com algum registro antigo que não é o seu último
+    product_ids = [
+        product_id for (product_id,) in
+        db.session.query(StockLevel.product_id).group_by(StockLevel.product_id).having(
+            func.min(StockLevel.timestamp) < cutoff,
+            func.count(StockLevel.id) > 1
+        )
+    ]
+
+    compacted = 0
+    for start in range(0, len(product_ids), COMPACTION_PRODUCT_CHUNK):
+        chunk = product_ids[start:start + COMPACTION_PRODUCT_CHUNK]
+        latest_ids = [row.id for row in _latest_values(StockLevel, StockLevel.timestamp, chunk)]
+        expired = (
+            StockLevel.product_id.in_(chunk),
+            StockLevel.timestamp < cutoff,
+            StockLevel.id.notin_(latest_ids)
+        )
+        rows = db.session.query(
+            StockLevel.product_id,
+            StockLevel.timestamp,
+            StockLevel.total_quantity,
+            StockLevel.available_quantity,
+            StockLevel.not_available_quantity
+        ).filter(*expired).yield_per(COMPACTION_YIELD_PER)
+
+        samples = (
+            (product_id, timestamp, total, available, not_available, available, available, 1)
+            for product_id, timestamp, total, available, not_available in rows
+        )
+        _merge_rollups('hour', chunk, samples, _truncate_hour)
+
+        compacted += StockLevel.query.filter(*expired).delete(synchronize_session=False)
+        db.session.commit()
+
+    return compacted, set(product_ids)
+
+def _compact_hourly_rollups(cutoff):
+    """Consolida por dia os intervalos horários anteriores a `cutoff` e os remove.
+
+    Retorna (horas compactadas, produtos afetados).
+    """
+    hourly = StockLevelRollup.query.filter(
+        StockLevelRollup.resolution == 'hour',
+        StockLevelRollup.bucket_start < cutoff
+    )
+    product_ids = [
+        product_id for (product_id,) in
+        hourly.with_entities(StockLevelRollup.product_id).distinct()
+    ]
+
+    compacted = 0
+    for start in range(0, len(product_ids), COMPACTION_PRODUCT_CHUNK):
+        chunk = product_ids[start:start + COMPACTION_PRODUCT_CHUNK]
+        chunk_hourly = hourly.filter(StockLevelRollup.product_id.in_(chunk))
+        rows = chunk_hourly.with_entities(
+            StockLevelRollup.product_id,
+            StockLevelRollup.last_timestamp,
+            StockLevelRollup.total_quantity,
+            StockLevelRollup.available_quantity,
+            StockLevelRollup.not_available_quantity,
+            StockLevelRollup.min_available_quantity,
+            StockLevelRollup.max_available_quantity,
+            StockLevelRollup.samples
+        ).all()
+        _merge_rollups('day', chunk, rows, _truncate_day)
+
+        compacted += chunk_hourly.delete(synchronize_session=False)
+        db.session.commit()
+
+    return compacted, set(product_ids)
+
+def compact_stock_history(raw_days=7, hourly_days=90, now=None):
+    """Aplica a retenção do histórico de estoque.
+
+    Registros brutos com mais de `raw_days` dias viram um registro por hora
+    (último valor, mínimo e máximo disponível) e intervalos horários com mais
+    de `hourly_days` dias viram um registro por dia. Apenas horas/dias completos
+    são consolidados. Retorna (registros brutos compactados, horas compactadas).
+    """
+    now = now or datetime.utcnow()
+    raw_cutoff = _truncate_hour(now - timedelta(days=raw_days))
+    hourly_cutoff = _truncate_day(now - timedelta(days=hourly_days))
+
+    raw_count, raw_products = _compact_raw_levels(raw_cutoff)
+    hourly_count, hourly_products = _compact_hourly_rollups(hourly_cutoff)
+
+    # O histórico exibido mudou de resolução: invalidar os caches dos vendedores afetados
+    product_ids = list(raw_products | hourly_products)
+    user_ids = set()
+    for start in range(0, len(product_ids), PRODUCT_STOCK_CHUNK):
+        user_ids.update(
+            user_id for (user_id,) in
+            db.session.query(Product.user_id).filter(
+                Product.id.in_(product_ids[start:start + PRODUCT_STOCK_CHUNK])
+            ).distinct()
+        )
+    for user_id in user_ids:
+        bump_data_version(user_id)
+    db.session.commit()
+
+    return raw_count, hourly_count
+
+def stock_history_selects(since, raw_days=7, hourly_days=90, user_id=None, product_ids=None):
+    """Monta as consultas do histórico de estoque a partir de `since`, uma por camada de retenção.
+
+    Cada registro aparece em uma única camada (o bruto é removido ao ser
+    consolidado), então as consultas podem ser combinadas com UNION ALL. As
+    camadas consolidadas só entram quando o período alcança a sua faixa de
+    retenção. Retorna pares (camada, consulta), com a camada 'raw', 'hour' ou
+    'day'; as colunas são tier, id, product_id, timestamp, total_quantity e
+    available_quantity.
+    """
+    now = datetime.utcnow()
+
+    def restrict(query, product_column):
+        if user_id is not None:
+            query = query.join(Product, Product.id == product_column).where(Product.user_id == user_id)
+        if product_ids is not None:
+            query = query.where(product_column.in_(product_ids))
+        return query
+
+    branches = [('raw', restrict(
+        select(
+            literal('raw').label('tier'),
+            StockLevel.id,
+            StockLevel.product_id,
+            StockLevel.timestamp,
+            StockLevel.total_quantity,
+            StockLevel.available_quantity
+        ).where(StockLevel.timestamp >= since),
+        StockLevel.product_id
+    ))]
+
+    tiers = []
+    if since < now - timedelta(days=raw_days):
+        tiers.append(('hour', _truncate_hour(since)))
+    if since < now - timedelta(days=hourly_days):
+        tiers.append(('day', _truncate_day(since)))
+
+    for resolution, bucket_since in tiers:
+        branches.append((resolution, restrict(
+            select(
+                literal(resolution).label('tier'),
+                StockLevelRollup.id,
+                StockLevelRollup.product_id,
+                StockLevelRollup.last_timestamp.label('timestamp'),
+                StockLevelRollup.total_quantity,
+                StockLevelRollup.available_quantity
+            ).where(
+                StockLevelRollup.resolution == resolution,
+                StockLevelRollup.bucket_start >= bucket_since,
+                StockLevelRollup.last_timestamp >= since
+            ),
+            StockLevelRollup.product_id
+        )))
+
+    return branches
+
+def stock_history(since, raw_days=7, hourly_days=90, user_id=None, product_ids=None):
+    """Histórico de estoque a partir de `since` em todas as camadas, como uma subconsulta UNION ALL.
+
+    Ver `stock_history_selects` para as colunas.
+    """
+    branches = [branch for _, branch in stock_history_selects(since, raw_days, hourly_days, user_id, product_ids)]
+    if len(branches) == 1:
+        return branches[0].subquery()
+    return union_all(*branches).subquery()
@@ -0,0 +1,594 @@
+# -*- coding: utf-8 -*-
+"""Rotinas de sincronização de produtos, estoque e pedidos com o Mercado Livre."""
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from .cache import bump_data_version
+from .models import db, ApiCredentials, Product, StockLevel, Sale, SkippedOrder, SyncCursor
+from .ml_api import MercadoLivreAPI, iter_chunks, get_shared_session, parse_ml_datetime
+from .rate_limit import get_rate_limiter
+from .response_cache import get_response_cache
+from .sales import refresh_daily_sales
+from .stock import record_stock_levels
+from .token_manager import TokenManager
+
+# Instância da API do Mercado Livre
+def get_ml_api():
+    """Retorna uma instância configurada da API do Mercado Livre.
+
+    A instância é leve; o pool de conexões HTTP é compartilhado por todo o processo.
+    """
+    config = current_app.config
+    return MercadoLivreAPI(
+        app_id=config.get('ML_APP_ID'),
+        client_secret=config.get('ML_SECRET_KEY'),
+        redirect_uri=config.get('ML_REDIRECT_URI'),
+        session=get_shared_session(
+            pool_size=config.get('ML_HTTP_POOL_SIZE', 20),
+            max_retries=config.get('ML_HTTP_MAX_RETRIES', 3),
+            backoff_factor=config.get('ML_HTTP_BACKOFF_FACTOR', 0.5)
+        ),
+        timeout=(
+            config.get('ML_HTTP_CONNECT_TIMEOUT', 5),
+            config.get('ML_HTTP_READ_TIMEOUT', 30)
+        ),
+        rate_limiter=get_rate_limiter(
+            rate=config.get('ML_RATE_LIMIT_PER_SECOND', 15),
+            capacity=config.get('ML_RATE_LIMIT_BURST', 30),
+            path=config.get('ML_RATE_LIMIT_STORE') or None
+        ),
+        response_cache=get_response_cache(
+            max_bytes=config.get('ML_CACHE_MAX_MB', 32) * 1024 * 1024,
+            ttls={
+                'user': config.get('ML_CACHE_TTL_USER', 3600),
+                'item': config.get('ML_CACHE_TTL_ITEMS', 300),
+                'order': config.get('ML_CACHE_TTL_ORDERS', 60),
+                'stock': config.get('ML_CACHE_TTL_STOCK', 0)
+            },
+            path=config.get('ML_CACHE_STORE') or None
+        )
+    )
+
+def get_user_ml_api(credentials):
+    """Retorna uma instância da API autenticada com as credenciais do usuário.
+
+    O token é renovado antes de expirar e o novo par de tokens é gravado nas credenciais.
+    As respostas em cache ficam separadas por usuário.
+    """
+    token_manager = TokenManager(
+        current_app._get_current_object(),
+        credentials.user_id,
+        lock_dir=current_app.config.get('ML_TOKEN_LOCK_DIR') or None
+    )
+    ml_api = token_manager.attach(get_ml_api(), credentials)
+    ml_api.cache_namespace = f"user:{credentials.user_id}"
+    return ml_api
+
+def _build_stock_level(product_id, stock_data):
+    """Cria o registro de nível de estoque a partir da resposta do Fulfillment."""
+    return StockLevel(
+        product_id=product_id,
+        total_quantity=stock_data.get("total", 0),
+        available_quantity=stock_data.get("available_quantity", 0),
+        not_available_quantity=stock_data.get("not_available_quantity", 0)
+    )
+
+def _remember_ml_user_id(user_id, ml_user_id):
+    """Guarda nas credenciais o id do usuário no Mercado Livre (usado para rotear as notificações)."""
+    ApiCredentials.query.filter(
+        ApiCredentials.user_id == user_id,
+        db.or_(ApiCredentials.ml_user_id.is_(None), ApiCredentials.ml_user_id != str(ml_user_id))
+    ).update({"ml_user_id": str(ml_user_id)}, synchronize_session=False)
+
+def _read_products_stock(ml_api, products, max_workers, on_progress=None):
+    """Lê o estoque no Fulfillment dos produtos informados, sem gravar nada.
+
+    Os produtos precisam ter inventory_id. Retorna uma tupla (lista de pares
+    (produto, resposta do Fulfillment), produtos com falha).
+    """
+    stocks, errors = ml_api.get_fulfillment_stocks(
+        [product.ml_inventory_id for product in products],
+        max_workers=max_workers,
+        on_progress=on_progress
+    )
+
+    product_stocks = []
+    failed_products = []
+
+    for product in products:
+        stock_data = stocks.get(product.ml_inventory_id)
+        if stock_data is None:
+            # Continuar mesmo se houver erro em um item específico
+            failed_products.append(product)
+            print(f"Erro ao sincronizar estoque do produto {product.ml_item_id}: {errors.get(product.ml_inventory_id)}")
+            continue
+        product_stocks.append((product, stock_data))
+
+    return product_stocks, failed_products
+
+def _record_products_stock(user_id, product_stocks):
+    """Grava de uma só vez os estoques lidos que mudaram desde a última leitura.
+
+    Recebe os pares (produto, resposta do Fulfillment) de `_read_products_stock`; os
+    produtos já precisam ter id. Retorna uma tupla (estoques lidos, estoques alterados).
+    """
+    stock_levels = [_build_stock_level(product.id, stock_data) for product, stock_data in product_stocks]
+    changed_levels = record_stock_levels(stock_levels, only_changes=True, user_id=user_id)
+    return stock_levels, changed_levels
+
+def _sync_products_stock(user_id, ml_api, products, max_workers, on_progress=None):
+    """Lê o estoque no Fulfillment dos produtos informados e grava apenas os que mudaram.
+
+    Os produtos precisam ter inventory_id. Retorna uma tupla (estoques lidos,
+    estoques alterados, produtos com falha).
+    """
+    product_stocks, failed_products = _read_products_stock(ml_api, products, max_workers, on_progress)
+    stock_levels, changed_levels = _record_products_stock(user_id, product_stocks)
+    return stock_levels, changed_levels, failed_products
+
+def _sync_items(user_id, ml_api, item_ids, max_workers, pending_stocks=None):
+    """Cria ou atualiza os produtos dos anúncios informados e sincroniza o estoque deles.
+
+    `item_ids` deve caber em um multiget (ITEMS_MULTIGET_LIMIT). Com `pending_stocks`,
+    os estoques lidos são acrescentados a essa lista (pares produto, resposta) para
+    serem gravados depois, em um único lote, e os produtos não são enviados ao banco.
+    Retorna um dicionário com a contagem de produtos novos, atualizados e de estoques
+    alterados, e a lista dos anúncios com falha.
+    """
+    # Obter detalhes dos itens em lote (multiget)
+    items_details, item_errors = ml_api.get_items_details(item_ids)
+
+    # Carregar de uma vez os produtos já existentes
+    existing_products = {
+        product.ml_item_id: product
+        for product in Product.query.filter(
+            Product.user_id == user_id,
+            Product.ml_item_id.in_(item_ids)
+        ).all()
+    }
+
+    result = {"new_products": 0, "updated_products": 0, "stock_changes": 0, "failed_items": []}
+    synced_products = []
+
+    for item_id in item_ids:
+        item_details = items_details.get(item_id)
+        if item_details is None:
+            # Continuar mesmo se houver erro em um item específico
+            result["failed_items"].append(item_id)
+            print(f"Erro ao obter detalhes do produto {item_id}: {item_errors.get(item_id)}")
+            continue
+
+        # Verificar se o item já existe
+        product = existing_products.get(item_id)
+
+        if not product:
+            # Criar novo produto
+            product = Product(
+                user_id=user_id,
+                sku=item_details.get("seller_custom_field", ""),
+                ml_item_id=item_id,
+                ml_inventory_id=item_details.get("inventory_id"),
+                title=item_details.get("title", "")
+            )
+            db.session.add(product)
+            result["new_products"] += 1
+        else:
+            # Atualizar produto existente
+            product.ml_inventory_id = item_details.get("inventory_id")
+            product.title = item_details.get("title", "")
+            if not product.sku and item_details.get("seller_custom_field"):
+                product.sku = item_details.get("seller_custom_field", "")
+            db.session.add(product)
+            result["updated_products"] += 1
+
+        synced_products.append(product)
+
+    # Sincronizar o estoque dos produtos que têm inventory_id
+    stock_products = [product for product in synced_products if product.ml_inventory_id]
+    if pending_stocks is not None:
+        product_stocks, failed_products = _read_products_stock(ml_api, stock_products, max_workers)
+        pending_stocks.extend(product_stocks)
+    else:
+        # Garantir que os produtos novos tenham ID antes de registrar o estoque
+        db.session.flush()
+        _, changed_levels, failed_products = _sync_products_stock(user_id, ml_api, stock_products, max_workers)
+        result["stock_changes"] = len(changed_levels)
+    result["failed_items"].extend(product.ml_item_id for product in failed_products)
+
+    return result
+
+def sync_user_products(user_id, ml_api, progress=None):
+    """Sincroniza os produtos (e o estoque deles) de um usuário com o Mercado Livre.
+
+    Nada é gravado até o fim da leitura: produtos e estoques são gravados juntos, em
+    uma única transação, e uma falha no meio da sincronização não deixa alterações
+    pela metade. Se informado, `progress(processados, total, erros)` é chamado após
+    cada bloco de itens. Retorna um dicionário com a contagem de produtos novos,
+    atualizados e com falha, e de estoques que mudaram desde a última leitura.
+    """
+    max_workers = current_app.config.get('ML_SYNC_MAX_WORKERS', 8)
+
+    # Obter informações do usuário
+    user_info = ml_api.get_user_info()
+    ml_user_id = user_info["id"]
+
+    counts = {"total": None, "processed": 0, "errors": 0}
+    new_count = 0
+    updated_count = 0
+    pending_stocks = []
+
+    def set_total(total):
+        counts["total"] = total
+
+    def unique_item_ids():
+        # Os produtos novos só vão ao banco no fim: um anúncio repetido na busca criaria outro produto
+        seen = set()
+        for item_id in ml_api.iter_user_item_ids(ml_user_id, on_total=set_total):
+            if item_id not in seen:
+                seen.add(item_id)
+                yield item_id
+
+    # Percorrer todos os itens do usuário, em blocos do tamanho do multiget, à medida
+    # que as páginas da busca chegam; sem autoflush, a transação não começa antes do fim
+    with db.session.no_autoflush:
+        for item_ids in iter_chunks(unique_item_ids(), ml_api.ITEMS_MULTIGET_LIMIT):
+            result = _sync_items(user_id, ml_api, item_ids, max_workers, pending_stocks=pending_stocks)
+            new_count += result["new_products"]
+            updated_count += result["updated_products"]
+            counts["errors"] += len(result["failed_items"])
+
+            counts["processed"] += len(item_ids)
+            if progress:
+                progress(counts["processed"], counts["total"], counts["errors"])
+
+    # Gravar tudo de uma vez: produtos, estoques (em um único lote) e o id do vendedor
+    _remember_ml_user_id(user_id, ml_user_id)
+    db.session.flush()
+    _, changed_levels = _record_products_stock(user_id, pending_stocks)
+    bump_data_version(user_id)
+    db.session.commit()
+
+    return {
+        "new_products": new_count,
+        "updated_products": updated_count,
+        "stock_changes": len(changed_levels),
+        "failed_products": counts["errors"]
+    }
+
+def sync_user_stock(user_id, ml_api, progress=None):
+    """Sincroniza o estoque no Fulfillment de todos os produtos de um usuário.
+
+    Se informado, `progress(processados, total, erros)` é chamado a cada consulta concluída.
+    Retorna um dicionário com a contagem de produtos consultados, com estoque alterado e com falha.
+    """
+    # Obter produtos com inventory_id
+    products = Product.query.filter(
+        Product.user_id == user_id,
+        Product.ml_inventory_id.isnot(None)
+    ).all()
+
+    inventory_ids = list(dict.fromkeys(product.ml_inventory_id for product in products))
+
+    def on_progress(done, errors):
+        progress(done, len(inventory_ids), errors)
+
+    # Buscar o estoque de todos os produtos em paralelo, com concorrência limitada
+    stock_levels, changed_levels, failed_products = _sync_products_stock(
+        user_id,
+        ml_api,
+        products,
+        max_workers=current_app.config.get('ML_SYNC_MAX_WORKERS', 8),
+        on_progress=on_progress if progress else None
+    )
+    if changed_levels:
+        bump_data_version(user_id)
+    db.session.commit()
+
+    return {
+        "updated_products": len(stock_levels),
+        "changed_products": len(changed_levels),
+        "failed_products": len(failed_products)
+    }
+
+# Status de pedido que contam como venda
+SALE_ORDER_STATUSES = ('paid', 'partially_refunded')
+
+# Pedidos lidos por bloco de gravação e vendas por INSERT em lote
+ORDERS_BLOCK_SIZE = 200
+SALES_INSERT_CHUNK = 500
+
+# Margem de segurança ao retomar a partir do cursor (pedidos alterados durante a última leitura)
+ORDERS_CURSOR_OVERLAP = timedelta(minutes=5)
+
+# Registros por consulta IN ao localizar produtos, inventários e pedidos pelos ids
+RESOURCES_QUERY_CHUNK = 500
+
+# Por quanto tempo os pedidos com anúncios ainda sem produto cadastrado continuam sendo relidos
+ORDERS_SKIPPED_RETRY = timedelta(days=7)
+
+def _apply_orders(user_id, orders, product_index):
+    """Grava as vendas de um bloco de pedidos lidos da API.
+
+    Cada item de pedido vira uma venda por (pedido, produto); vendas já importadas
+    são atualizadas e as de pedidos não pagos ou cancelados são removidas.
+    `product_index` mapeia anúncio do Mercado Livre -> id do produto. Os pedidos com
+    itens ignorados (anúncio ainda sem produto cadastrado) entram na lista de pedidos a
+    reler, e os demais pedidos do bloco saem dela. Retorna um dicionário com as
+    contagens e a maior data de atualização dos pedidos.
+    """
+    result = {"new_sales": 0, "updated_sales": 0, "removed_sales": 0, "skipped_items": 0, "max_updated": None}
+    skipped_order_ids = set()
+    sales_rows = {}
+    order_ids = set()
+
+    for order in orders:
+        order_id = str(order["id"])
+        order_ids.add(order_id)
+
+        last_updated = parse_ml_datetime(order.get("date_last_updated") or order["date_created"])
+        if result["max_updated"] is None or last_updated > result["max_updated"]:
+            result["max_updated"] = last_updated
+
+        # Pedidos não pagos ou cancelados não geram venda (e removem a existente)
+        if order.get("status") not in SALE_ORDER_STATUSES:
+            continue
+
+        sale_timestamp = parse_ml_datetime(order.get("date_closed") or order["date_created"])
+        for order_item in order.get("order_items", []):
+            product_id = product_index.get(order_item.get("item", {}).get("id"))
+            if product_id is None:
+                # Anúncio ainda não sincronizado como produto: o pedido será relido
+                result["skipped_items"] += 1
+                skipped_order_ids.add(order_id)
+                continue
+
+            key = (order_id, product_id)
+            row = sales_rows.get(key)
+            if row:
+                # Variações do mesmo anúncio no pedido somam na mesma venda
+                row["quantity_sold"] += order_item.get("quantity", 0)
+            else:
+                sales_rows[key] = {
+                    "ml_order_id": order_id,
+                    "product_id": product_id,
+                    "quantity_sold": order_item.get("quantity", 0),
+                    "sale_timestamp": sale_timestamp
+                }
+
+    # Vendas já importadas para os pedidos deste bloco
+    existing_sales = Sale.query.join(Product, Product.id == Sale.product_id).filter(
+        Product.user_id == user_id,
+        Sale.ml_order_id.in_(order_ids)
+    ).all()
+
+    # Dias (por produto) cuja consolidação diária precisa ser recalculada
+    affected_days = set()
+
+    for sale in existing_sales:
+        row = sales_rows.pop((sale.ml_order_id, sale.product_id), None)
+        if row is None:
+            affected_days.add((sale.product_id, sale.sale_timestamp.date()))
+            db.session.delete(sale)
+            result["removed_sales"] += 1
+        elif sale.quantity_sold != row["quantity_sold"] or sale.sale_timestamp != row["sale_timestamp"]:
+            affected_days.add((sale.product_id, sale.sale_timestamp.date()))
+            affected_days.add((sale.product_id, row["sale_timestamp"].date()))
+            sale.quantity_sold = row["quantity_sold"]
+            sale.sale_timestamp = row["sale_timestamp"]
+            result["updated_sales"] += 1
+
+    # Inserir as vendas novas em lotes
+    new_rows = list(sales_rows.values())
+    for start in range(0, len(new_rows), SALES_INSERT_CHUNK):
+        db.session.execute(insert(Sale), new_rows[start:start + SALES_INSERT_CHUNK])
+    result["new_sales"] = len(new_rows)
+    affected_days.update((row["product_id"], row["sale_timestamp"].date()) for row in new_rows)
+
+    refresh_daily_sales(user_id, affected_days)
+    _track_skipped_orders(user_id, order_ids, skipped_order_ids)
+    return result
+
+def _track_skipped_orders(user_id, order_ids, skipped_order_ids):
+    """Atualiza a lista de pedidos a reler após gravar um bloco de pedidos.
+
+    Pedidos do bloco sem itens ignorados saem da lista; os com itens ignorados
+    entram nela, mantendo a data da primeira vez em que foram ignorados.
+    """
+    resolved_ids = list(set(order_ids) - skipped_order_ids)
+    for chunk in iter_chunks(resolved_ids, RESOURCES_QUERY_CHUNK):
+        SkippedOrder.query.filter(
+            SkippedOrder.user_id == user_id,
+            SkippedOrder.ml_order_id.in_(chunk)
+        ).delete(synchronize_session=False)
+
+    if not skipped_order_ids:
+        return
+    known_ids = {
+        order_id for (order_id,) in db.session.query(SkippedOrder.ml_order_id).filter(
+            SkippedOrder.user_id == user_id,
+            SkippedOrder.ml_order_id.in_(list(skipped_order_ids))
+        )
+    }
+    for order_id in skipped_order_ids - known_ids:
+        try:
+            with db.session.begin_nested():
+                db.session.add(SkippedOrder(user_id=user_id, ml_order_id=order_id))
+        except IntegrityError:
+            # Outra sincronização registrou o mesmo pedido ao mesmo tempo
+            pass
+
+def _product_index_for(user_id, orders):
+    """Índice anúncio do Mercado Livre -> produto, apenas dos anúncios presentes nos pedidos."""
+    order_item_ids = list({
+        order_item.get("item", {}).get("id")
+        for order in orders
+        for order_item in order.get("order_items", [])
+    })
+    product_index = {}
+    for start in range(0, len(order_item_ids), RESOURCES_QUERY_CHUNK):
+        product_index.update(db.session.query(Product.ml_item_id, Product.id).filter(
+            Product.user_id == user_id,
+            Product.ml_item_id.in_(order_item_ids[start:start + RESOURCES_QUERY_CHUNK])
+        ))
+    return product_index
+
+def _retry_skipped_orders(user_id, ml_api, seen_order_ids):
+    """Relê pelo id os pedidos da lista de itens ignorados e grava as suas vendas.
+
+    Pedidos já lidos nesta sincronização (`seen_order_ids`) não são pedidos de novo;
+    pedidos ignorados há mais de ORDERS_SKIPPED_RETRY saem da lista sem nova leitura.
+    Retorna o resultado de `_apply_orders` para os pedidos relidos, ou None.
+    """
+    SkippedOrder.query.filter(
+        SkippedOrder.user_id == user_id,
+        SkippedOrder.first_skipped_at < datetime.utcnow() - ORDERS_SKIPPED_RETRY
+    ).delete(synchronize_session=False)
+
+    pending_ids = [
+        order_id for (order_id,) in db.session.query(SkippedOrder.ml_order_id).filter(
+            SkippedOrder.user_id == user_id
+        )
+        if order_id not in seen_order_ids
+    ]
+    orders = []
+    for order_id in pending_ids:
+        try:
+            orders.append(ml_api.get_order_details(order_id))
+        except Exception as e:
+            # O pedido continua na lista para a próxima sincronização
+            print(f"Erro ao reler o pedido {order_id}: {e}")
+    if not orders:
+        return None
+    return _apply_orders(user_id, orders, _product_index_for(user_id, orders))
+
+def sync_user_orders(user_id, ml_api, progress=None):
+    """Importa os pedidos do usuário para a tabela de vendas, de forma incremental.
+
+    Apenas pedidos criados ou alterados desde a última execução são lidos (cursor
+    persistido em SyncCursor); pedidos com anúncios ainda sem produto cadastrado
+    são relidos pelo id nas execuções seguintes. Cada item de pedido vira uma venda por (pedido, produto);
+    vendas já importadas são atualizadas e as de pedidos cancelados são removidas.
+    Se informado, `progress(processados, total, erros)` é chamado após cada bloco de pedidos.
+    """
+    cursor = SyncCursor.query.filter_by(user_id=user_id, cursor_type='orders').first()
+    if not cursor:
+        cursor = SyncCursor(user_id=user_id, cursor_type='orders')
+        db.session.add(cursor)
+    updated_from = cursor.cursor_value - ORDERS_CURSOR_OVERLAP if cursor.cursor_value else None
+
+    # Índice em memória: anúncio do Mercado Livre -> produto
+    product_index = dict(
+        db.session.query(Product.ml_item_id, Product.id).filter(Product.user_id == user_id).all()
+    )
+
+    user_info = ml_api.get_user_info()
+    _remember_ml_user_id(user_id, user_info["id"])
+
+    counts = {"total": None, "processed": 0, "skipped_items": 0}
+    new_count = 0
+    updated_count = 0
+    removed_count = 0
+    max_updated = cursor.cursor_value
+    seen_order_ids = set()
+
+    def set_total(total):
+        counts["total"] = total
+
+    orders_iter = ml_api.iter_orders(user_info["id"], updated_from=updated_from, on_total=set_total)
+    for orders in iter_chunks(orders_iter, ORDERS_BLOCK_SIZE):
+        result = _apply_orders(user_id, orders, product_index)
+        new_count += result["new_sales"]
+        updated_count += result["updated_sales"]
+        removed_count += result["removed_sales"]
+        counts["skipped_items"] += result["skipped_items"]
+        if max_updated is None or (result["max_updated"] and result["max_updated"] > max_updated):
+            max_updated = result["max_updated"]
+        seen_order_ids.update(str(order["id"]) for order in orders)
+        # Cada bloco é confirmado: regravar um bloco é idempotente e o cursor só avança no fim
+        db.session.commit()
+
+        counts["processed"] += len(orders)
+        if progress:
+            progress(counts["processed"], counts["total"], 0)
+
+    # Pedidos com itens ignorados em execuções anteriores: apenas eles são relidos
+    result = _retry_skipped_orders(user_id, ml_api, seen_order_ids)
+    if result:
+        new_count += result["new_sales"]
+        updated_count += result["updated_sales"]
+        removed_count += result["removed_sales"]
+
+    # O cursor só avança depois que todos os pedidos foram lidos
+    cursor.cursor_value = max_updated
+    if new_count or updated_count or removed_count:
+        bump_data_version(user_id)
+    db.session.commit()
+
+    return {
+        "processed_orders": counts["processed"],
+        "new_sales": new_count,
+        "updated_sales": updated_count,
+        "removed_sales": removed_count,
+        "skipped_items": counts["skipped_items"]
+    }
+
+def sync_user_resources(user_id, ml_api, item_ids=(), inventory_ids=(), order_ids=()):
+    """Relê na API apenas os anúncios, estoques e pedidos informados (ex: avisados por notificação).
+
+    Anúncios são lidos em multiget e têm o estoque sincronizado junto; inventários
+    sem produto cadastrado são ignorados. As respostas em cache dos anúncios e pedidos
+    informados são descartadas antes da leitura. Retorna um dicionário com as contagens e,
+    em "failed", os ids que falharam por tipo ('item', 'stock' e 'order'), para nova tentativa.
+    """
+    max_workers = current_app.config.get('ML_SYNC_MAX_WORKERS', 8)
+    failed = {"item": set(), "stock": set(), "order": set()}
+    result = {"synced_items": 0, "stock_changes": 0, "new_sales": 0, "updated_sales": 0, "removed_sales": 0}
+
+    # Os recursos avisados mudaram: descartar as respostas em cache para relê-los de fato
+    item_ids = list(dict.fromkeys(item_ids))
+    for item_id in item_ids:
+        ml_api.invalidate_cached(f"/items/{item_id}")
+    for order_id in order_ids:
+        ml_api.invalidate_cached(f"/orders/{order_id}")
+
+    for chunk in iter_chunks(item_ids, ml_api.ITEMS_MULTIGET_LIMIT):
+        items_result = _sync_items(user_id, ml_api, chunk, max_workers)
+        result["synced_items"] += items_result["new_products"] + items_result["updated_products"]
+        result["stock_changes"] += items_result["stock_changes"]
+        failed["item"].update(items_result["failed_items"])
+
+    inventory_ids = list(dict.fromkeys(inventory_ids))
+    products = []
+    for start in range(0, len(inventory_ids), RESOURCES_QUERY_CHUNK):
+        products.extend(Product.query.filter(
+            Product.user_id == user_id,
+            Product.ml_inventory_id.in_(inventory_ids[start:start + RESOURCES_QUERY_CHUNK])
+        ).all())
+    if products:
+        _, changed_levels, failed_products = _sync_products_stock(user_id, ml_api, products, max_workers)
+        result["stock_changes"] += len(changed_levels)
+        failed["stock"].update(product.ml_inventory_id for product in failed_products)
+
+    orders = []
+    for order_id in dict.fromkeys(order_ids):
+        try:
+            orders.append(ml_api.get_order_details(order_id))
+        except Exception as e:
+            # Continuar mesmo se houver erro em um pedido específico
+            failed["order"].add(order_id)
+            print(f"Erro ao obter o pedido {order_id}: {e}")
+    if orders:
+        orders_result = _apply_orders(user_id, orders, _product_index_for(user_id, orders))
+        for key in ("new_sales", "updated_sales", "removed_sales"):
+            result[key] += orders_result[key]
+
+    if any(result.values()):
+        bump_data_version(user_id)
+    db.session.commit()
+
+    result["failed"] = failed
+    return result
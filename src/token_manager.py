@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Gerenciamento do token OAuth do Mercado Livre: expiração, renovação única e persistência."""
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from .models import db, ApiCredentials
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads é aplicado
+    fcntl = None
+
+# Locks por vendedor, compartilhados pelas threads do processo
+_user_locks = {}
+_user_locks_guard = threading.Lock()
+
+def _user_lock(user_id):
+    """Retorna o lock de renovação de token do vendedor no processo atual."""
+    with _user_locks_guard:
+        lock = _user_locks.get(user_id)
+        if lock is None:
+            lock = threading.Lock()
+            _user_locks[user_id] = lock
+    return lock
+
+@contextmanager
+def _file_lock(path):
+    """Lock exclusivo em arquivo, que serializa a renovação entre os workers do gunicorn."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def credentials_expiry(credentials):
+    """Calcula o instante (UTC) em que o token das credenciais expira."""
+    return credentials.last_refresh_time + timedelta(seconds=credentials.expires_in)
+
+class TokenManager:
+    """Mantém válido o token de acesso de um vendedor.
+
+    A expiração é derivada de `last_refresh_time + expires_in`, o token é renovado
+    antes de expirar e o novo par de tokens é gravado em ApiCredentials. Apenas uma
+    renovação acontece por vendedor, mesmo com várias threads ou workers percebendo
+    a expiração ao mesmo tempo: os demais aguardam e reaproveitam o token gravado.
+    """
+
+    # Antecedência com que o token é renovado
+    REFRESH_MARGIN = timedelta(minutes=10)
+
+    def __init__(self, app, user_id, lock_dir=None):
+        self.app = app
+        self.user_id = user_id
+        self.lock_path = os.path.join(
+            lock_dir or tempfile.gettempdir(),
+            f"estoque-ml-token-{user_id}.lock"
+        )
+
+    def attach(self, ml_api, credentials):
+        """Carrega as credenciais na instância da API e passa a gerenciar o seu token."""
+        self._apply(ml_api, credentials)
+        ml_api.token_manager = self
+        return ml_api
+
+    def _apply(self, ml_api, credentials):
+        """Copia o par de tokens e a expiração das credenciais para a instância da API."""
+        ml_api.access_token = credentials.access_token
+        ml_api.refresh_token = credentials.refresh_token
+        ml_api.token_expires = credentials_expiry(credentials)
+
+    def _is_fresh(self, expires_at):
+        """Indica se o token ainda está fora da margem de renovação."""
+        return expires_at is not None and datetime.utcnow() + self.REFRESH_MARGIN < expires_at
+
+    def ensure_valid(self, ml_api):
+        """Garante que a instância da API tenha um token válido, renovando-o se necessário."""
+        if ml_api.access_token and self._is_fresh(ml_api.token_expires):
+            return True
+
+        with _user_lock(self.user_id), _file_lock(self.lock_path):
+            # Contexto próprio: a gravação não interfere na sessão da requisição em andamento
+            with self.app.app_context():
+                credentials = db.session.execute(
+                    db.select(ApiCredentials).filter_by(user_id=self.user_id)
+                ).scalar_one_or_none()
+                if credentials is None:
+                    return False
+
+                # Outra thread ou worker pode ter renovado enquanto aguardávamos o lock
+                if self._is_fresh(credentials_expiry(credentials)):
+                    self._apply(ml_api, credentials)
+                    return True
+
+                ml_api.refresh_token = credentials.refresh_token
+                token_data = ml_api.refresh_access_token()
+
+                credentials.access_token = token_data["access_token"]
+                credentials.refresh_token = token_data["refresh_token"]
+                credentials.expires_in = token_data["expires_in"]
+                credentials.last_refresh_time = datetime.utcnow()
+                db.session.commit()
+
+                self._apply(ml_api, credentials)
+        return True